@@ -2,7 +2,6 @@ import logging
 from apscheduler.schedulers.blocking import BlockingScheduler
 from datetime import datetime
 import asyncio
-from asyncio import Semaphore
 from bot.data_processing.data_updater import update_all_assets
 
 # Налаштування логування
@@ -22,8 +21,7 @@ def scheduled_task():
     print(f"🔄 Початок оновлення даних.")
     logging.info("🔄 Початок оновлення даних.")
     try:
-        sem = Semaphore(10)  # Створюємо новий Semaphore для кожного виклику
-        asyncio.run(update_all_assets(sem))
+        asyncio.run(update_all_assets())  # Паралельність регулює спільний rate_limiter
         print(f"✅ Оновлення завершено успішно.")
         logging.info("✅ Оновлення завершено успішно.")
     except Exception as e:
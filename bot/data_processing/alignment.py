@@ -0,0 +1,185 @@
+"""
+Вирівнювання цін активів по 15-хвилинній сітці з виявленням пропусків.
+
+Кожен актив розкладається на сітку як масив (NaN — свічки немає) за індексом
+(ts - start) // 900, тож вирівнювання пари — це O(n) робота з масивами замість JOIN
+або сортування по ts для кожної пари. Пропуски
+знаходяться векторно (np.diff маски) і обробляються за політикою:
+
+- "drop"  — вікно складається з останніх window свічок, на яких є ціни обох активів;
+- "ffill" — внутрішні пропуски довжиною до max_fill свічок заповнюються попередньою
+  ціною, довші пропуски відкидаються, як у "drop";
+- "stale" — вікно — це останні window свічок сітки до останньої спільної свічки;
+  якщо в ньому є пропуск, пара позначається як застаріла (None).
+
+Пропуски на краях ряду (до першої та після останньої свічки активу) не заповнюються:
+кінець вікна — завжди остання свічка, на якій справді є ціни обох активів.
+"""
+
+import logging
+import numpy as np
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+INTERVAL_SECONDS = 15 * 60
+FILL_POLICIES = ("drop", "ffill", "stale")
+FILL_POLICY = "ffill"
+MAX_FILL_BARS = 2
+# Запас свічок понад вікно під час читання пари з бази: пропуски в одному з активів
+# зменшують кількість спільних точок, тож читається трохи більше за window
+ALIGN_SLACK_BARS = 96
+
+def find_gaps(valid):
+    """
+    Знаходить усі пропуски (серії відсутніх свічок) у рядках маски.
+
+    :param valid: Маска наявних значень (рядки × свічки).
+    :return: (рядок, початок, довжина) кожного пропуску та ознака внутрішнього пропуску
+        (є ціни і до, і після нього).
+    """
+    valid = np.atleast_2d(valid)
+    padded = np.pad(~valid, ((0, 0), (1, 1))).astype(np.int8)
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    interior = (starts > 0) & (ends < valid.shape[1])
+    return rows, starts, lengths, interior
+
+def fill_short_gaps(values, max_fill=MAX_FILL_BARS):
+    """
+    Заповнює внутрішні пропуски довжиною до max_fill свічок попередньою ціною.
+    :return: Нова матриця (вхідна не змінюється) і кількість заповнених свічок.
+    """
+    values = np.array(np.atleast_2d(values), dtype=np.float64)
+    rows, starts, lengths, interior = find_gaps(~np.isnan(values))
+    fillable = interior & (lengths <= max_fill)
+    rows, starts, lengths = rows[fillable], starts[fillable], lengths[fillable]
+    if lengths.size:
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        fill_rows = np.repeat(rows, lengths)
+        fill_columns = np.repeat(starts, lengths) + offsets
+        values[fill_rows, fill_columns] = values[fill_rows, np.repeat(starts - 1, lengths)]
+    return values, int(lengths.sum())
+
+def to_grid(times, matrix):
+    """
+    Розкладає стовпці матриці (активи × ts) на повну сітку від першого до останнього ts.
+    :return: (ts сітки, матриця з NaN для свічок, яких немає в жодного активу).
+    """
+    times = np.asarray(times, dtype=np.int64)
+    if times.size == 0:
+        return times, matrix
+    grid = np.arange(times[0] - times[0] % INTERVAL_SECONDS, times[-1] + 1, INTERVAL_SECONDS)
+    columns = (times - grid[0]) // INTERVAL_SECONDS
+    on_grid = (times - grid[0]) % INTERVAL_SECONDS == 0
+    aligned = np.full((matrix.shape[0], grid.size), np.nan)
+    aligned[:, columns[on_grid]] = matrix[:, on_grid]
+    return grid, aligned
+
+def align_matrix(times, matrix, policy=FILL_POLICY, max_fill=MAX_FILL_BARS):
+    """Сітка та заповнення коротких пропусків для матриці цін (для векторних розрахунків)."""
+    if policy not in FILL_POLICIES:
+        raise ValueError(f"Невідома політика пропусків: {policy}")
+    times, matrix = to_grid(times, matrix)
+    if policy == "ffill":
+        matrix, _ = fill_short_gaps(matrix, max_fill)
+    return times, matrix
+
+def align_legs(base_times, base_prices, quote_times, quote_prices, window, policy=FILL_POLICY, max_fill=MAX_FILL_BARS):
+    """
+    Вирівнює два активи по сітці й вибирає вікно пари за політикою пропусків.
+
+    Parameters:
+        base_times, quote_times (array): Час відкриття свічок активів у секундах (за зростанням).
+        base_prices, quote_prices (array): Ціни закриття.
+        window (int): Кількість точок у вікні.
+        policy (str): "drop", "ffill" або "stale".
+        max_fill (int): Максимальна довжина пропуску, що заповнюється (для "ffill").
+
+    Returns:
+        tuple | None: (ts, ціни base, ціни quote) у хронологічному порядку — не більше window точок;
+            None, якщо за політикою "stale" у вікні є пропуск.
+    """
+    if policy not in FILL_POLICIES:
+        raise ValueError(f"Невідома політика пропусків: {policy}")
+    legs = [
+        (np.asarray(base_times, dtype=np.int64), np.asarray(base_prices, dtype=np.float64)),
+        (np.asarray(quote_times, dtype=np.int64), np.asarray(quote_prices, dtype=np.float64)),
+    ]
+    if any(leg_times.size == 0 for leg_times, _ in legs):
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+
+    # Спільна сітка від першої до останньої свічки: стовпець — (ts - start) // 900, без сортування
+    start = min(int(leg_times[0]) for leg_times, _ in legs)
+    start -= start % INTERVAL_SECONDS
+    stop = max(int(leg_times[-1]) for leg_times, _ in legs)
+    times = np.arange(start, stop + 1, INTERVAL_SECONDS)
+    matrix = np.full((2, times.size), np.nan)
+    for row, (leg_times, leg_prices) in enumerate(legs):
+        offsets = leg_times - start
+        on_grid = offsets % INTERVAL_SECONDS == 0
+        matrix[row, offsets[on_grid] // INTERVAL_SECONDS] = leg_prices[on_grid]
+    if policy == "ffill":
+        matrix, _ = fill_short_gaps(matrix, max_fill)
+
+    common = ~np.isnan(matrix).any(axis=0)
+    columns = np.flatnonzero(common)[-window:]
+    if policy == "stale" and columns.size and columns[-1] - columns[0] != columns.size - 1:
+        return None
+    return times[columns], matrix[0, columns], matrix[1, columns]
+
+def fetch_last_ts(cursor, asset):
+    """Час відкриття останньої свічки активу (пошук по первинному ключу) або None."""
+    cursor.execute("""
+    SELECT MAX(p.ts) FROM prices p
+    WHERE p.symbol_id = (SELECT id FROM symbols WHERE name = ?)
+    """, (asset,))
+    return cursor.fetchone()[0]
+
+def fetch_leg(cursor, asset, since=None):
+    """
+    Свічки активу (ts, ціна) у хронологічному порядку: діапазонний пошук по первинному ключу.
+    :param since: Мінімальний ts у секундах; за замовчуванням — уся історія.
+    """
+    cursor.execute("""
+    SELECT p.ts, p.price
+    FROM prices p
+    WHERE p.symbol_id = (SELECT id FROM symbols WHERE name = ?) AND p.ts >= ?
+    ORDER BY p.ts
+    """, (asset, 0 if since is None else int(since)))
+    rows = cursor.fetchall()
+    times = np.array([row[0] for row in rows], dtype=np.int64)
+    prices = np.array([row[1] for row in rows], dtype=np.float64)
+    return times, prices
+
+def fetch_aligned(cursor, base_asset, quote_asset, window=672, policy=FILL_POLICY, max_fill=MAX_FILL_BARS):
+    """
+    Вирівняні по сітці ціни пари з бази.
+
+    Вікно закінчується не пізніше останньої свічки активу, що відстає, тож з бази читаються
+    лише свічки після latest - (window + ALIGN_SLACK_BARS) * 900 для обох активів.
+
+    :return: (ціни base, ціни quote) списками в хронологічному порядку (не більше window точок);
+        порожні списки, якщо пара застаріла за політикою "stale".
+    """
+    last_times = [fetch_last_ts(cursor, asset) for asset in (base_asset, quote_asset)]
+    if None in last_times:
+        return [], []
+    since = min(last_times) - (window + ALIGN_SLACK_BARS) * INTERVAL_SECONDS
+    base_times, base_prices = fetch_leg(cursor, base_asset, since)
+    quote_times, quote_prices = fetch_leg(cursor, quote_asset, since)
+    aligned = align_legs(base_times, base_prices, quote_times, quote_prices, window, policy, max_fill)
+    if aligned is None:
+        logging.warning(f"⚠️ Пара {base_asset}/{quote_asset} застаріла: у вікні є пропущені свічки.")
+        return [], []
+    _, base, quote = aligned
+    return base.tolist(), quote.tolist()
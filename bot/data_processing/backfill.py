@@ -0,0 +1,138 @@
+import logging
+import aiohttp
+import asyncio
+import sys
+import time
+from bot.data_processing.data_672 import DB_PATH, INTERVAL_SECONDS, fetch_prices, load_unique_assets
+from bot.database.connection import connect, transaction
+from bot.database.db_writer import AsyncDBWriter
+from bot.utils.symbol_registry import SymbolRegistry
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+CANDLES_PER_DAY = 24 * 60 * 60 // INTERVAL_SECONDS
+# Вікна з monitoredPairs.json: 1, 2 та 4 місяці 15-хвилинних свічок
+WINDOWS = {
+    "1m": 30 * CANDLES_PER_DAY,
+    "2m": 60 * CANDLES_PER_DAY,
+    "4m": 120 * CANDLES_PER_DAY,
+}
+CHUNK_CANDLES = 1000  # Максимальний limit для /api/v3/klines
+CHUNK_MS = CHUNK_CANDLES * INTERVAL_SECONDS * 1000
+
+BACKFILL_PROGRESS_DDL = """
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    name TEXT NOT NULL,
+    chunk_start INTEGER NOT NULL,
+    PRIMARY KEY (name, chunk_start)
+)
+"""
+PRUNE_PROGRESS_SQL = "DELETE FROM backfill_progress WHERE chunk_start < ?"
+
+def plan_chunks(candles, now=None):
+    """
+    Розбиває потрібний діапазон на частини по CHUNK_CANDLES свічок.
+
+    Межі частин вирівняні за абсолютною сіткою від епохи, тому не зсуваються між запусками,
+    і позначки прогресу залишаються дійсними після перезапуску.
+
+    Parameters:
+        candles (int): Кількість свічок історії.
+        now (float | None): Поточний час у секундах (для тестів).
+
+    Returns:
+        list: [(startTime, endTime)] у мілісекундах, endTime включно.
+    """
+    now_ms = int((time.time() if now is None else now) * 1000)
+    range_start = now_ms - now_ms % (INTERVAL_SECONDS * 1000) - candles * INTERVAL_SECONDS * 1000
+    first_chunk = range_start - range_start % CHUNK_MS
+    return [
+        (chunk_start, chunk_start + CHUNK_MS - 1)
+        for chunk_start in range(first_chunk, now_ms, CHUNK_MS)
+    ]
+
+def fetch_completed_chunks(db_path=DB_PATH, now=None):
+    """
+    Повертає множину (актив, chunk_start) уже завантажених частин.
+
+    Позначки частин, що повністю вийшли за найдовше вікно (їхні свічки вже видалено
+    прунінгом), спершу видаляються, щоб таблиця прогресу не росла безмежно.
+    """
+    try:
+        oldest_chunk = plan_chunks(max(WINDOWS.values()), now)[0][0]
+        conn = connect(db_path)
+        with transaction(conn):
+            conn.execute(BACKFILL_PROGRESS_DDL)
+            conn.execute(PRUNE_PROGRESS_SQL, (oldest_chunk,))
+        rows = conn.execute("SELECT name, chunk_start FROM backfill_progress").fetchall()
+        conn.close()
+        return set(rows)
+    except Exception as e:
+        logging.error(f"❌ Помилка читання прогресу дозавантаження: {e}")
+        return set()
+
+async def backfill_chunk(session, writer, asset, chunk_start, chunk_end, now_ms):
+    """
+    Завантажує одну частину історії активу та передає її записувачу.
+
+    Частина позначається завершеною в тій самій транзакції, що й запис свічок,
+    але лише якщо вона повністю в минулому (поточна частина ще поповнюється).
+    """
+    prices = await fetch_prices(session, f"{asset}USDT", chunk_start, CHUNK_CANDLES, chunk_end)
+    if prices is None:
+        return False
+    extra = None
+    if chunk_end < now_ms:
+        extra = [("INSERT OR IGNORE INTO backfill_progress (name, chunk_start) VALUES (?, ?)", (asset, chunk_start))]
+    await writer.put(asset, prices, extra)
+    return True
+
+async def run_backfill(window="4m", assets=None, db_path=DB_PATH):
+    """
+    Дозавантажує історію для вікна 1m/2m/4m для всіх активів паралельно в межах бюджету rate_limiter.
+
+    Parameters:
+        window (str): Ключ із WINDOWS.
+        assets (Iterable[str] | None): Активи; за замовчуванням — усі з monitoredPairs.json.
+        db_path (str): Шлях до бази даних.
+    """
+    start_time = time.time()
+    chunks = plan_chunks(WINDOWS[window])
+    completed = await asyncio.to_thread(fetch_completed_chunks, db_path)
+    now_ms = int(time.time() * 1000)
+
+    async with aiohttp.ClientSession() as session, AsyncDBWriter(db_path) as writer:
+        if assets is None:
+            # Делістингові та неіснуючі символи відсіюються за реєстром exchangeInfo
+            registry = await SymbolRegistry().load(session)
+            assets, _ = registry.validate_assets(load_unique_assets() or [])
+        assets = sorted(assets)
+
+        pending = [
+            (asset, chunk_start, chunk_end)
+            for asset in assets
+            for chunk_start, chunk_end in chunks
+            if (asset, chunk_start) not in completed
+        ]
+        logging.info(
+            f"⏳ Дозавантаження {window}: {len(assets)} активів, частин до завантаження {len(pending)} "
+            f"з {len(assets) * len(chunks)}."
+        )
+
+        await asyncio.gather(*(
+            backfill_chunk(session, writer, asset, chunk_start, chunk_end, now_ms)
+            for asset, chunk_start, chunk_end in pending
+        ))
+
+    logging.info(f"✅ Дозавантаження {window} завершено. Час виконання: {time.time() - start_time:.2f} секунд.")
+
+if __name__ == "__main__":
+    asyncio.run(run_backfill(sys.argv[1] if len(sys.argv) > 1 else "4m"))
@@ -12,8 +12,9 @@ def check_data_for_asset(asset_name):
     # Отримання кількості записів
     cursor.execute(
         """
-        SELECT COUNT(*) FROM cryptocurrencies
-        WHERE name = ?
+        SELECT COUNT(*) FROM prices p
+        JOIN symbols s ON s.id = p.symbol_id
+        WHERE s.name = ?
         """,
         (asset_name,)
     )
@@ -22,9 +23,10 @@ def check_data_for_asset(asset_name):
     # Отримання прикладів записів
     cursor.execute(
         """
-        SELECT price, timestamp FROM cryptocurrencies
-        WHERE name = ?
-        ORDER BY timestamp DESC
+        SELECT p.price, p.ts FROM prices p
+        JOIN symbols s ON s.id = p.symbol_id
+        WHERE s.name = ?
+        ORDER BY p.ts DESC
         LIMIT 5
         """,
         (asset_name,)
@@ -0,0 +1,189 @@
+import logging
+import sys
+import numpy as np
+from bot.config.config import DATABASE_PATH
+from bot.data_processing.backfill import WINDOWS
+from bot.data_processing.data_672 import DB_PATH
+from bot.data_processing.pair_scanner import fill_gaps
+from bot.data_processing.spread_engine import ols_beta
+from bot.data_processing.zscore_engine import INTERVAL_SECONDS, MIN_COVERAGE, load_grid_matrix
+from bot.data_storage.json_manager import JSONManager
+from bot.database.connection import get_connection
+from bot.database.db_manager import DatabaseManager
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+SCREEN_WINDOW = WINDOWS["1m"]
+MAX_LAG = 4  # Максимум лагів різниць в ADF-регресії (вибір за AIC)
+STALE_CANDLES = 96  # На скільки свічок кінець вікна пари може відставати від найновішої свічки
+BLOCK_PAIRS = 256
+# Критичні значення MacKinnon (2010) для тесту Енгла–Грейнджера з двома змінними та константою:
+# tau(T) = b0 + b1 / T + b2 / T²
+CRITICAL_VALUES = {
+    1: (-3.89644, -10.9519, -22.527),
+    5: (-3.33613, -6.1101, -6.823),
+    10: (-3.04445, -4.2412, -2.720),
+}
+
+def critical_value(level, nobs):
+    """Критичне значення статистики ADF для рівня значущості level (%) і кількості спостережень nobs."""
+    b0, b1, b2 = CRITICAL_VALUES[level]
+    return b0 + b1 / nobs + b2 / nobs ** 2
+
+def engle_granger(x, y, max_lag=MAX_LAG):
+    """
+    Тест Енгла–Грейнджера для блоку пар без пропусків (пари × свічки).
+
+    Крок 1: регресія y = alpha + beta * x і залишки e для всіх пар однією матричною операцією.
+    Крок 2: ADF-регресія Δe_t = gamma * e_{t-1} + Σ phi_i * Δe_{t-i} без константи на спільній
+    вибірці; матриці Z'Z усіх пар будуються одним einsum, а системи розв'язуються пакетно.
+    Кількість лагів 0..max_lag вибирається для кожної пари за AIC.
+
+    Returns:
+        dict: Масиви за парами: beta, adf_stat, lag, significance (1, 5, 10 або 0, якщо не коінтегровані).
+    """
+    pairs, steps = x.shape
+    center_x, center_y = x.mean(axis=1, keepdims=True), y.mean(axis=1, keepdims=True)
+    dx, dy = x - center_x, y - center_y
+    _, beta = ols_beta(steps, dx.sum(axis=1), dy.sum(axis=1), (dx * dx).sum(axis=1), (dx * dy).sum(axis=1))
+    residuals = dy - beta[:, None] * dx  # Залишки мають нульове середнє, тому константа в ADF не потрібна
+
+    diffs = np.diff(residuals, axis=1)
+    nobs = steps - 1 - max_lag
+    target = diffs[:, max_lag:]
+    regressors = np.stack(
+        [residuals[:, max_lag:steps - 1]] + [diffs[:, max_lag - lag:steps - 1 - lag] for lag in range(1, max_lag + 1)],
+        axis=2,
+    )
+    gram = np.einsum("pnk,pnl->pkl", regressors, regressors)
+    moments = np.einsum("pnk,pn->pk", regressors, target)
+    total = np.einsum("pn,pn->p", target, target)
+
+    best_aic = np.full(pairs, np.inf)
+    adf_stat = np.full(pairs, np.nan)
+    lags = np.zeros(pairs, dtype=np.int64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for lag in range(max_lag + 1):
+            size = lag + 1
+            inverse = np.linalg.pinv(gram[:, :size, :size])
+            coef = np.einsum("pkl,pl->pk", inverse, moments[:, :size])
+            rss = np.maximum(total - np.einsum("pk,pk->p", coef, moments[:, :size]), np.finfo(float).tiny)
+            aic = nobs * np.log(rss / nobs) + 2 * size
+            stat = coef[:, 0] / np.sqrt(rss / (nobs - size) * inverse[:, 0, 0])
+            better = aic < best_aic
+            best_aic = np.where(better, aic, best_aic)
+            adf_stat = np.where(better, stat, adf_stat)
+            lags = np.where(better, lag, lags)
+
+    significance = np.zeros(pairs, dtype=np.int64)
+    for level in sorted(CRITICAL_VALUES, reverse=True):
+        significance = np.where(adf_stat < critical_value(level, nobs), level, significance)
+    return {"beta": beta, "adf_stat": adf_stat, "lag": lags, "significance": significance}
+
+def _result(values, row, window_end):
+    return {
+        "window_end": window_end,
+        "beta": round(float(values["beta"][row]), 4),
+        "adf_stat": round(float(values["adf_stat"][row]), 4),
+        "lag": int(values["lag"][row]),
+        "significance": int(values["significance"][row]) or None,
+    }
+
+def screen_pairs(pairs, prices_db=DB_PATH, metrics_db=DATABASE_PATH, window=SCREEN_WINDOW, max_lag=MAX_LAG):
+    """
+    Перевіряє пари на коінтеграцію за останні window свічок сітки з кешуванням результатів.
+
+    Кінець вікна пари — остання свічка, на якій є ціни обох активів. Пари, для яких у кеші
+    вже є результат із тим самим кінцем вікна, повторно не тестуються. Вікна з покриттям
+    нижче MIN_COVERAGE пропускаються; поодинокі пропуски заповнюються останньою ціною.
+
+    Parameters:
+        pairs (list): Список пар 'BASE/QUOTE'.
+        prices_db (str): База з цінами.
+        metrics_db (str): База з таблицею кешу cointegration.
+        window (int): Довжина вікна в свічках.
+        max_lag (int): Максимальна кількість лагів ADF.
+
+    Returns:
+        dict: {пара: {"window_end", "beta", "adf_stat", "lag", "significance"} або None}.
+    """
+    results = dict.fromkeys(pairs)
+    try:
+        assets = {asset for pair in pairs for asset in pair.split("/")}
+        index, latest, matrix = load_grid_matrix(get_connection(prices_db), assets, window + STALE_CANDLES)
+        if latest is None:
+            logging.warning("⚠️ У базі немає цін для перевірки коінтеграції.")
+            return results
+        first = latest - (matrix.shape[1] - 1) * INTERVAL_SECONDS
+
+        known = [pair for pair in pairs if all(asset in index for asset in pair.split("/"))]
+        base_rows = np.array([index[pair.split("/")[0]] for pair in known], dtype=np.int64)
+        quote_rows = np.array([index[pair.split("/")[1]] for pair in known], dtype=np.int64)
+        common = ~np.isnan(matrix[base_rows]) & ~np.isnan(matrix[quote_rows])
+        ends = matrix.shape[1] - 1 - np.argmax(common[:, ::-1], axis=1)
+
+        db = DatabaseManager(metrics_db)
+        try:
+            cached = db.fetch_cointegration(window)
+            pending = {}
+            for row, pair in enumerate(known):
+                window_end = first + int(ends[row]) * INTERVAL_SECONDS
+                if not common[row].any() or ends[row] < window - 1:
+                    continue
+                if pair in cached and cached[pair]["window_end"] == window_end:
+                    results[pair] = cached[pair]
+                    continue
+                covered = common[row, ends[row] - window + 1:ends[row] + 1].sum()
+                if covered >= MIN_COVERAGE * window:
+                    pending.setdefault(int(ends[row]), []).append(row)
+
+            tested = {}
+            for end, rows in pending.items():
+                columns = slice(end - window + 1, end + 1)
+                window_end = first + end * INTERVAL_SECONDS
+                for start in range(0, len(rows), BLOCK_PAIRS):
+                    block = rows[start:start + BLOCK_PAIRS]
+                    mask = common[block, columns]
+                    base = fill_gaps(np.where(mask, matrix[base_rows[block], columns], np.nan))
+                    quote = fill_gaps(np.where(mask, matrix[quote_rows[block], columns], np.nan))
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        values = engle_granger(np.log(quote), np.log(base), max_lag)
+                    for position, row in enumerate(block):
+                        if np.isfinite(values["adf_stat"][position]) and np.isfinite(values["beta"][position]):
+                            tested[known[row]] = _result(values, position, window_end)
+            if tested:
+                db.upsert_cointegration(window, tested)
+            results.update(tested)
+        finally:
+            db.close()
+    except Exception as e:
+        logging.error(f"❌ Помилка перевірки коінтеграції: {e}")
+        return results
+
+    cointegrated = sum(1 for values in results.values() if values and values["significance"])
+    logging.info(
+        f"✅ Коінтеграція: перевірено {len(tested)} пар, з кешу {sum(1 for v in results.values() if v) - len(tested)}, "
+        f"коінтегровано {cointegrated} із {len(pairs)}."
+    )
+    return results
+
+if __name__ == "__main__":
+    # python -m bot.data_processing.cointegration [вікно: 1m|2m|4m] — відстежувані пари та кандидати сканера
+    window = WINDOWS[sys.argv[1]] if len(sys.argv) > 1 else SCREEN_WINDOW
+    manager = JSONManager()
+    pairs = list(dict.fromkeys(item["pair"] for item in manager.get_monitored_pairs() + manager.get_candidate_pairs()))
+    screened = screen_pairs(pairs, window=window)
+    for pair, values in sorted(screened.items(), key=lambda item: item[1]["adf_stat"] if item[1] else np.inf):
+        if values:
+            level = f"{values['significance']}%" if values["significance"] else "—"
+            print(f"{pair}: ADF {values['adf_stat']:.2f}, бета {values['beta']:.4f}, лаг {values['lag']}, значущість {level}")
+        else:
+            print(f"{pair}: недостатньо даних")
@@ -3,10 +3,16 @@ import aiohttp
 import asyncio
 import time
 import json
-import sqlite3
 from bot.config.config import BINANCE_API_KEY
-from datetime import datetime, timezone
-from asyncio import Semaphore
+from bot.data_processing.dependency_index import changed_assets
+from bot.data_processing.metrics_cache import latest_candles
+from bot.database.connection import connect, get_connection
+from bot.database.models import create_price_tables
+from bot.database.db_writer import AsyncDBWriter
+from bot.utils.api_client import fetch_with_retry
+from bot.utils.kline_parser import parse_klines
+from bot.utils.rate_limiter import klines_weight
+from bot.utils.symbol_registry import SymbolRegistry
 
 # Налаштування логування
 LOG_FILE = "zscore_bot.log"
@@ -19,67 +25,144 @@ logging.basicConfig(
 )
 
 BASE_URL = "https://api.binance.com"
-SEM_LIMIT = 14
-semaphore = Semaphore(SEM_LIMIT)
 
 DB_PATH = "bot/data_storage/uniq_tokens.db"
 MONITORED_PAIRS_PATH = "bot/data_storage/monitoredPairs.json"
 
-async def fetch_prices(session, symbol):
-    async with semaphore:
-        url = f"{BASE_URL}/api/v3/klines"
-        params = {"symbol": symbol, "interval": "15m", "limit": 672}
-        headers = {"X-MBX-APIKEY": BINANCE_API_KEY}
-
-        try:
-            async with session.get(url, headers=headers, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                return [
-                    {"timestamp": int(candle[6] / 1000), "price": float(candle[4])}
-                    for candle in data
-                ]
-        except Exception as e:
-            logging.error(f"❌ Помилка завантаження даних для {symbol}: {e}")
-            return []
-
-async def save_to_db(asset, prices):
+CANDLES_LIMIT = 672  # Розмір вікна (тиждень 15-хвилинних свічок)
+INTERVAL_SECONDS = 15 * 60
+# Зберігається найдовше вікно дозавантаження (4 місяці), старші свічки видаляються раз на цикл
+RETENTION_CANDLES = 120 * 24 * 60 * 60 // INTERVAL_SECONDS
+FOLLOW_UP_DELAY = 20  # Секунди до повторного проходу лише по невдалих активах
+
+# Результат останнього циклу: які активи завантажено, а які ні, і які отримали нові свічки
+last_cycle = {"succeeded": set(), "failed": set(), "updated": set(), "finished_at": None}
+
+def fetch_stored_state():
+    """
+    Отримує кількість збережених свічок і час відкриття останньої з них для кожного активу.
+
+    Returns:
+        dict: {актив: (кількість записів, ts останньої свічки в секундах)}.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connect(DB_PATH)
+        create_price_tables(conn)
         cursor = conn.cursor()
-
         cursor.execute(
             """
-            CREATE TABLE IF NOT EXISTS cryptocurrencies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                price REAL NOT NULL,
-                UNIQUE(name, timestamp)
-            )
-            """
-        )
-        cursor.executemany(
+            SELECT s.name, COUNT(*), MAX(p.ts)
+            FROM prices p
+            JOIN symbols s ON s.id = p.symbol_id
+            GROUP BY p.symbol_id
             """
-            INSERT OR IGNORE INTO cryptocurrencies (name, timestamp, price)
-            VALUES (?, ?, ?)
-            """,
-            [
-                (asset, datetime.fromtimestamp(price["timestamp"], tz=timezone.utc).isoformat(), price["price"])
-                for price in prices
-            ]
         )
-        conn.commit()
+        rows = cursor.fetchall()
         conn.close()
-        logging.info(f"✅ Дані для {asset} успішно збережено в базу.")
+        return {name: (count, last_open) for name, count, last_open in rows}
     except Exception as e:
-        logging.error(f"❌ Помилка запису в базу для {asset}: {e}")
+        logging.error(f"❌ Помилка читання стану бази: {e}")
+        return {}
 
-async def process_assets():
-    start_time = time.time()
+def fetch_latest_candles(assets):
+    """
+    Остання свічка кожного активу (пошук по первинному ключу prices).
+
+    Returns:
+        dict: {актив: (ts у секундах, ціна)}; {} у разі помилки (наприклад, бази ще немає).
+    """
+    try:
+        return latest_candles(get_connection(DB_PATH), assets)
+    except Exception as e:
+        logging.error(f"❌ Помилка читання останніх свічок: {e}")
+        return {}
+
+def plan_request(state, now=None):
+    """
+    Визначає параметри запиту свічок для активу.
+
+    Останню збережену свічку запитуємо повторно, бо на момент запису вона могла бути ще не закритою.
+    Повне завантаження виконується лише для нового активу або активу з неповним вікном. Розрив,
+    довший за вікно, дозавантажується сторінками від останньої свічки (fetch_and_queue), щоб у
+    довгій історії не лишилося діри; старші за RETENTION_CANDLES свічки не запитуються.
+
+    Parameters:
+        state (tuple | None): (кількість записів, ts останньої свічки) або None.
+        now (float | None): Поточний час у секундах (для тестів).
+
+    Returns:
+        tuple: (startTime у мілісекундах або None для повного завантаження, limit).
+    """
+    if state is None:
+        return None, CANDLES_LIMIT
+
+    count, last_open = state
+    if count < CANDLES_LIMIT:
+        return None, CANDLES_LIMIT
+
+    now = time.time() if now is None else now
+    missing = int((now - last_open) // INTERVAL_SECONDS) + 1
+    if missing > RETENTION_CANDLES:
+        current_open = int(now) - int(now) % INTERVAL_SECONDS
+        last_open = current_open - (RETENTION_CANDLES - 1) * INTERVAL_SECONDS
+
+    return last_open * 1000, min(missing + 1, CANDLES_LIMIT)
+
+async def fetch_prices(session, symbol, start_time=None, limit=CANDLES_LIMIT, end_time=None):
+    """
+    Завантажує 15-хвилинні свічки з Binance.
+
+    Тимчасові помилки повторюються з експоненційною затримкою (bot/utils/api_client.py).
 
+    Returns:
+        KlineArrays | None: Свічки або None у разі помилки (порожній результат означає, що свічок у діапазоні немає).
+    """
+    url = f"{BASE_URL}/api/v3/klines"
+    params = {"symbol": symbol, "interval": "15m", "limit": limit}
+    if start_time is not None:
+        params["startTime"] = start_time
+    if end_time is not None:
+        params["endTime"] = end_time
+    headers = {"X-MBX-APIKEY": BINANCE_API_KEY}
+
+    try:
+        body = await fetch_with_retry(session, url, params, headers, weight=klines_weight(limit))
+        return parse_klines(body)
+    except Exception as e:
+        logging.error(f"❌ Помилка завантаження даних для {symbol}: {e}")
+        return None
+
+async def fetch_and_queue(session, writer, asset, start_time, limit, closed_only=False):
+    """
+    Завантажує свічки активу та одразу передає їх записувачу, не чекаючи решти запитів.
+
+    Якщо повна сторінка закінчується вже закритою свічкою (розрив довший за limit свічок),
+    наступна сторінка запитується від свічки, що йде за останньою отриманою, доки не буде
+    досягнуто поточної свічки. Уже записані сторінки зберігаються й у разі помилки наступної.
+
+    :param closed_only: Відкинути ще не закриту свічку (для потоку закритих свічок WebSocket).
+    Returns:
+        bool: True, якщо завантаження вдалося.
+    """
+    symbol = f"{asset}USDT"
+    while True:
+        page = await fetch_prices(session, symbol, start_time, limit)
+        if page is None:
+            return False
+        now_ms = time.time() * 1000
+        prices = page.select(page.close_time < now_ms) if closed_only else page
+        if prices:
+            await writer.put(asset, prices)
+        if start_time is None or len(page) < limit or page.close_time[-1] >= now_ms:
+            return True
+        start_time = int(page.open_time[-1]) + INTERVAL_SECONDS * 1000
+
+def load_unique_assets(pairs_path=MONITORED_PAIRS_PATH):
+    """
+    Зчитує пари з JSON-файлу та повертає множину унікальних активів або None у разі помилки.
+    """
     try:
-        with open(MONITORED_PAIRS_PATH, "r") as file:
+        with open(pairs_path, "r") as file:
             monitored_pairs = json.load(file)
         
         # Логування кількості пар
@@ -91,21 +174,94 @@ async def process_assets():
             unique_assets.update([base, quote])
 
         logging.info(f"🔢 Кількість унікальних активів для обробки: {len(unique_assets)}")
+        return unique_assets
     except Exception as e:
         logging.error(f"❌ Помилка читання JSON-файлу: {e}")
+        return None
+
+async def fetch_and_save_assets(session, assets, incremental=True, writer=None, closed_only=False):
+    """
+    Завантажує свічки для набору активів і зберігає їх у базу.
+
+    Запис виконує єдиний AsyncDBWriter паралельно з мережевими запитами.
+
+    Parameters:
+        session: Сесія aiohttp.
+        assets (Iterable[str]): Активи без суфікса USDT.
+        incremental (bool): Запитувати лише відсутні свічки на основі останнього запису в базі.
+        writer (AsyncDBWriter | None): Спільний записувач; якщо не задано — створюється на час виклику.
+        closed_only (bool): Записувати лише закриті свічки.
+
+    Returns:
+        dict: {актив: True/False} — чи вдалося завантаження (а для власного записувача — і запис).
+    """
+    assets = list(assets)
+    stored_state = await asyncio.to_thread(fetch_stored_state) if incremental else {}
+    requests_plan = {asset: plan_request(stored_state.get(asset)) for asset in assets}
+    full_count = sum(1 for start, _ in requests_plan.values() if start is None)
+    logging.info(
+        f"🔢 Інкрементальних запитів: {len(assets) - full_count}, повних завантажень: {full_count}"
+    )
+
+    own_writer = writer is None
+    if own_writer:
+        writer = AsyncDBWriter(DB_PATH, retention=RETENTION_CANDLES)
+        await writer.start()
+    try:
+        results = await asyncio.gather(*(
+            fetch_and_queue(session, writer, asset, *requests_plan[asset], closed_only) for asset in assets
+        ))
+    finally:
+        if own_writer:
+            await writer.close()
+    results = dict(zip(assets, results))
+    if own_writer:
+        # Завантажені, але не записані активи вважаються невдалими й потрапляють у повторний прохід
+        for asset in writer.failed_assets & results.keys():
+            results[asset] = False
+    return results
+
+async def process_assets(incremental=True, registry=None):
+    """
+    Завантажує свічки для всіх унікальних активів із monitoredPairs.json та зберігає їх у базу.
+
+    Активи без активного символу {asset}USDT (делістинг, неіснуючі) пропускаються за реєстром exchangeInfo.
+
+    Parameters:
+        incremental (bool): Запитувати лише відсутні свічки на основі останнього запису в базі.
+        registry (SymbolRegistry | None): Реєстр символів; за замовчуванням — з кешу або API.
+
+    Після основного проходу невдалі активи (записані в last_cycle) завантажуються повторно
+    одним швидким проходом, не чіпаючи решту. Активи, що отримали нові свічки, записуються
+    в last_cycle["updated"] — за ними перераховуються лише зачеплені пари.
+    """
+    start_time = time.time()
+    last_cycle["updated"] = set()
+
+    unique_assets = load_unique_assets()
+    if unique_assets is None:
         return
 
     async with aiohttp.ClientSession() as session:
-        tasks = []
-        for asset in unique_assets:
-            symbol = f"{asset}USDT"
-            tasks.append(fetch_prices(session, symbol))
+        registry = registry or await SymbolRegistry().load(session)
+        unique_assets, _ = registry.validate_assets(unique_assets)
+        before = await asyncio.to_thread(fetch_latest_candles, unique_assets)
+        results = await fetch_and_save_assets(session, unique_assets, incremental)
 
-        all_prices = await asyncio.gather(*tasks)
+        failed = {asset for asset, ok in results.items() if not ok}
+        if failed:
+            logging.warning(f"⚠️ Не завантажено {len(failed)} активів, повторний прохід через {FOLLOW_UP_DELAY} с.")
+            await asyncio.sleep(FOLLOW_UP_DELAY)
+            results.update(await fetch_and_save_assets(session, failed, incremental))
+        after = await asyncio.to_thread(fetch_latest_candles, unique_assets)
 
-        for asset, prices in zip(unique_assets, all_prices):
-            if prices:
-                await save_to_db(asset, prices)
+    last_cycle["updated"] = changed_assets(before, after)
+    last_cycle["succeeded"] = {asset for asset, ok in results.items() if ok}
+    last_cycle["failed"] = {asset for asset, ok in results.items() if not ok}
+    last_cycle["finished_at"] = time.time()
+    logging.info(f"🔢 Активів із новими свічками: {len(last_cycle['updated'])} із {len(unique_assets)}")
+    if last_cycle["failed"]:
+        logging.error(f"❌ Активи без оновлення в цьому циклі: {sorted(last_cycle['failed'])}")
 
     elapsed_time = time.time() - start_time
     logging.info(f"✅ Усі активи оброблено. Час виконання: {elapsed_time:.2f} секунд.")
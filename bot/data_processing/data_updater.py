@@ -2,11 +2,14 @@ import logging
 import aiohttp
 import asyncio
 import time  # Додайте для вимірювання часу
-from bot.database.db_manager import DatabaseManager
+from bot.database.db_manager import DatabaseManager, DATABASE_PATH
+from bot.database.db_writer import AsyncDBWriter
 from bot.data_storage.json_manager import JSONManager
 from bot.config.config import BINANCE_API_KEY  # Імпорт API ключа
-from datetime import datetime, timezone
-from asyncio import Semaphore
+from bot.utils.api_client import fetch_with_retry
+from bot.utils.kline_parser import parse_klines
+from bot.utils.rate_limiter import klines_weight
+from bot.utils.symbol_registry import SymbolRegistry
 
 # Налаштування логування
 LOG_FILE = "zscore_bot.log"
@@ -20,86 +23,68 @@ logging.basicConfig(
 
 BASE_URL = "https://api.binance.com"
 
-SEM_LIMIT = 20  # Максимальна кількість паралельних запитів
-semaphore = Semaphore(SEM_LIMIT)
+CANDLES_LIMIT = 672
+FOLLOW_UP_DELAY = 20  # Секунди до повторного проходу лише по невдалих активах
 
 async def fetch_prices(session, symbol, start_time=None):
-    async with semaphore:  # Використання семафора для обмеження запитів
-        url = f"{BASE_URL}/api/v3/klines"
-        headers = {
-            "X-MBX-APIKEY": BINANCE_API_KEY
-        }
-        params = {
-            "symbol": symbol,
-            "interval": "15m",
-            "limit": 672
-        }
-        if start_time:
-            params["startTime"] = int(start_time.timestamp() * 1000)
-
-        try:
-            async with session.get(url, headers=headers, params=params) as response:
-                response.raise_for_status()
-                data = await response.json()
-                #logging.info(f"✅ Дані для {symbol} отримані. Періоди: {len(data)}.")
-                timestamps = [int(candle[0] / 1000) for candle in data]
-                logging.info(f"🕒 Отримано timestamps для {symbol}: {timestamps}")
-                return [
-                    {"timestamp": int(candle[0] / 1000), "price": float(candle[4])}
-                    for candle in data
-                ]
-        except Exception as e:
-            logging.error(f"❌ Помилка завантаження даних для {symbol}: {e}")
-            return []
-
-async def update_asset(session, db_manager, asset, semaphore):
+    url = f"{BASE_URL}/api/v3/klines"
+    headers = {
+        "X-MBX-APIKEY": BINANCE_API_KEY
+    }
+    params = {
+        "symbol": symbol,
+        "interval": "15m",
+        "limit": CANDLES_LIMIT
+    }
+    if start_time:
+        params["startTime"] = start_time * 1000
+
+    try:
+        # Обмежувач ваги, повтори та запобіжник — у спільному fetch_with_retry
+        body = await fetch_with_retry(session, url, params, headers, weight=klines_weight(CANDLES_LIMIT))
+        klines = parse_klines(body)
+        logging.info(f"✅ Дані для {symbol} отримані. Періоди: {len(klines)}.")
+        return klines
+    except Exception as e:
+        logging.error(f"❌ Помилка завантаження даних для {symbol}: {e}")
+        return None
+
+async def update_asset(session, writer, asset, latest_timestamp):
     """
     Оновлення даних для активу, якщо потрібно.
+    Нові свічки передаються записувачу, тому корутина не блокує event loop зверненнями до бази.
+    :param latest_timestamp: ts останньої збереженої свічки в секундах або None.
+    :return: True, якщо завантаження вдалося.
     """
-    async with semaphore:  # Використання Semaphore для обмеження паралельних запитів
-        start_time = time.time()
-        symbol = f"{asset}USDT"
-
-        # Отримання останнього запису
-        latest_record = db_manager.fetch_latest_price(symbol)
-        start_time_latest = None if not latest_record else datetime.fromisoformat(latest_record[2])
-        if start_time_latest:
-            logging.info(f"✅ Останній запис для {symbol}: {start_time_latest}.")
-
-        # Завантаження даних
-        historical_prices = await fetch_prices(session, symbol, start_time_latest)
-        if not historical_prices:
-            return
-
-        # Визначення кількості нових і наявних періодів
-        existing_timestamps = set(
-            datetime.fromisoformat(record[2]).timestamp() for record in db_manager.fetch_all_crypto_prices(symbol)
-        )
-        new_data = [
-            data for data in historical_prices
-            if data["timestamp"] not in existing_timestamps
-        ]
-        logging.info(f"🔢 Нових періодів для {symbol}: {len(new_data)}.")
-        new_data = [
-            data for data in historical_prices
-            if data["timestamp"] > datetime.fromisoformat(latest_record[2]).timestamp()
-        ]     
-        logging.info(f"🔢 Перевірено нові періоди для {symbol}: {len(new_data)} нових.")
+    start_time = time.time()
+    symbol = f"{asset}USDT"
 
+    if latest_timestamp:
+        logging.info(f"✅ Останній запис для {symbol}: {latest_timestamp}.")
 
-        # Видалення старих даних
-        if len(existing_timestamps) + len(new_data) > 672:
-            db_manager.delete_oldest_crypto_prices(symbol, len(existing_timestamps) + len(new_data) - 672)
-            logging.info(f"🗑️ Видалено старих періодів для {symbol}: {len(existing_timestamps) + len(new_data) - 672}.")
+    # Завантаження даних
+    historical_prices = await fetch_prices(session, symbol, latest_timestamp)
+    if historical_prices is None:
+        return False
+    if not historical_prices:
+        return True
 
-        # Вставка нових даних
-        db_manager.insert_bulk_crypto_prices(symbol, new_data)
+    # Відбір нових періодів; видалення понад 672 виконує записувач у тій самій транзакції
+    new_data = historical_prices
+    if latest_timestamp is not None:
+        new_data = historical_prices.select(historical_prices.open_time // 1000 > latest_timestamp)
+    logging.info(f"🔢 Перевірено нові періоди для {symbol}: {len(new_data)} нових.")
 
-        logging.info(f"✅ Дані для {symbol} оновлено. Усього нових періодів: {len(new_data)}. Час обробки: {time.time() - start_time:.2f} секунд.")
+    if new_data:
+        await writer.put(symbol, new_data)
 
-async def update_all_assets(semaphore):
+    logging.info(f"✅ Дані для {symbol} оновлено. Усього нових періодів: {len(new_data)}. Час обробки: {time.time() - start_time:.2f} секунд.")
+    return True
+
+async def update_all_assets(registry=None):
     """
     Асинхронне оновлення всіх активів із паралельною обробкою.
+    Недійсні та делістингові символи відсіюються за реєстром exchangeInfo до початку запитів.
     """
     json_manager = JSONManager()
     db_manager = DatabaseManager()
@@ -114,17 +99,37 @@ async def update_all_assets(semaphore):
         unique_assets.update([base, quote])
     logging.info(f"🔢 Загальна кількість унікальних активів: {len(unique_assets)}.")
 
+    # Останні записи для всіх активів одним запитом, до початку паралельних завантажень
+    latest_timestamps = db_manager.fetch_latest_timestamps()
+    db_manager.close()
+
     # Початок заміру часу
     start_time = time.time()
     logging.info("⏳ Початок оновлення всіх активів...")
 
-    async with aiohttp.ClientSession() as session:
-        tasks = [update_asset(session, db_manager, asset, semaphore) for asset in unique_assets]
-        await asyncio.gather(*tasks)
+    async with aiohttp.ClientSession() as session, AsyncDBWriter(DATABASE_PATH, retention=CANDLES_LIMIT) as writer:
+        registry = registry or await SymbolRegistry().load(session)
+        unique_assets, _ = registry.validate_assets(unique_assets)
+        unique_assets = list(unique_assets)
+        tasks = [
+            update_asset(session, writer, asset, latest_timestamps.get(f"{asset}USDT"))
+            for asset in unique_assets
+        ]
+        results = await asyncio.gather(*tasks)
+
+        # Повторний прохід лише по активах, що не завантажилися
+        failed = [asset for asset, ok in zip(unique_assets, results) if not ok]
+        if failed:
+            logging.warning(f"⚠️ Не завантажено {len(failed)} активів, повторний прохід через {FOLLOW_UP_DELAY} с.")
+            await asyncio.sleep(FOLLOW_UP_DELAY)
+            results = await asyncio.gather(*(
+                update_asset(session, writer, asset, latest_timestamps.get(f"{asset}USDT")) for asset in failed
+            ))
+            failed = [asset for asset, ok in zip(failed, results) if not ok]
+            if failed:
+                logging.error(f"❌ Активи без оновлення в цьому циклі: {sorted(failed)}")
 
     # Закінчення заміру часу
     end_time = time.time()
     total_time = end_time - start_time
     logging.info(f"✅ Усі активи успішно оновлено. Загальний час обробки: {total_time:.2f} секунд.")
-
-    db_manager.close()
@@ -0,0 +1,46 @@
+"""
+Залежності пар від активів для інкрементального перерахунку.
+
+Один актив входить у багато пар, тож після циклу завантаження достатньо перерахувати
+лише пари, в яких хоча б один актив отримав нові свічки. Індекс актив → пари будується
+один раз на список пар, а зачеплені пари видаються пакетами фіксованого розміру.
+"""
+
+from collections import defaultdict
+
+BATCH_PAIRS = 256  # Кількість пар в одному пакеті перерахунку
+
+def changed_assets(before, after):
+    """
+    Активи, що отримали нові свічки: остання свічка (ts, ціна) змінилася або актив з'явився в базі.
+
+    Порівнюється й ціна, бо завантаження повторно запитує останню збережену свічку й виправляє
+    на місці ціну свічки, що на момент запису була ще не закритою.
+    :param before: Словник {актив: (ts, ціна) останньої свічки} до завантаження.
+    :param after: Те саме після завантаження.
+    :return: Множина активів.
+    """
+    return {asset for asset, candle in after.items() if before.get(asset) != candle}
+
+def batched(pairs, size=BATCH_PAIRS):
+    """Розбиває список пар на пакети не більше size пар."""
+    return [pairs[start:start + size] for start in range(0, len(pairs), size)]
+
+class PairDependencyIndex:
+    """
+    Індекс {актив: пари, до яких він входить} для списку пар 'BASE/QUOTE'.
+    """
+
+    def __init__(self, pairs):
+        self.pairs = list(dict.fromkeys(pairs))
+        self.position = {pair: position for position, pair in enumerate(self.pairs)}
+        self.by_asset = defaultdict(list)
+        for pair in self.pairs:
+            for asset in set(pair.split("/")):
+                self.by_asset[asset].append(pair)
+
+    def affected(self, assets):
+        """Пари, в яких хоча б один актив входить до assets, у порядку списку пар."""
+        affected = {pair for asset in assets for pair in self.by_asset.get(asset, ())}
+        return sorted(affected, key=self.position.get)
+
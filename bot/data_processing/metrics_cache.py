@@ -0,0 +1,224 @@
+"""
+Кеш результатів розрахунку метрик пар.
+
+Ключ запису — (вид розрахунку, база з цінами, пара, вікно); разом із результатом
+зберігається позначка вхідних даних — час останньої свічки, спільної для обох активів
+пари, та ціни на ній (pair_stamps), щоб виправлення незакритої свічки на місці теж
+інвалідувало запис. Поки позначка не змінилася, результат повертається з кешу за O(1)
+без читання цін.
+
+Перший рівень — LRU у пам'яті з обмеженням кількості записів; другий, необов'язковий, —
+таблиця SQLite на диску, що переживає перезапуски (run.py, ручні запуски калькуляторів).
+Якщо історію змінено заднім числом (дозавантаження старих свічок), кеш слід очистити через clear().
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from bot.database.connection import get_connection, transaction
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+CACHE_PATH = Path("bot/data_storage/metrics_cache.db")
+CACHE_SIZE = 10_000  # Записів у пам'яті
+DISK_CACHE_SIZE = 200_000  # Записів на диску
+
+CACHE_DDL = """
+CREATE TABLE IF NOT EXISTS metrics_cache (
+    key TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL,
+    value TEXT NOT NULL,
+    used REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+class MetricsCache:
+    """
+    Дворівневий кеш: OrderedDict як LRU у пам'яті та (за наявності path) таблиця metrics_cache на диску.
+    """
+
+    def __init__(self, capacity=CACHE_SIZE, path=None, disk_capacity=DISK_CACHE_SIZE):
+        self.capacity = capacity
+        self.path = None if path is None else str(path)
+        self.disk_capacity = disk_capacity
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+        if self.path is not None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            get_connection(self.path).execute(CACHE_DDL)
+
+    @staticmethod
+    def make_key(kind, source, pair, window):
+        return f"{kind}|{source}|{pair}|{window}"
+
+    def _remember(self, key, stamp, value):
+        self.entries[key] = (stamp, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def get_many(self, keys_and_stamps):
+        """
+        Шукає записи з відповідною позначкою: спершу в пам'яті, потім на диску.
+        :param keys_and_stamps: Словник {ключ: позначка} (позначки порівнюються як рядки на диску).
+        :return: Словник {ключ: результат} лише для знайдених записів.
+        """
+        found = {}
+        with self.lock:
+            for key, stamp in keys_and_stamps.items():
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] == stamp:
+                    self.entries.move_to_end(key)
+                    found[key] = entry[1]
+
+            missing = [key for key in keys_and_stamps if key not in found]
+            if missing and self.path is not None:
+                connection = get_connection(self.path)
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows = connection.execute(
+                        f"SELECT key, stamp, value FROM metrics_cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, stamp, value in rows:
+                        if stamp == str(keys_and_stamps[key]):
+                            found[key] = json.loads(value)
+                            self._remember(key, keys_and_stamps[key], found[key])
+            self.hits += len(found)
+            self.misses += len(keys_and_stamps) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Записує результати; записи з тим самим ключем і старішою позначкою замінюються.
+        :param items: Словник {ключ: (позначка, результат)}; результат має бути серіалізовним у JSON.
+        """
+        with self.lock:
+            for key, (stamp, value) in items.items():
+                self._remember(key, stamp, value)
+            if self.path is None or not items:
+                return
+            connection = get_connection(self.path)
+            now = time.time()
+            with transaction(connection):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO metrics_cache (key, stamp, value, used) VALUES (?, ?, ?, ?)",
+                    [(key, str(stamp), json.dumps(value), now) for key, (stamp, value) in items.items()],
+                )
+                # Найдавніше використані записи понад ліміт видаляються
+                connection.execute("""
+                DELETE FROM metrics_cache WHERE key IN (
+                    SELECT key FROM metrics_cache ORDER BY used DESC LIMIT -1 OFFSET ?
+                )
+                """, (self.disk_capacity,))
+
+    def clear(self):
+        """Очищає обидва рівні кешу."""
+        with self.lock:
+            self.entries.clear()
+            if self.path is not None:
+                get_connection(self.path).execute("DELETE FROM metrics_cache")
+
+_default_cache = MetricsCache()
+
+def get_cache():
+    """Спільний кеш процесу."""
+    return _default_cache
+
+def enable_disk_cache(path=CACHE_PATH):
+    """Підключає до спільного кешу дисковий рівень (для run.py та ручних запусків)."""
+    global _default_cache
+    _default_cache = MetricsCache(_default_cache.capacity, path)
+    logging.info(f"✅ Дисковий кеш метрик: {path}")
+    return _default_cache
+
+def latest_candles(connection, assets):
+    """
+    Остання свічка кожного активу: один пошук по первинному ключу prices на актив.
+    :return: Словник {актив: (ts, ціна)} (активи без цін відсутні).
+    """
+    assets = sorted(set(assets))
+    latest = {}
+    for start in range(0, len(assets), 500):
+        chunk = assets[start:start + 500]
+        for name, ts, price in connection.execute(f"""
+        SELECT s.name, p.ts, p.price
+        FROM symbols s
+        JOIN prices p ON p.symbol_id = s.id AND p.ts = (SELECT MAX(ts) FROM prices WHERE symbol_id = s.id)
+        WHERE s.name IN ({','.join('?' * len(chunk))})
+        """, chunk):
+            latest[name] = (ts, price)
+    return latest
+
+def pair_stamps(connection, pairs):
+    """
+    Позначка вхідних даних кожної пари: час останньої свічки, спільної для обох активів
+    (менший із останніх ts активів), і ціни обох активів на ній.
+
+    Остання свічка при записі може бути ще не закритою, а наступне завантаження виправляє
+    її ціну на місці без зміни ts, тому ціни входять до позначки.
+    :return: Словник {пара: позначка-рядок або None, якщо цін одного з активів немає}.
+    """
+    latest = latest_candles(connection, {asset for pair in pairs for asset in pair.split("/")})
+    prices = {(asset, ts): price for asset, (ts, price) in latest.items()}
+    commons = {}
+    for pair in pairs:
+        legs = pair.split("/")
+        if all(asset in latest for asset in legs):
+            commons[pair] = min(latest[asset][0] for asset in legs)
+            # Ціна на спільній свічці для активу з новішими свічками — окремий пошук по первинному ключу
+            for asset in legs:
+                if (asset, commons[pair]) not in prices:
+                    prices[(asset, commons[pair])] = (connection.execute("""
+                    SELECT p.price FROM prices p
+                    WHERE p.symbol_id = (SELECT id FROM symbols WHERE name = ?) AND p.ts = ?
+                    """, (asset, commons[pair])).fetchone() or (None,))[0]
+
+    stamps = {}
+    for pair in pairs:
+        if pair not in commons:
+            stamps[pair] = None
+            continue
+        common = commons[pair]
+        stamps[pair] = "|".join([str(common)] + [repr(prices[(asset, common)]) for asset in pair.split("/")])
+    return stamps
+
+def cached_pair_metrics(kind, source, pairs, window, compute, stamps, cache=None):
+    """
+    Повертає метрики пар із кешу й розраховує лише пари без актуального запису.
+
+    Parameters:
+        kind (str): Вид розрахунку (розділяє кеш різних калькуляторів).
+        source (str): База з цінами.
+        pairs (list): Список пар.
+        window: Опис вікна (частина ключа).
+        compute (callable): compute(пари) -> {пара: результат} для пар, яких немає в кеші.
+        stamps (dict): Позначки вхідних даних {пара: позначка}; пари з None не кешуються.
+        cache (MetricsCache | None): Кеш; за замовчуванням — спільний.
+
+    Returns:
+        dict: {пара: результат} у порядку pairs.
+    """
+    cache = get_cache() if cache is None else cache
+    keys = {pair: cache.make_key(kind, source, pair, window) for pair in pairs}
+    found = cache.get_many({keys[pair]: stamps[pair] for pair in pairs if stamps.get(pair) is not None})
+    missing = [pair for pair in pairs if keys[pair] not in found]
+    computed = compute(missing) if missing else {}
+    cache.put_many({
+        keys[pair]: (stamps[pair], computed[pair])
+        for pair in missing if stamps.get(pair) is not None and computed.get(pair) is not None
+    })
+    if found:
+        logging.info(f"✅ Кеш метрик ({kind}): {len(found)} із {len(pairs)} пар без перерахунку.")
+    return {pair: found[keys[pair]] if keys[pair] in found else computed.get(pair) for pair in pairs}
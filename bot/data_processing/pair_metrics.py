@@ -0,0 +1,221 @@
+import logging
+import numpy as np
+from bot.config.config import DATABASE_PATH
+from bot.data_processing.backfill import WINDOWS
+from bot.data_processing.data_672 import DB_PATH
+from bot.data_processing.dependency_index import PairDependencyIndex, batched
+from bot.data_processing.metrics_cache import cached_pair_metrics, pair_stamps
+from bot.data_processing.parallel import CHUNK_PAIRS, DEFAULT_WORKERS, map_pairs
+from bot.data_processing.percentile import row_percentiles
+from bot.data_processing.spread_engine import ols_beta
+from bot.data_processing.zscore_engine import MIN_COVERAGE, load_grid_matrix
+from bot.data_storage.json_manager import JSONManager
+from bot.database.connection import get_connection
+from bot.database.db_manager import DatabaseManager
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+BLOCK_PAIRS = 256  # Кількість пар в одному блоці (обмежує пам'ять: блок × найдовше вікно)
+METRIC_NAMES = ("zscore", "correlation", "beta_coef", "percentile_90", "percentile_10")
+
+def _window_sums(values, starts):
+    """
+    Суми значень за вкладеними вікнами з однаковим кінцем за один прохід.
+
+    np.add.reduceat рахує суми сегментів між початками вікон, а суфіксна сума
+    сегментів дає суму кожного вікна: довше вікно = коротше + попередні сегменти.
+
+    :param values: Матриця (пари × свічки) з нулями замість пропусків.
+    :param starts: Початки вікон за зростанням (від найдовшого до найкоротшого).
+    :return: Матриця (пари × вікна) у порядку starts.
+    """
+    segments = np.add.reduceat(values, starts, axis=1)
+    return np.cumsum(segments[:, ::-1], axis=1)[:, ::-1]
+
+def _block_metrics(base, quote, starts, lengths):
+    """Метрики блоку пар для всіх вікон: словник {метрика: матриця (пари × вікна)}."""
+    valid = (base > 0) & (quote > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(valid, base / quote, np.nan)
+        x = np.where(valid, np.log(quote), np.nan)
+        y = np.where(valid, np.log(base), np.nan)
+
+        # Зсув на середні найдовшого вікна прибирає втрату точності у var = E[v²] - E[v]²
+        count = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+        shift = [np.where(valid, v, 0.0).sum(axis=1, keepdims=True) / count for v in (s, x, y)]
+        ds, dx, dy = (np.where(valid, v - c, 0.0) for v, c in zip((s, x, y), shift))
+
+        n = _window_sums(valid.astype(np.float64), starts)
+        total_x, total_y, total_xx, total_xy = (_window_sums(v, starts) for v in (dx, dy, dx * dx, dx * dy))
+        sum_s, sum_x, sum_y = _window_sums(ds, starts) / n, total_x / n, total_y / n
+        var_s = np.maximum(_window_sums(ds * ds, starts) / n - sum_s ** 2, 0.0)
+        var_x = np.maximum(total_xx / n - sum_x ** 2, 0.0)
+        var_y = np.maximum(_window_sums(dy * dy, starts) / n - sum_y ** 2, 0.0)
+        cov = total_xy / n - sum_x * sum_y
+        std_s = np.sqrt(var_s)
+        # Та сама формула, що й у ковзній регресії spread_engine: beta_coef — її останнє значення
+        _, beta = ols_beta(n, total_x, total_y, total_xx, total_xy)
+
+        # Останнє спільне значення курсу (однакове для всіх вікон, бо вони закінчуються разом)
+        last_column = np.where(valid.any(axis=1), valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1), 0)
+        last = s[np.arange(s.shape[0]), last_column][:, None]
+
+        metrics = {
+            "zscore": np.where(std_s > 0, (last - shift[0] - sum_s) / std_s, np.nan),
+            "correlation": np.where((var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan),
+            "beta_coef": beta,
+        }
+
+    # Процентилі — вибіркою через np.partition, без повного сортування
+    total = s.shape[1]
+    percentiles = np.stack([row_percentiles(s[:, total - length:], (90, 10)) for length in lengths], axis=1)
+    metrics["percentile_90"] = percentiles[..., 0]
+    metrics["percentile_10"] = percentiles[..., 1]
+
+    enough = n >= np.ceil(MIN_COVERAGE * np.array(lengths))
+    metrics = {name: np.where(enough, values, np.nan) for name, values in metrics.items()}
+    metrics["cross_rate"] = last[:, 0]
+    return metrics
+
+def compute_pair_metrics(matrix, index, pairs, windows=WINDOWS):
+    """
+    Розраховує zscore, correlation, beta_coef, percentile_90 і percentile_10 за всіма вікнами.
+
+    Вікна — останні N свічок сітки (матриця має бути вирівняна по 15-хвилинній сітці,
+    останній стовпець — найновіша свічка). Курс пари s = base / quote; кореляція та бета
+    (нахил МНК ln(base) на ln(quote)) рахуються за логарифмами цін. Суми для всіх вікон
+    отримуються за один прохід по блоку пар.
+
+    Parameters:
+        matrix (np.ndarray): Ціни активів (активи × свічки) з NaN для пропусків.
+        index (dict): Відповідність {актив: рядок матриці}.
+        pairs (list): Список пар 'BASE/QUOTE'.
+        windows (dict): Вікна {назва: кількість свічок}.
+
+    Returns:
+        dict: {пара: {"zscore_1m": ..., "percentile_10_4m": ..., "cross_rate": ...}};
+            None для метрик, які неможливо розрахувати (недостатнє покриття вікна тощо).
+    """
+    names = sorted(windows, key=windows.get, reverse=True)
+    lengths = [windows[name] for name in names]
+    longest = lengths[0]
+    if matrix.shape[1] < longest:
+        matrix = np.hstack([np.full((matrix.shape[0], longest - matrix.shape[1]), np.nan), matrix])
+    matrix = matrix[:, matrix.shape[1] - longest:]
+    starts = np.array([longest - length for length in lengths])
+
+    empty = {f"{metric}_{name}": None for metric in METRIC_NAMES for name in windows}
+    results = {pair: dict(empty, cross_rate=None) for pair in pairs}
+    known = [pair for pair in pairs if all(asset in index for asset in pair.split("/"))]
+
+    for start in range(0, len(known), BLOCK_PAIRS):
+        block = known[start:start + BLOCK_PAIRS]
+        base = matrix[[index[pair.split("/")[0]] for pair in block]]
+        quote = matrix[[index[pair.split("/")[1]] for pair in block]]
+        metrics = _block_metrics(base, quote, starts, lengths)
+
+        for row, pair in enumerate(block):
+            values = results[pair]
+            for column, name in enumerate(names):
+                for metric in METRIC_NAMES:
+                    value = metrics[metric][row, column]
+                    if not np.isnan(value):
+                        digits = 2 if metric == "zscore" else 4 if metric in ("correlation", "beta_coef") else None
+                        values[f"{metric}_{name}"] = round(float(value), digits) if digits else float(value)
+            if not np.isnan(metrics["cross_rate"][row]):
+                values["cross_rate"] = float(metrics["cross_rate"][row])
+    return results
+
+def update_pair_metrics(prices_db=DB_PATH, metrics_db=DATABASE_PATH, windows=WINDOWS, workers=DEFAULT_WORKERS, changed_assets=None):
+    """
+    Розраховує метрики для пар із monitoredPairs.json і записує їх у JSON та базу.
+    Якщо з попереднього розрахунку свічки пари не змінилися, метрики беруться з кешу.
+
+    Parameters:
+        prices_db (str): База з цінами (таблиця prices).
+        metrics_db (str): База з таблицями pairs, pair_metrics і pair_window_metrics.
+        windows (dict): Вікна {назва: кількість свічок}.
+        workers (int): Кількість процесів (пари розподіляються блоками по CHUNK_PAIRS).
+        changed_assets (set | None): Активи, що отримали нові свічки в цьому циклі. Якщо задано,
+            перераховуються лише пари з хоча б одним таким активом (і пари без жодного розрахунку),
+            пакетами по dependency_index.BATCH_PAIRS; решта пар зберігає попередні значення. None — усі пари.
+
+    Returns:
+        dict: Метрики {пара: {...}} перерахованих пар або {} у разі помилки.
+    """
+    try:
+        manager = JSONManager()
+        items = manager.get_monitored_pairs()
+        pairs = [item["pair"] for item in items]
+        if not pairs:
+            logging.warning("⚠️ monitoredPairs.json не містить пар.")
+            return {}
+
+        shortest = min(windows, key=windows.get)
+        selected = pairs
+        if changed_assets is not None:
+            dependencies = PairDependencyIndex(pairs)
+            uncomputed = {item["pair"] for item in items if f"zscore_{shortest}" not in item}
+            affected = set(dependencies.affected(changed_assets)) | uncomputed
+            selected = [pair for pair in dependencies.pairs if pair in affected]
+            logging.info(f"🔄 Зачеплено {len(selected)} із {len(pairs)} пар ({len(changed_assets)} активів із новими свічками).")
+            if not selected:
+                return {}
+
+        latest = get_connection(prices_db).execute("SELECT MAX(ts) FROM prices").fetchone()[0]
+        if latest is None:
+            logging.warning("⚠️ У базі немає цін для розрахунку метрик.")
+            return {}
+
+        def compute(missing):
+            assets = {asset for pair in missing for asset in pair.split("/")}
+            index, _, matrix = load_grid_matrix(get_connection(prices_db), assets, max(windows.values()))
+            return map_pairs(compute_pair_metrics, matrix, index, missing, workers, CHUNK_PAIRS, windows=windows)
+
+        # Вікна закінчуються на найновішій свічці бази, тож позначка — вона разом з останньою
+        # спільною свічкою пари. Кожен пакет читає з бази лише ціни своїх активів.
+        window_key = ",".join(f"{name}={length}" for name, length in windows.items())
+        stamps = {pair: stamp and f"{latest}|{stamp}" for pair, stamp in pair_stamps(get_connection(prices_db), selected).items()}
+        results = {}
+        for batch in batched(selected):
+            results.update(cached_pair_metrics("pair_metrics", prices_db, batch, window_key, compute, stamps))
+
+        fields = [f"{metric}_{name}" for name in windows for metric in METRIC_NAMES]
+        for item in items:
+            if item["pair"] in results:
+                item.update({field: results[item["pair"]][field] for field in fields})
+        manager.update_monitored_pairs(items, backup=False)
+
+        db = DatabaseManager(metrics_db)
+        try:
+            db.upsert_pair_metrics(latest, {
+                pair: {
+                    "zscore": values[f"zscore_{shortest}"],
+                    "cross_rate": values["cross_rate"],
+                    "correlation": values[f"correlation_{shortest}"],
+                    "beta": values[f"beta_coef_{shortest}"],
+                }
+                for pair, values in results.items()
+            })
+            db.upsert_pair_window_metrics(latest, results, list(windows))
+        finally:
+            db.close()
+    except Exception as e:
+        logging.error(f"❌ Помилка розрахунку метрик пар: {e}")
+        return {}
+
+    success_count = sum(1 for values in results.values() if values[f"zscore_{shortest}"] is not None)
+    logging.info(f"✅ Метрики за вікнами {', '.join(windows)} розраховано для {success_count} із {len(results)} пар.")
+    return results
+
+if __name__ == "__main__":
+    metrics = update_pair_metrics()
+    print(f"Розраховано метрики для {len(metrics)} пар.")
@@ -0,0 +1,176 @@
+import logging
+import sys
+import time
+import numpy as np
+from bot.data_processing.backfill import WINDOWS
+from bot.data_processing.data_672 import DB_PATH
+from bot.data_processing.zscore_engine import MIN_COVERAGE, load_grid_matrix
+from bot.data_storage.json_manager import JSONManager
+from bot.database.connection import get_connection
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+SCAN_WINDOW = WINDOWS["1m"]
+TOP_K = 50
+MIN_CORRELATION = 0.9
+MIN_ABS_ZSCORE = 0.0
+SORT_KEYS = ("abs_zscore", "correlation")
+BLOCK_ASSETS = 128  # Рядків кореляційної матриці в одному блоці (пам'ять: блок × активи)
+CHUNK_PAIRS = 4096  # Пар в одному блоці розрахунку Z-Score (пам'ять: блок × вікно)
+
+def fill_gaps(prices):
+    """
+    Заповнює пропуски останньою відомою ціною (початкові пропуски — першою відомою).
+    :param prices: Матриця (активи × свічки) з NaN; рядки мають містити хоча б одну ціну.
+    """
+    valid = ~np.isnan(prices)
+    columns = np.where(valid, np.arange(prices.shape[1]), -1)
+    np.maximum.accumulate(columns, axis=1, out=columns)
+    first = np.argmax(valid, axis=1)[:, None]
+    columns = np.where(columns < 0, first, columns)
+    return np.take_along_axis(prices, columns, axis=1)
+
+def _correlated_pairs(log_prices, min_correlation, block_size):
+    """
+    Пари рядків із кореляцією не нижче порогу.
+
+    Рядки нормуються до нульового середнього й одиничної норми, тому кореляційна матриця —
+    це добуток Z @ Z.T. Він рахується смугами по block_size рядків (лише верхній трикутник),
+    тож пам'ять обмежена block_size × активи.
+
+    :return: (індекси першого активу, індекси другого активу, кореляції).
+    """
+    centered = log_prices - log_prices.mean(axis=1, keepdims=True)
+    normalized = centered / np.linalg.norm(centered, axis=1, keepdims=True)
+    first, second, correlations = [], [], []
+    for start in range(0, normalized.shape[0], block_size):
+        block = normalized[start:start + block_size] @ normalized[start:].T
+        upper = np.arange(block.shape[1]) > np.arange(block.shape[0])[:, None]
+        rows, columns = np.nonzero(upper & (block >= min_correlation))
+        first.append(rows + start)
+        second.append(columns + start)
+        correlations.append(np.minimum(block[rows, columns], 1.0))
+    return np.concatenate(first), np.concatenate(second), np.concatenate(correlations)
+
+def _ratio_zscores(prices, first, second, chunk_size):
+    """Z-Score останнього значення курсу prices[first] / prices[second] блоками по chunk_size пар."""
+    zscores = np.empty(first.size)
+    for start in range(0, first.size, chunk_size):
+        stop = start + chunk_size
+        synthetic = prices[first[start:stop]] / prices[second[start:stop]]
+        std_dev = synthetic.std(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            zscores[start:stop] = np.where(std_dev > 0, (synthetic[:, -1] - synthetic.mean(axis=1)) / std_dev, np.nan)
+    return zscores
+
+def scan_matrix(prices, names, top_k=TOP_K, min_correlation=MIN_CORRELATION, min_abs_zscore=MIN_ABS_ZSCORE,
+                sort_by="abs_zscore", block_size=BLOCK_ASSETS, chunk_size=CHUNK_PAIRS):
+    """
+    Шукає найкращі пари серед усіх комбінацій активів.
+
+    Кореляція — Пірсона за логарифмами цін (як correlation_* у pair_metrics); Z-Score — останнього
+    значення курсу BASE/QUOTE, де BASE — актив, що йде першим у names. Z-Score рахується лише
+    для пар, що пройшли поріг кореляції; найкращі top_k вибираються через np.argpartition.
+
+    Parameters:
+        prices (np.ndarray): Ціни (активи × свічки) без пропусків, усі більші за нуль.
+        names (list): Назви активів у порядку рядків.
+        top_k (int): Кількість пар у результаті.
+        min_correlation (float): Мінімальна кореляція.
+        min_abs_zscore (float): Мінімальний модуль Z-Score.
+        sort_by (str): Критерій відбору: "abs_zscore" або "correlation".
+        block_size (int): Рядків кореляційної матриці в одному блоці.
+        chunk_size (int): Пар в одному блоці розрахунку Z-Score.
+
+    Returns:
+        list: [{"pair", "zscore", "correlation"}] у порядку спадання критерію.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"Невідомий критерій сортування: {sort_by}")
+    if len(names) < 2:
+        return []
+
+    first, second, correlations = _correlated_pairs(np.log(prices), min_correlation, block_size)
+    zscores = _ratio_zscores(prices, first, second, chunk_size)
+    keep = np.abs(zscores) >= min_abs_zscore  # NaN відкидається
+    first, second, correlations, zscores = first[keep], second[keep], correlations[keep], zscores[keep]
+
+    score = np.abs(zscores) if sort_by == "abs_zscore" else correlations
+    if score.size > top_k:
+        selected = np.argpartition(-score, top_k - 1)[:top_k]
+    else:
+        selected = np.arange(score.size)
+    selected = selected[np.argsort(-score[selected], kind="stable")]
+    return [
+        {"pair": f"{names[first[i]]}/{names[second[i]]}", "zscore": round(float(zscores[i]), 2), "correlation": round(float(correlations[i]), 4)}
+        for i in selected
+    ]
+
+def scan_universe(db_path=DB_PATH, window=SCAN_WINDOW, **criteria):
+    """
+    Сканує всі активи бази за останні window свічок.
+
+    Активи з покриттям вікна нижче MIN_COVERAGE відкидаються; поодинокі пропуски решти
+    заповнюються останньою відомою ціною.
+
+    :param criteria: Параметри scan_matrix (top_k, min_correlation, min_abs_zscore, sort_by, ...).
+    :return: Список кандидатів або [] у разі помилки.
+    """
+    try:
+        started = time.perf_counter()
+        connection = get_connection(db_path)
+        assets = [name for (name,) in connection.execute("SELECT name FROM symbols ORDER BY name")]
+        index, latest, matrix = load_grid_matrix(connection, assets, window)
+        if latest is None:
+            logging.warning("⚠️ У базі немає цін для сканування.")
+            return []
+
+        names = sorted(index, key=index.get)
+        valid = ~np.isnan(matrix)
+        usable = (valid.sum(axis=1) >= MIN_COVERAGE * window) & ~(matrix <= 0).any(axis=1)
+        prices = fill_gaps(matrix[usable])
+        # Актив зі сталою ціною не має кореляції ні з чим
+        usable_names = [name for name, ok in zip(names, usable) if ok]
+        constant = prices.min(axis=1) == prices.max(axis=1)
+        prices = prices[~constant]
+        usable_names = [name for name, flat in zip(usable_names, constant) if not flat]
+
+        candidates = scan_matrix(prices, usable_names, **criteria)
+        pair_count = len(usable_names) * (len(usable_names) - 1) // 2
+        logging.info(
+            f"✅ Сканування: {len(usable_names)} активів, {pair_count} пар, {len(candidates)} кандидатів "
+            f"за {time.perf_counter() - started:.2f} с."
+        )
+        return candidates
+    except Exception as e:
+        logging.error(f"❌ Помилка сканування пар: {e}")
+        return []
+
+def update_candidate_pairs(db_path=DB_PATH, window=SCAN_WINDOW, **criteria):
+    """
+    Сканує базу й записує кандидатів, яких ще немає в monitoredPairs.json, у candidatePairs.json.
+    :return: Список записаних кандидатів.
+    """
+    manager = JSONManager()
+    monitored = {frozenset(item["pair"].split("/")) for item in manager.get_monitored_pairs()}
+    candidates = [
+        candidate for candidate in scan_universe(db_path, window, **criteria)
+        if frozenset(candidate["pair"].split("/")) not in monitored
+    ]
+    manager.update_candidate_pairs(candidates)
+    return candidates
+
+if __name__ == "__main__":
+    # python -m bot.data_processing.pair_scanner [top_k] [abs_zscore|correlation]
+    top_k = int(sys.argv[1]) if len(sys.argv) > 1 else TOP_K
+    sort_by = sys.argv[2] if len(sys.argv) > 2 else "abs_zscore"
+    for candidate in update_candidate_pairs(top_k=top_k, sort_by=sort_by):
+        print(candidate)
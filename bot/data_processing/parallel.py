@@ -0,0 +1,101 @@
+"""
+Паралельний розрахунок метрик пар у пулі процесів.
+
+Матриця цін (активи × свічки) один раз копіюється в multiprocessing.shared_memory;
+процеси пулу під'єднуються до неї в ініціалізаторі й бачать її як np.ndarray без
+копіювання та серіалізації. Кожне завдання отримує лише список пар свого блоку.
+Блоки утворюються з послідовних відрізків списку пар і збираються в тому самому
+порядку, тому результат детермінований і збігається з послідовним викликом.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNK_PAIRS = 256
+
+# Стан процесу пулу: під'єднана спільна пам'ять, матриця та індекс активів
+_worker = {}
+
+class SharedPriceMatrix:
+    """
+    Копія матриці цін у спільній пам'яті; блок звільняється при виході з контексту.
+    """
+
+    def __init__(self, matrix):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        self.shape = matrix.shape
+        self.memory = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        np.ndarray(self.shape, dtype=np.float64, buffer=self.memory.buf)[...] = matrix
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def close(self):
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _attach(name, shape, index):
+    """Ініціалізатор процесу пулу: під'єднання до спільної матриці (лише читання)."""
+    memory = shared_memory.SharedMemory(name=name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+    matrix.flags.writeable = False
+    _worker.update(memory=memory, matrix=matrix, index=index)
+
+def _run_chunk(task):
+    func, pairs, kwargs = task
+    return func(_worker["matrix"], _worker["index"], pairs, **kwargs)
+
+def map_pairs(func, matrix, index, pairs, workers=DEFAULT_WORKERS, chunk_size=CHUNK_PAIRS, **kwargs):
+    """
+    Виконує func(matrix, index, пари_блоку, **kwargs) для блоків пар у пулі процесів.
+
+    func має бути функцією рівня модуля (її передають у процеси за іменем) і повертати
+    словник {пара: результат}; результат кожної пари не повинен залежати від інших пар блоку.
+    При workers <= 1 або одному блоці пул не створюється.
+
+    Parameters:
+        func (callable): Розрахунок для блоку пар.
+        matrix (np.ndarray): Ціни (активи × свічки).
+        index (dict): Відповідність {актив: рядок матриці}.
+        pairs (list): Список пар 'BASE/QUOTE'.
+        workers (int): Кількість процесів.
+        chunk_size (int): Кількість пар в одному завданні.
+
+    Returns:
+        dict: Об'єднані результати в порядку pairs.
+    """
+    pairs = list(pairs)
+    chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return func(matrix, index, pairs, **kwargs)
+
+    results = {}
+    with SharedPriceMatrix(matrix) as shared:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)), initializer=_attach, initargs=(shared.name, shared.shape, index)
+        ) as pool:
+            for chunk_results in pool.map(_run_chunk, [(func, chunk, kwargs) for chunk in chunks]):
+                results.update(chunk_results)
+    logging.info(f"✅ Паралельний розрахунок: {len(pairs)} пар, {len(chunks)} блоків, {min(workers, len(chunks))} процесів.")
+    return results
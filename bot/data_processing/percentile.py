@@ -0,0 +1,43 @@
+import numpy as np
+
+def _lerp(lower, upper, fraction):
+    """Лінійна інтерполяція в тій самій формі, що й у np.percentile (результати збігаються побітово)."""
+    result = lower + (upper - lower) * fraction
+    return np.where(fraction >= 0.5, upper - (upper - lower) * (1 - fraction), result)
+
+def _select(values, count, quantiles):
+    """Процентилі рядків без NaN довжини count через np.partition замість повного сортування."""
+    positions = np.asarray(quantiles, dtype=np.float64) / 100 * (count - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    partitioned = np.partition(values, np.unique(np.concatenate([lower, upper])), axis=-1)
+    return _lerp(partitioned[..., lower], partitioned[..., upper], positions - lower)
+
+def row_percentiles(values, quantiles):
+    """
+    Процентилі кожного рядка матриці з пропусками (NaN), як np.nanpercentile(values, quantiles, axis=1).T.
+
+    Рядки без пропусків обробляються одним викликом np.partition для всіх рядків одразу;
+    рядки з пропусками — окремо, лише для своїх дійсних значень.
+
+    Parameters:
+        values (np.ndarray): Матриця (рядки × значення).
+        quantiles (Iterable[float]): Процентилі від 0 до 100.
+
+    Returns:
+        np.ndarray: Матриця (рядки × процентилі); NaN для рядків без дійсних значень.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    quantiles = list(quantiles)
+    result = np.full((values.shape[0], len(quantiles)), np.nan)
+    if values.shape[1] == 0:
+        return result
+
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=1)
+    complete = counts == values.shape[1]
+    if complete.any():
+        result[complete] = _select(values[complete], values.shape[1], quantiles)
+    for row in np.flatnonzero(~complete & (counts > 0)):
+        result[row] = _select(values[row, valid[row]], counts[row], quantiles)
+    return result
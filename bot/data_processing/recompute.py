@@ -0,0 +1,104 @@
+"""
+Перерахунок метрик після нових свічок.
+
+recompute_changed — спільна послідовність для циклу за розкладом і для WebSocket-режиму:
+ковзні тижневі статистики, метрики лише зачеплених пар (індекс залежностей) і Z-Score 1h/4h.
+У WebSocket-режимі записувач повідомляє активи кожного записаного пакета, а DebouncedRecompute
+збирає їх і запускає один перерахунок, коли пакети перестають надходити (свічки всіх активів
+закриваються одночасно, тож на кожне закриття припадає один невеликий перерахунок).
+"""
+
+import asyncio
+import logging
+import time
+from bot.data_processing.pair_metrics import update_pair_metrics
+from bot.data_processing.resample import update_timeframe_zscores
+from bot.data_processing.rolling_stats import update_rolling_stats
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+DEBOUNCE_SECONDS = 2  # Пауза без нових пакетів перед перерахунком
+MAX_DELAY_SECONDS = 10  # Найдовше очікування від першого пакета до перерахунку
+
+def recompute_changed(changed_assets):
+    """
+    Перераховує метрики після завантаження свічок.
+
+    :param changed_assets: Активи, що отримали нові свічки; None — усі пари.
+    :return: Метрики {пара: {...}} перерахованих пар (як update_pair_metrics).
+    """
+    update_rolling_stats()
+    results = update_pair_metrics(changed_assets=changed_assets)
+    update_timeframe_zscores()
+    return results
+
+class DebouncedRecompute:
+    """
+    Збирає активи записаних пакетів і запускає recompute(активи) в окремому потоці
+    після паузи delay секунд без нових пакетів (але не пізніше max_delay від першого).
+    Одночасно виконується не більше одного перерахунку.
+    """
+
+    def __init__(self, recompute=recompute_changed, delay=DEBOUNCE_SECONDS, max_delay=MAX_DELAY_SECONDS):
+        self.recompute = recompute
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = set()
+        self.runs = 0
+        self._changed = asyncio.Event()
+        self._closing = False
+        self._task = None
+
+    def notify(self, assets):
+        """Додає активи записаного пакета (виклик on_commit записувача)."""
+        self.pending.update(assets)
+        self._changed.set()
+
+    async def start(self):
+        """Запускає задачу перерахунку."""
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Дочікується поточного перерахунку й виконує останній для активів, що ще очікують."""
+        self._closing = True
+        self._changed.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self):
+        while not self._closing:
+            await self._changed.wait()
+            await self._debounce()
+            if self.pending:
+                await self._flush()
+        if self.pending:
+            await self._flush()
+
+    async def _debounce(self):
+        started = time.monotonic()
+        while not self._closing:
+            self._changed.clear()
+            remaining = min(self.delay, self.max_delay - (time.monotonic() - started))
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return
+
+    async def _flush(self):
+        assets, self.pending = self.pending, set()
+        logging.info(f"🔄 Перерахунок метрик після нових свічок: {len(assets)} активів.")
+        try:
+            await asyncio.to_thread(self.recompute, assets)
+        except Exception as e:
+            logging.error(f"❌ Помилка перерахунку метрик: {e}")
+        self.runs += 1
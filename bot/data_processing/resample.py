@@ -0,0 +1,181 @@
+import logging
+import numpy as np
+from bot.database.connection import get_connection
+from bot.data_processing.data_672 import DB_PATH, INTERVAL_SECONDS
+from bot.data_storage.json_manager import JSONManager
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+# Старші таймфрейми, що будуються з 15-хвилинних свічок (тривалість у секундах)
+TIMEFRAMES = {
+    "30m": 30 * 60,
+    "1h": 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+ZSCORE_TIMEFRAMES = ("1h", "4h")  # Таймфрейми Z-Score, що записуються в monitoredPairs.json
+ZSCORE_BARS = 168  # Вікно Z-Score старших таймфреймів у барах
+
+def resample_closes(open_times, closes, timeframe):
+    """
+    Будує ціни закриття старшого таймфрейму з 15-хвилинних свічок.
+
+    Ціна закриття бару — ціна останньої 15-хвилинної свічки в ньому. Останній бар
+    повертається лише тоді, коли в ньому вже є завершальна 15-хвилинна свічка.
+
+    Parameters:
+        open_times (np.ndarray): Час відкриття 15-хвилинних свічок у секундах (зростання), як у базі.
+        closes (np.ndarray): Ціни закриття.
+        timeframe (str): Ключ із TIMEFRAMES.
+
+    Returns:
+        tuple: (час відкриття барів у секундах, ціни закриття барів).
+    """
+    tf_seconds = TIMEFRAMES[timeframe]
+    open_times = np.asarray(open_times, dtype=np.int64)
+    closes = np.asarray(closes, dtype=np.float64)
+    if open_times.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    bars = open_times // tf_seconds
+    last_in_bar = np.flatnonzero(np.append(bars[1:] != bars[:-1], True))
+
+    if open_times[-1] != (bars[-1] + 1) * tf_seconds - INTERVAL_SECONDS:
+        last_in_bar = last_in_bar[:-1]
+    return bars[last_in_bar] * tf_seconds, closes[last_in_bar]
+
+class Resampler:
+    """
+    Кеш старших таймфреймів поверх таблиці prices.
+
+    Перший запит для активу читає його історію (за max_bars — лише останні max_bars барів);
+    наступні читають з бази лише свічки після останнього завершеного бару і дописують нові
+    бари до кешу, обрізаючи його до max_bars. Додаткових запитів до API не потрібно.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_bars=None):
+        """
+        :param db_path: База з таблицею prices.
+        :param max_bars: Скільки останніх завершених барів тримати в кеші (None — без обмеження).
+        """
+        self.db_path = db_path
+        self.max_bars = max_bars
+        self.cache = {}
+
+    def _read_closes(self, asset, since=None):
+        rows = get_connection(self.db_path).execute("""
+        SELECT p.ts, p.price FROM prices p
+        JOIN symbols s ON s.id = p.symbol_id
+        WHERE s.name = ? AND p.ts >= ?
+        ORDER BY p.ts ASC
+        """, (asset, 0 if since is None else int(since))).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        timestamps, prices = zip(*rows)
+        return np.array(timestamps, dtype=np.int64), np.array(prices, dtype=np.float64)
+
+    def get(self, asset, timeframe):
+        """
+        Повертає (час відкриття барів, ціни закриття) для активу, оновлюючи кеш інкрементально.
+        """
+        tf_seconds = TIMEFRAMES[timeframe]
+        cached = self.cache.get((asset, timeframe))
+        try:
+            if cached is None:
+                since = None
+                if self.max_bars is not None:
+                    latest = get_connection(self.db_path).execute("""
+                    SELECT MAX(p.ts) FROM prices p
+                    WHERE p.symbol_id = (SELECT id FROM symbols WHERE name = ?)
+                    """, (asset,)).fetchone()[0]
+                    if latest is not None:
+                        # Останні max_bars завершених барів і поточний незавершений
+                        since = (latest // tf_seconds - self.max_bars) * tf_seconds
+                times, closes = resample_closes(*self._read_closes(asset, since), timeframe)
+            else:
+                cached_times, cached_closes = cached
+                # Свічки, що належать барам після останнього завершеного
+                since = cached_times[-1] + tf_seconds if cached_times.size else None
+                new_times, new_closes = resample_closes(*self._read_closes(asset, since), timeframe)
+                times = np.concatenate([cached_times, new_times])
+                closes = np.concatenate([cached_closes, new_closes])
+            if self.max_bars is not None:
+                times, closes = times[-self.max_bars:], closes[-self.max_bars:]
+        except Exception as e:
+            logging.error(f"❌ Помилка ресемплінгу {asset} до {timeframe}: {e}")
+            return cached if cached is not None else (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+        self.cache[(asset, timeframe)] = (times, closes)
+        return times, closes
+
+    def retain(self, assets):
+        """Видаляє з кешу ряди активів, яких немає в assets (пари перестали відстежуватися)."""
+        assets = set(assets)
+        for key in [key for key in self.cache if key[0] not in assets]:
+            del self.cache[key]
+
+    def pair_zscore(self, pair, timeframe, bars=ZSCORE_BARS):
+        """
+        Z-Score синтетичного курсу пари за останні bars спільних завершених барів таймфрейму.
+
+        Returns:
+            float | None: Z-Score (2 знаки) або None, якщо спільних барів замало чи ціни некоректні.
+        """
+        base_asset, quote_asset = pair.split("/")
+        base_times, base_closes = self.get(base_asset, timeframe)
+        quote_times, quote_closes = self.get(quote_asset, timeframe)
+        _, base_rows, quote_rows = np.intersect1d(base_times, quote_times, assume_unique=True, return_indices=True)
+        if base_rows.size < bars:
+            return None
+        base, quote = base_closes[base_rows[-bars:]], quote_closes[quote_rows[-bars:]]
+        if not (np.all(base > 0) and np.all(quote > 0)):
+            return None
+        synthetic = base / quote
+        std_dev = synthetic.std()
+        if std_dev == 0:
+            return None
+        return round(float((synthetic[-1] - synthetic.mean()) / std_dev), 2)
+
+# Спільний екземпляр: між циклами з бази читаються лише свічки після останнього завершеного бару,
+# а кеш тримає лише бари вікна Z-Score
+_default_resampler = Resampler(max_bars=ZSCORE_BARS)
+
+def update_timeframe_zscores(timeframes=ZSCORE_TIMEFRAMES, bars=ZSCORE_BARS, resampler=None):
+    """
+    Розраховує Z-Score старших таймфреймів для пар із monitoredPairs.json і записує їх
+    у поля zscore_<таймфрейм> (наприклад, zscore_1h, zscore_4h) без додаткових запитів до API.
+
+    Returns:
+        dict: {пара: {"zscore_1h": ..., "zscore_4h": ...}} або {} у разі помилки.
+    """
+    resampler = _default_resampler if resampler is None else resampler
+    try:
+        manager = JSONManager()
+        items = manager.get_monitored_pairs()
+        if not items:
+            logging.warning("⚠️ monitoredPairs.json не містить пар.")
+            return {}
+        results = {}
+        for item in items:
+            pair = item["pair"]
+            if pair not in results:
+                results[pair] = {f"zscore_{tf}": resampler.pair_zscore(pair, tf, bars) for tf in timeframes}
+            item.update(results[pair])
+        manager.update_monitored_pairs(items, backup=False)
+        resampler.retain({asset for pair in results for asset in pair.split("/")})
+    except Exception as e:
+        logging.error(f"❌ Помилка розрахунку Z-Score старших таймфреймів: {e}")
+        return {}
+
+    for tf in timeframes:
+        success_count = sum(1 for values in results.values() if values[f"zscore_{tf}"] is not None)
+        logging.info(f"✅ Z-Score {tf}: розраховано для {success_count} із {len(results)} пар.")
+    return results
@@ -0,0 +1,294 @@
+import logging
+from pathlib import Path
+import numpy as np
+from bot.data_processing.data_672 import DB_PATH
+from bot.data_processing.metrics_cache import latest_candles
+from bot.data_processing.zscore_engine import load_price_matrix
+from bot.data_storage.json_manager import JSONManager
+from bot.database.connection import get_connection
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+WINDOW = 672
+INTERVAL_SECONDS = 15 * 60
+STATE_PATH = Path("bot/data_storage/rolling_stats.npz")
+DRIFT_CHECK_EVERY = 96  # Повна перевірка раз на добу 15-хвилинних оновлень
+DRIFT_TOLERANCE = 1e-9
+
+# Стовпці накопичених сум для кожної пари
+N, S, SS, X, Y, XX, YY, XY = range(8)
+
+class RollingPairStats:
+    """
+    Інкрементальні ковзні статистики пар за останні window свічок сітки.
+
+    Для кожної пари зберігаються суми значень синтетичного курсу s = base / quote
+    (середнє, дисперсія, Z-Score) та логарифмів цін x = ln(quote), y = ln(base)
+    (коваріація, бета, кореляція). Суми зсунуті на опорні значення пари, що прибирає
+    втрату точності при відніманні великих чисел. Нова свічка додає свій внесок і
+    віднімає внесок свічки, що виходить із вікна, — O(1) на пару незалежно від window.
+    Ціни активів тримаються в кільці (активи × window) зі слотом (ts / 900) mod window.
+    Для кожного активу запам'ятовується час останньої застосованої свічки (asset_heads), щоб
+    свічки, що надійшли із запізненням (нижче head), застосувати на місці їхніх слотів.
+    """
+
+    def __init__(self, pairs, window=WINDOW):
+        self.pairs = list(pairs)
+        self.window = window
+        self.assets = sorted({asset for pair in self.pairs for asset in pair.split("/")})
+        index = {asset: row for row, asset in enumerate(self.assets)}
+        self.base_rows = np.array([index[pair.split("/")[0]] for pair in self.pairs], dtype=np.int64)
+        self.quote_rows = np.array([index[pair.split("/")[1]] for pair in self.pairs], dtype=np.int64)
+        self.prices = np.full((len(self.assets), window), np.nan)
+        self.sums = np.zeros((len(self.pairs), 8))
+        self.shift = np.zeros((len(self.pairs), 3))
+        self.head = None
+        self.asset_heads = np.full(len(self.assets), -1, dtype=np.int64)
+        self.updates_since_check = 0
+
+    def _values(self, prices):
+        """(s, x, y) і маска дійсних значень для стовпця цін усіх активів."""
+        base = prices[self.base_rows]
+        quote = prices[self.quote_rows]
+        valid = (base > 0) & (quote > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.stack([base / quote, np.log(quote), np.log(base)], axis=1)
+        return np.where(valid[:, None], values, 0.0), valid
+
+    def _apply(self, prices, sign):
+        values, valid = self._values(prices)
+        if sign > 0:
+            # Опорне значення береться з першого значення, що потрапляє в порожнє вікно
+            fresh = valid & (self.sums[:, N] == 0)
+            self.shift[fresh] = values[fresh]
+            self.sums[fresh] = 0.0
+        s, x, y = (values - self.shift).T
+        contribution = np.stack([np.ones_like(s), s, s * s, x, y, x * x, y * y, x * y], axis=1)
+        self.sums += sign * np.where(valid[:, None], contribution, 0.0)
+
+    def _step(self, ts, prices):
+        slot = (ts // INTERVAL_SECONDS) % self.window
+        self._apply(self.prices[:, slot], -1)
+        self.prices[:, slot] = prices
+        self._apply(prices, 1)
+
+    def update(self, ts, prices):
+        """
+        Додає свічку з часом відкриття ts для всіх активів.
+
+        Пропущені свічки сітки між head і ts проходяться як порожні (їхні слоти звільняються);
+        свічка з ts <= head у межах вікна (виправлена або така, що надійшла із запізненням)
+        замінює значення свого слота без зсуву вікна.
+
+        :param ts: Час відкриття свічки в секундах.
+        :param prices: Ціни активів у порядку self.assets (NaN — свічки немає).
+        """
+        ts = int(ts) - int(ts) % INTERVAL_SECONDS
+        prices = np.asarray(prices, dtype=np.float64)
+        if self.head is not None and ts <= self.head - self.window * INTERVAL_SECONDS:
+            logging.warning(f"⚠️ Пропущено свічку {ts}: поза вікном останньої обробленої {self.head}.")
+            return
+        if self.head is not None and ts <= self.head:
+            self._step(ts, prices)
+            self._mark_applied(ts, prices)
+            return
+        if self.head is not None and ts - self.head >= self.window * INTERVAL_SECONDS:
+            self.reset()
+        if self.head is not None:
+            empty = np.full(len(self.assets), np.nan)
+            for skipped in range(self.head + INTERVAL_SECONDS, ts, INTERVAL_SECONDS):
+                self._step(skipped, empty)
+        self._step(ts, prices)
+        self._mark_applied(ts, prices)
+        self.head = ts
+
+        self.updates_since_check += 1
+        if self.updates_since_check >= DRIFT_CHECK_EVERY:
+            self.check_drift()
+
+    def _mark_applied(self, ts, prices):
+        """Оновлює час останньої застосованої свічки активів, що мають ціну в ts."""
+        self.asset_heads = np.where(np.isnan(prices), self.asset_heads, np.maximum(self.asset_heads, ts))
+
+    def reset(self):
+        """Очищає вікно та суми."""
+        self.prices.fill(np.nan)
+        self.sums.fill(0.0)
+        self.shift.fill(0.0)
+        self.head = None
+        self.asset_heads.fill(-1)
+
+    def _full_sums(self):
+        """Суми, пораховані заново з кільця цін (для перевірки дрейфу)."""
+        sums = np.zeros_like(self.sums)
+        for slot in range(self.window):
+            values, valid = self._values(self.prices[:, slot])
+            s, x, y = (values - self.shift).T
+            sums += np.where(valid[:, None], np.stack([np.ones_like(s), s, s * s, x, y, x * x, y * y, x * y], axis=1), 0.0)
+        return sums
+
+    def check_drift(self, tolerance=DRIFT_TOLERANCE):
+        """
+        Порівнює інкрементальні суми з повним перерахунком і відновлює їх у разі розбіжності.
+        :return: Максимальна відносна розбіжність.
+        """
+        full = self._full_sums()
+        drift = float(np.max(np.abs(self.sums - full) / np.maximum(np.abs(full), 1.0), initial=0.0))
+        if drift > tolerance:
+            logging.warning(f"⚠️ Дрейф ковзних статистик {drift:.3e} > {tolerance:.0e}, суми перераховано.")
+            self.sums = full
+        self.updates_since_check = 0
+        return drift
+
+    def stats(self):
+        """
+        Поточні статистики всіх пар.
+
+        :return: Словник масивів у порядку self.pairs: count, mean, std (популяційне),
+            zscore (останньої свічки), cov, beta (y на x), correlation; NaN, якщо значення невизначене.
+        """
+        sums = self.sums
+        n = sums[:, N]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_s = sums[:, S] / n
+            var_s = np.maximum(sums[:, SS] / n - mean_s ** 2, 0.0)
+            var_x = np.maximum(sums[:, XX] / n - (sums[:, X] / n) ** 2, 0.0)
+            var_y = np.maximum(sums[:, YY] / n - (sums[:, Y] / n) ** 2, 0.0)
+            cov = sums[:, XY] / n - (sums[:, X] / n) * (sums[:, Y] / n)
+            std = np.sqrt(var_s)
+
+            last = np.full(len(self.pairs), np.nan)
+            if self.head is not None:
+                values, valid = self._values(self.prices[:, (self.head // INTERVAL_SECONDS) % self.window])
+                last = np.where(valid, values[:, 0], np.nan)
+            return {
+                "count": n.astype(np.int64),
+                "mean": mean_s + self.shift[:, 0],
+                "std": std,
+                "zscore": np.where(std > 0, (last - self.shift[:, 0] - mean_s) / std, np.nan),
+                "cov": cov,
+                "beta": np.where(var_x > 0, cov / var_x, np.nan),
+                "correlation": np.where((var_x > 0) & (var_y > 0), cov / np.sqrt(var_x * var_y), np.nan),
+            }
+
+    def catch_up(self, connection):
+        """
+        Застосовує свічки з бази, починаючи з head (або заповнює вікно з нуля).
+
+        Свічка head на момент попереднього оновлення могла бути ще не закритою, а завантаження
+        виправляє її ціну на місці, тому вона застосовується повторно (update замінює ts == head).
+        Якщо актив відставав від head (невдале завантаження, дозавантаження розриву), а в базі
+        з'явилися його новіші свічки, читання починається одразу після його останньої застосованої
+        свічки (не раніше початку вікна), і запізнілі свічки стають на свої місця.
+        :return: Кількість застосованих свічок.
+        """
+        since = self.head
+        if since is not None:
+            latest = latest_candles(connection, self.assets)
+            lagging = [
+                int(self.asset_heads[row]) + INTERVAL_SECONDS
+                for row, asset in enumerate(self.assets)
+                if self.asset_heads[row] < self.head and latest.get(asset, (-1, None))[0] > self.asset_heads[row]
+            ]
+            if lagging:
+                since = max(min(lagging), self.head - (self.window - 1) * INTERVAL_SECONDS)
+        else:
+            latest = connection.execute("SELECT MAX(ts) FROM prices").fetchone()[0]
+            if latest is None:
+                return 0
+            since = latest - (self.window - 1) * INTERVAL_SECONDS
+        index, times, matrix = load_price_matrix(connection, self.assets, since)
+        rows = [index[asset] for asset in self.assets]
+        for column, ts in enumerate(times):
+            self.update(ts, matrix[rows, column])
+        return times.size
+
+    def save(self, path=STATE_PATH):
+        """Зберігає стан, щоб після перезапуску не перечитувати все вікно."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as file:
+            np.savez(
+                file, pairs=np.array(self.pairs, dtype=str), window=self.window,
+                head=-1 if self.head is None else self.head, asset_heads=self.asset_heads,
+                prices=self.prices, sums=self.sums, shift=self.shift,
+            )
+
+    @classmethod
+    def load(cls, pairs, window=WINDOW, path=STATE_PATH):
+        """
+        Відновлює стан із файлу; якщо файлу немає або набір пар чи вікно змінилися — повертає порожній стан.
+        """
+        stats = cls(pairs, window)
+        path = Path(path)
+        if not path.exists():
+            return stats
+        try:
+            with np.load(path, allow_pickle=False) as state:
+                if state["pairs"].tolist() != stats.pairs or int(state["window"]) != window:
+                    logging.info("🔄 Набір пар або вікно змінилися, ковзні статистики буде побудовано заново.")
+                    return stats
+                stats.prices = state["prices"]
+                stats.sums = state["sums"]
+                stats.shift = state["shift"]
+                stats.head = None if int(state["head"]) < 0 else int(state["head"])
+                if "asset_heads" in state.files:
+                    stats.asset_heads = state["asset_heads"]
+                else:
+                    # Стан попереднього формату: вважаємо всі активи актуальними на head
+                    stats.asset_heads.fill(-1 if stats.head is None else stats.head)
+        except Exception as e:
+            logging.error(f"❌ Помилка читання стану ковзних статистик: {e}")
+            return cls(pairs, window)
+        return stats
+
+def update_rolling_stats(db_path=DB_PATH, window=WINDOW, path=STATE_PATH):
+    """
+    Доповнює збережені ковзні статистики пар із monitoredPairs.json свічками з бази, зберігає стан
+    і записує тижневі zscore, beta та correlation у записи пар monitoredPairs.json.
+
+    Після перезапуску застосовуються лише свічки, починаючи з останньої обробленої; якщо набір
+    пар змінився, вікно будується заново.
+
+    Returns:
+        dict: {пара: {"zscore", "beta", "correlation"}} за останні window свічок (None — значення
+            невизначене) або {} у разі помилки.
+    """
+    try:
+        manager = JSONManager()
+        items = manager.get_monitored_pairs()
+        pairs = list(dict.fromkeys(item["pair"] for item in items))
+        if not pairs:
+            logging.warning("⚠️ monitoredPairs.json не містить пар.")
+            return {}
+        stats = RollingPairStats.load(pairs, window, path)
+        applied = stats.catch_up(get_connection(db_path))
+        stats.save(path)
+        values = stats.stats()
+    except Exception as e:
+        logging.error(f"❌ Помилка оновлення ковзних статистик: {e}")
+        return {}
+
+    results = {}
+    for row, pair in enumerate(pairs):
+        results[pair] = {
+            field: None if np.isnan(values[field][row]) else round(float(values[field][row]), digits)
+            for field, digits in (("zscore", 2), ("beta", 4), ("correlation", 4))
+        }
+    try:
+        for item in items:
+            item.update(results[item["pair"]])
+        manager.update_monitored_pairs(items, backup=False)
+    except Exception as e:
+        logging.error(f"❌ Помилка запису ковзних статистик у monitoredPairs.json: {e}")
+    success_count = sum(1 for item in results.values() if item["zscore"] is not None)
+    logging.info(f"✅ Ковзні статистики: застосовано {applied} свічок, Z-Score для {success_count} із {len(pairs)} пар.")
+    return results
@@ -0,0 +1,158 @@
+import logging
+import numpy as np
+from bot.data_processing.backfill import WINDOWS
+from bot.data_processing.data_672 import DB_PATH
+from bot.data_processing.zscore_engine import MIN_COVERAGE, load_grid_matrix
+from bot.database.connection import get_connection
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+BETA_WINDOW = WINDOWS["1m"]
+BLOCK_PAIRS = 256
+ZSCORE_WINDOW = 672
+
+def ols_beta(n, sum_x, sum_y, sum_xx, sum_xy):
+    """
+    Нахил і зсув МНК y = alpha + beta * x із сум вибірки.
+    :return: (alpha, beta); NaN там, де дисперсія x нульова.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = n * sum_xx - sum_x * sum_x
+        beta = np.where(variance > 0, (n * sum_xy - sum_x * sum_y) / variance, np.nan)
+        alpha = (sum_y - beta * sum_x) / n
+    return alpha, beta
+
+def rolling_sums(values, window):
+    """
+    Ковзні суми по осі 1 за window останніх стовпців через різницю кумулятивних сум: O(T) на рядок.
+    Перші window - 1 стовпців містять суми неповних вікон.
+    """
+    sums = np.cumsum(values, axis=1)
+    sums[:, window:] -= sums[:, :-window].copy()
+    return sums
+
+def _centered(values, valid):
+    """Значення зсунуті на середнє рядка (нулі на місці пропусків) та самі середні."""
+    count = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+    center = np.where(valid, values, 0.0).sum(axis=1, keepdims=True) / count
+    return np.where(valid, values - center, 0.0), center
+
+def rolling_ols(x, y, window, min_count=None):
+    """
+    Ковзна регресія МНК y на x для кожного рядка.
+
+    Parameters:
+        x, y (np.ndarray): Матриці (пари × свічки) з NaN для пропусків.
+        window (int): Довжина вікна в свічках сітки.
+        min_count (int | None): Мінімум спільних точок у вікні; за замовчуванням MIN_COVERAGE × window.
+
+    Returns:
+        tuple: (alpha, beta) — матриці (пари × свічки); NaN, де точок недостатньо.
+    """
+    min_count = np.ceil(MIN_COVERAGE * window) if min_count is None else min_count
+    valid = ~np.isnan(x) & ~np.isnan(y)
+    # Зсув на середні рядка прибирає втрату точності в n * sum_xx - sum_x²
+    dx, center_x = _centered(x, valid)
+    dy, center_y = _centered(y, valid)
+    n = rolling_sums(valid.astype(np.float64), window)
+    alpha, beta = ols_beta(
+        n, rolling_sums(dx, window), rolling_sums(dy, window),
+        rolling_sums(dx * dx, window), rolling_sums(dx * dy, window),
+    )
+    enough = n >= min_count
+    alpha = np.where(enough, alpha + center_y - beta * center_x, np.nan)
+    return alpha, np.where(enough, beta, np.nan)
+
+def rolling_zscore(series, window, min_count=None):
+    """
+    Ковзний Z-Score ряду: (значення - середнє вікна) / популяційне відхилення вікна.
+    :return: Матриця того ж розміру; NaN для пропусків і вікон із недостатньою кількістю точок.
+    """
+    min_count = np.ceil(MIN_COVERAGE * window) if min_count is None else min_count
+    valid = ~np.isnan(series)
+    shifted, _ = _centered(series, valid)
+    n = rolling_sums(valid.astype(np.float64), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = rolling_sums(shifted, window) / n
+        std = np.sqrt(np.maximum(rolling_sums(shifted * shifted, window) / n - mean ** 2, 0.0))
+        zscore = (shifted - mean) / std
+    return np.where(valid & (n >= min_count) & (std > 0), zscore, np.nan)
+
+def spread_series(base, quote, beta_window=BETA_WINDOW, zscore_window=ZSCORE_WINDOW):
+    """
+    Ряди спреду для блоку пар за цінами базових і квотованих активів (пари × свічки сітки).
+
+    Спред із бета-коригуванням: ln(base) - alpha_t - beta_t * ln(quote), де alpha_t, beta_t —
+    регресія за beta_window свічок, що закінчуються в t. Лог-спред: ln(base / quote).
+
+    Returns:
+        dict: Матриці (пари × свічки): beta, spread, spread_zscore, log_spread_zscore.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.where(quote > 0, np.log(quote), np.nan)
+        y = np.where(base > 0, np.log(base), np.nan)
+    alpha, beta = rolling_ols(x, y, beta_window)
+    spread = y - alpha - beta * x
+    return {
+        "beta": beta,
+        "spread": spread,
+        "spread_zscore": rolling_zscore(spread, zscore_window),
+        "log_spread_zscore": rolling_zscore(y - x, zscore_window),
+    }
+
+def latest_spread_metrics(matrix, index, pairs, beta_window=BETA_WINDOW, zscore_window=ZSCORE_WINDOW):
+    """
+    Останні значення рядів спреду для всіх пар, блоками по BLOCK_PAIRS.
+
+    Для розрахунку потрібні лише останні beta_window + zscore_window - 1 свічок матриці.
+
+    Returns:
+        dict: {пара: {"beta", "spread_zscore", "log_spread_zscore"}}; None для невизначених значень.
+    """
+    fields = ("beta", "spread_zscore", "log_spread_zscore")
+    results = {pair: dict.fromkeys(fields) for pair in pairs}
+    known = [pair for pair in pairs if all(asset in index for asset in pair.split("/"))]
+    matrix = matrix[:, max(matrix.shape[1] - (beta_window + zscore_window - 1), 0):]
+    if matrix.shape[1] == 0:
+        return results
+
+    for start in range(0, len(known), BLOCK_PAIRS):
+        block = known[start:start + BLOCK_PAIRS]
+        series = spread_series(
+            matrix[[index[pair.split("/")[0]] for pair in block]],
+            matrix[[index[pair.split("/")[1]] for pair in block]],
+            beta_window, zscore_window,
+        )
+        for row, pair in enumerate(block):
+            for field in fields:
+                value = series[field][row, -1]
+                if not np.isnan(value):
+                    results[pair][field] = round(float(value), 4 if field == "beta" else 2)
+    return results
+
+def calculate_spread_metrics(pairs, db_path=DB_PATH, beta_window=BETA_WINDOW, zscore_window=ZSCORE_WINDOW):
+    """
+    Розраховує бету та Z-Score спредів для списку пар за ціною з бази.
+
+    Returns:
+        dict: Результат latest_spread_metrics або {} у разі помилки.
+    """
+    try:
+        assets = {asset for pair in pairs for asset in pair.split("/")}
+        index, latest, matrix = load_grid_matrix(get_connection(db_path), assets, beta_window + zscore_window - 1)
+        results = latest_spread_metrics(matrix, index, pairs, beta_window, zscore_window)
+    except Exception as e:
+        logging.error(f"❌ Помилка розрахунку спредів: {e}")
+        return {}
+
+    success_count = sum(1 for values in results.values() if values["spread_zscore"] is not None)
+    logging.info(f"✅ Z-Score спреду з бета-коригуванням обчислено для {success_count} із {len(pairs)} пар.")
+    return results
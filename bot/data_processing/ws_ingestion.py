@@ -0,0 +1,149 @@
+import logging
+import aiohttp
+import asyncio
+from bot.data_processing.data_672 import DB_PATH, INTERVAL_SECONDS, RETENTION_CANDLES, load_unique_assets, fetch_and_save_assets
+from bot.data_processing.recompute import DebouncedRecompute
+from bot.database.db_writer import AsyncDBWriter
+from bot.utils.kline_parser import KlineArrays
+from bot.utils.symbol_registry import SymbolRegistry
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+WS_BASE_URL = "wss://stream.binance.com:9443"
+STREAMS_PER_CONNECTION = 200  # Binance дозволяє до 1024 потоків на одне з'єднання
+INTERVAL = "15m"
+RECONNECT_DELAY = 1
+MAX_RECONNECT_DELAY = 60
+HEARTBEAT = 30
+PRUNE_INTERVAL = INTERVAL_SECONDS  # Записувач працює весь час, тож старі свічки видаляються раз на 15 хвилин
+
+def shard_assets(assets, shard_size=STREAMS_PER_CONNECTION):
+    """
+    Розбиває активи на групи, кожна з яких обслуговується окремим з'єднанням.
+    """
+    assets = sorted(assets)
+    return [assets[i:i + shard_size] for i in range(0, len(assets), shard_size)]
+
+def build_stream_url(assets, base_url=WS_BASE_URL):
+    """
+    Формує URL комбінованого потоку <symbol>@kline_15m для набору активів.
+    """
+    streams = "/".join(f"{asset.lower()}usdt@kline_{INTERVAL}" for asset in assets)
+    return f"{base_url}/stream?streams={streams}"
+
+def parse_closed_kline(message):
+    """
+    Витягує закриту свічку з повідомлення комбінованого потоку.
+
+    Parameters:
+        message (dict): Повідомлення у форматі {"stream": ..., "data": {"e": "kline", "k": {...}}}.
+
+    Returns:
+        tuple | None: (актив, KlineArrays з однією свічкою) або None, якщо свічка ще не закрита.
+    """
+    kline = message.get("data", {}).get("k")
+    if not kline or not kline.get("x"):
+        return None
+    symbol = kline["s"]
+    asset = symbol[:-4] if symbol.endswith("USDT") else symbol
+    return asset, KlineArrays([kline["t"]], [kline["T"]], [float(kline["c"])], [float(kline["v"])])
+
+async def rest_gap_fill(session, writer, assets):
+    """
+    Дозавантажує через REST свічки, пропущені поки з'єднання було неактивним.
+    Ще не закрита свічка відкидається: її закриту версію запише потік.
+    """
+    logging.info(f"🔄 REST-дозавантаження для {len(assets)} активів.")
+    await fetch_and_save_assets(session, assets, incremental=True, writer=writer, closed_only=True)
+
+async def run_shard(session, writer, assets, base_url=WS_BASE_URL, on_connect=rest_gap_fill, stop_event=None):
+    """
+    Обслуговує одне WebSocket-з'єднання з автоматичним перепідключенням.
+
+    Після кожного (пере)підключення викликається on_connect, щоб заповнити розрив через REST.
+
+    Parameters:
+        session: Сесія aiohttp.
+        writer (AsyncDBWriter): Спільний записувач закритих свічок.
+        assets (list): Активи цієї групи.
+        base_url (str): Адреса WebSocket-сервера (для тестів — локальний stub).
+        on_connect: Корутина (session, writer, assets), що викликається після підключення.
+        stop_event (asyncio.Event | None): Подія для зупинки обробки.
+    """
+    url = build_stream_url(assets, base_url)
+    delay = RECONNECT_DELAY
+    stop_event = stop_event or asyncio.Event()
+
+    while not stop_event.is_set():
+        try:
+            async with session.ws_connect(url, heartbeat=HEARTBEAT) as ws:
+                logging.info(f"✅ WebSocket підключено: {len(assets)} потоків.")
+                delay = RECONNECT_DELAY
+                if on_connect is not None:
+                    await on_connect(session, writer, assets)
+
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        closed = parse_closed_kline(msg.json())
+                        if closed:
+                            asset, klines = closed
+                            await writer.put(asset, klines)
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+                    if stop_event.is_set():
+                        break
+            logging.warning(f"⚠️ WebSocket з'єднання закрито ({len(assets)} потоків).")
+        except Exception as e:
+            logging.error(f"❌ Помилка WebSocket з'єднання: {e}")
+
+        if stop_event.is_set():
+            break
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+async def run_ws_ingestion(base_url=WS_BASE_URL, shard_size=STREAMS_PER_CONNECTION, stop_event=None, recompute=None):
+    """
+    Запускає push-завантаження закритих 15-хвилинних свічок для всіх активів із monitoredPairs.json.
+
+    Після кожного записаного пакета (закриті свічки з потоку й REST-дозавантаження) записувач
+    передає його активи в recompute, який перераховує метрики зачеплених пар.
+
+    Parameters:
+        recompute (DebouncedRecompute | None): Споживач записаних пакетів; None — recompute_changed
+            із типовою паузою.
+    """
+    unique_assets = load_unique_assets()
+    if not unique_assets:
+        return
+
+    recompute = recompute or DebouncedRecompute()
+    await recompute.start()
+    try:
+        async with aiohttp.ClientSession() as session, AsyncDBWriter(
+            DB_PATH, retention=RETENTION_CANDLES, prune_interval=PRUNE_INTERVAL, on_commit=recompute.notify
+        ) as writer:
+            registry = await SymbolRegistry().load(session)
+            unique_assets, _ = registry.validate_assets(unique_assets)
+            shards = shard_assets(unique_assets, shard_size)
+            logging.info(f"📡 Запуск WebSocket-завантаження: {len(unique_assets)} активів, {len(shards)} з'єднань.")
+
+            await asyncio.gather(*(
+                run_shard(session, writer, shard, base_url, stop_event=stop_event) for shard in shards
+            ))
+    finally:
+        # Записувач уже закритий, тож останні пакети передані — перераховуємо залишок
+        await recompute.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_ws_ingestion())
@@ -1,9 +1,13 @@
-import sqlite3
 import numpy as np
 import logging
 import sys
 sys.path.append("D:/CryptoBots/Crypto_Way/Trade_bots/zscore_bot_py")
 from bot.config.config import DATABASE_PATH as DB_PATH
+from bot.data_processing.alignment import FILL_POLICY, MAX_FILL_BARS, align_matrix, fetch_aligned
+from bot.data_processing.metrics_cache import cached_pair_metrics, enable_disk_cache, pair_stamps
+from bot.data_processing.parallel import CHUNK_PAIRS, DEFAULT_WORKERS, map_pairs
+from bot.data_processing.zscore_engine import load_price_matrix, zscores_from_matrix
+from bot.database.connection import get_connection
 
 # Налаштування логування
 LOG_FILE = "zscore_calculator.log"
@@ -15,34 +19,25 @@ logging.basicConfig(
     encoding="utf-8",
 )
 
-def fetch_synchronized_data(cursor, base_asset, quote_asset):
+def fetch_synchronized_data(cursor, base_asset, quote_asset, policy=FILL_POLICY, max_fill=MAX_FILL_BARS):
     """
-    Отримує синхронізовані по timestamp дані для двох активів.
+    Отримує вирівняні по 15-хвилинній сітці дані для двох активів у хронологічному порядку.
+
+    Кожен актив розкладається на сітку окремо, пропуски обробляються за політикою
+    (див. bot.data_processing.alignment), а вікно закінчується на останній свічці,
+    на якій є ціни обох активів.
 
     Parameters:
         cursor: SQLite курсор для виконання запитів.
         base_asset (str): Назва базового активу.
         quote_asset (str): Назва квотованого активу.
+        policy (str): Політика пропусків: "drop", "ffill" або "stale".
+        max_fill (int): Максимальна довжина пропуску, що заповнюється.
 
     Returns:
-        tuple: Два списки синхронізованих цін для базового і квотованого активів.
-    """
-    query = """
-        SELECT b.price, q.price
-        FROM cryptocurrencies b
-        JOIN cryptocurrencies q
-        ON b.timestamp = q.timestamp
-        WHERE b.name = ? AND q.name = ?
-        ORDER BY b.timestamp DESC
-        LIMIT 672
+        tuple: Два списки синхронізованих цін для базового і квотованого активів (останній елемент — найновіший).
     """
-    cursor.execute(query, (base_asset, quote_asset))
-    data = cursor.fetchall()
-
-    base_data = [row[0] for row in data]
-    quote_data = [row[1] for row in data]
-
-    return base_data, quote_data
+    return fetch_aligned(cursor, base_asset, quote_asset, 672, policy, max_fill)
 
 def calculate_zscore_for_pair(pair):
     """
@@ -57,17 +52,14 @@ def calculate_zscore_for_pair(pair):
     base_asset, quote_asset = pair.split("/")
 
     try:
-        # Підключення до бази даних
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        # Довготривале з'єднання потоку: без нового підключення на кожну пару
+        cursor = get_connection(DB_PATH).cursor()
 
         logging.info(f"📊 Початок розрахунку Z-Score для пари {pair}")
 
         # Отримання синхронізованих даних для активів
         base_data, quote_data = fetch_synchronized_data(cursor, base_asset, quote_asset)
 
-        conn.close()
-
         # Логування кількості записів
         logging.info(f"Кількість синхронізованих записів для {base_asset}: {len(base_data)}")
         logging.info(f"Кількість синхронізованих записів для {quote_asset}: {len(quote_data)}")
@@ -105,16 +97,7 @@ def calculate_zscore_for_pair(pair):
         logging.error(f"❌ Помилка для пари {pair}: {e}")
         return float("nan")
 
-def calculate_zscores_for_pairs(pairs):
-    """
-    Розраховує Z-Score для списку пар криптовалют.
-
-    Parameters:
-        pairs (list): Список пар криптовалют у форматі 'BASE/QUOTE'.
-
-    Returns:
-        dict: Словник із результатами Z-Score для кожної пари.
-    """
+def _calculate_zscores(pairs):
     results = {}
     for pair in pairs:
         try:
@@ -128,6 +111,30 @@ def calculate_zscores_for_pairs(pairs):
         except Exception as e:
             results[pair] = None
             logging.error(f"❌ Помилка для пари {pair}: {e}")
+    return results
+
+def _stamps(pairs):
+    """Позначки вхідних даних пар для кешу ({} без кешування, якщо базу ще не створено)."""
+    try:
+        return pair_stamps(get_connection(DB_PATH), pairs)
+    except Exception as e:
+        logging.warning(f"⚠️ Кеш метрик недоступний: {e}")
+        return {}
+
+def calculate_zscores_for_pairs(pairs):
+    """
+    Розраховує Z-Score для списку пар криптовалют.
+
+    Пари, для яких із попереднього розрахунку не з'явилося нових спільних свічок,
+    беруться з кешу метрик.
+
+    Parameters:
+        pairs (list): Список пар криптовалют у форматі 'BASE/QUOTE'.
+
+    Returns:
+        dict: Словник із результатами Z-Score для кожної пари.
+    """
+    results = cached_pair_metrics("zscore", DB_PATH, pairs, 672, _calculate_zscores, _stamps(pairs))
 
     # Узагальнене логування
     success_count = sum(1 for z in results.values() if z is not None)
@@ -135,6 +142,74 @@ def calculate_zscores_for_pairs(pairs):
 
     return results
 
+def calculate_zscores_parallel(pairs, workers=DEFAULT_WORKERS, chunk_size=CHUNK_PAIRS, window=672):
+    """
+    Паралельний режим calculate_zscores_for_pairs: ціни завантажуються одним запитом,
+    а пари розподіляються блоками між процесами, що читають матрицю зі спільної пам'яті.
+
+    Parameters:
+        pairs (list): Список пар криптовалют у форматі 'BASE/QUOTE'.
+        workers (int): Кількість процесів.
+        chunk_size (int): Кількість пар в одному завданні.
+        window (int): Кількість спільних точок у вікні.
+
+    Returns:
+        dict: Словник із результатами Z-Score для кожної пари (ті самі значення, що й у послідовному режимі).
+    """
+    try:
+        def compute(missing):
+            assets = {asset for pair in missing for asset in pair.split("/")}
+            index, times, matrix = load_price_matrix(get_connection(DB_PATH), assets)
+            _, matrix = align_matrix(times, matrix)
+            return map_pairs(zscores_from_matrix, matrix, index, missing, workers, chunk_size, window=window)
+
+        results = cached_pair_metrics("zscore_matrix", DB_PATH, pairs, window, compute, _stamps(pairs))
+    except Exception as e:
+        logging.error(f"❌ Помилка паралельного розрахунку Z-Score: {e}")
+        return dict.fromkeys(pairs)
+
+    success_count = sum(1 for z in results.values() if z is not None)
+    logging.info(f"✅ Успішно обчислено Z-Score для {success_count} із {len(pairs)} пар (паралельно).")
+    return results
+
+def calculate_zscores_from_store(pairs, store, window=672):
+    """
+    Розраховує Z-Score для пар із кільцевого memmap-сховища без SQL-запитів.
+
+    Ціни обох активів уже вирівняні по 15-хвилинній сітці; пара рахується лише тоді,
+    коли у вікні є всі window свічок обох активів.
+
+    Parameters:
+        pairs (list): Список пар криптовалют у форматі 'BASE/QUOTE'.
+        store (RingBufferStore): Кільцеве сховище цін.
+        window (int): Кількість свічок у вікні.
+
+    Returns:
+        dict: Словник із результатами Z-Score для кожної пари (None, якщо розрахунок неможливий).
+    """
+    results = {}
+    for pair in pairs:
+        base_asset, quote_asset = pair.split("/")
+        try:
+            _, prices, valid = store.aligned([base_asset, quote_asset], window=window)
+            if prices.shape[1] < window or not valid.all():
+                raise ValueError(f"Недостатньо даних для пари {pair}")
+            if not np.all(np.isfinite(prices)) or np.any(prices == 0):
+                raise ValueError(f"Некоректні ціни для пари {pair}")
+
+            synthetic_prices = prices[0] / prices[1]
+            std_dev = synthetic_prices.std()
+            if std_dev == 0:
+                raise ValueError(f"Стандартне відхилення дорівнює 0 для {pair}")
+            results[pair] = round(float((synthetic_prices[-1] - synthetic_prices.mean()) / std_dev), 2)
+        except Exception as e:
+            results[pair] = None
+            logging.error(f"❌ Помилка для пари {pair}: {e}")
+
+    success_count = sum(1 for z in results.values() if z is not None)
+    logging.info(f"✅ Успішно обчислено Z-Score зі сховища для {success_count} із {len(pairs)} пар.")
+    return results
+
 if __name__ == "__main__":
     # Тестовий набір пар
     test_pairs = [
@@ -144,6 +219,9 @@ if __name__ == "__main__":
         "FLOW/DODO", "MANTA/GMT", "NEAR/PERP"
     ]
 
+    # Дисковий кеш: повторний запуск без нових свічок не перераховує пари
+    enable_disk_cache()
+
     # Обчислення Z-Score для кожної пари
     zscore_results = calculate_zscores_for_pairs(test_pairs)
 
@@ -1,6 +1,7 @@
 import aiohttp
 import numpy as np
 import asyncio
+from bot.utils.kline_parser import parse_klines
 
 BASE_URL = "https://api.binance.com/api/v3/klines"
 
@@ -12,7 +13,7 @@ async def fetch_candlestick_data(session, symbol, interval="15m", limit=672):
     :param symbol: Назва активу, наприклад, BTCUSDT.
     :param interval: Таймфрейм (за замовчуванням 15 хвилин).
     :param limit: Кількість інтервалів (672 для тижневої історії).
-    :return: Список цін закриття.
+    :return: Масив цін закриття.
     """
     params = {
         "symbol": symbol,
@@ -22,8 +23,7 @@ async def fetch_candlestick_data(session, symbol, interval="15m", limit=672):
 
     async with session.get(BASE_URL, params=params) as response:
         response.raise_for_status()
-        data = await response.json()
-        return [float(candle[4]) for candle in data]  # Ціни закриття
+        return parse_klines(await response.read()).close  # Ціни закриття
 
 async def calculate_zscore(symbol):
     """
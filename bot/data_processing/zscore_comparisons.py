@@ -1,8 +1,12 @@
-import sqlite3
 import numpy as np
 import pandas as pd
 from scipy.stats import zscore as scipy_zscore
 import logging
+from bot.data_processing.alignment import INTERVAL_SECONDS, align_legs, fetch_aligned, to_grid
+from bot.data_processing.metrics_cache import cached_pair_metrics, enable_disk_cache, pair_stamps
+from bot.data_processing.parallel import CHUNK_PAIRS, DEFAULT_WORKERS, map_pairs
+from bot.data_processing.zscore_engine import load_price_matrix
+from bot.database.connection import get_connection
 
 # Налаштування логування
 LOG_FILE = "zscore_comparisons.log"
@@ -18,36 +22,10 @@ DB_PATH = "bot/data_storage/uniq_tokens.db"
 
 def fetch_data(base_asset, quote_asset):
     """
-    Отримує дані для пари активів із бази.
-    """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT price FROM cryptocurrencies
-        WHERE name = ?
-        ORDER BY timestamp DESC
-        LIMIT 672
-        """,
-        (base_asset,)
-    )
-    base_data = [row[0] for row in cursor.fetchall()]
-
-    cursor.execute(
-        """
-        SELECT price FROM cryptocurrencies
-        WHERE name = ?
-        ORDER BY timestamp DESC
-        LIMIT 672
-        """,
-        (quote_asset,)
-    )
-    quote_data = [row[0] for row in cursor.fetchall()]
-
-    conn.close()
-
-    return base_data, quote_data
+    Отримує вирівняні по сітці дані для пари активів із бази в хронологічному порядку.
+    """
+    cursor = get_connection(DB_PATH).cursor()
+    return fetch_aligned(cursor, base_asset, quote_asset)
 
 def calculate_zscore_numpy(synthetic_prices):
     """
@@ -75,44 +53,109 @@ def calculate_zscore_direct(synthetic_prices):
     last_price = synthetic_prices[-1]
     return (last_price - mean) / std_dev
 
+def compare_zscores(pair, base_data, quote_data):
+    """
+    Розраховує Z-Score пари різними способами за вже отриманими цінами.
+    """
+    if len(base_data) < 672 or len(quote_data) < 672:
+        raise ValueError(f"Недостатньо даних для пари {pair}")
+
+    # Перевірка даних
+    if any(p == 0 or np.isnan(p) for p in base_data + quote_data):
+        raise ValueError(f"Некоректні ціни для {pair}")
+
+    # Синтетичний курс
+    synthetic_prices = [b / q for b, q in zip(base_data, quote_data)]
+
+    # Розрахунок Z-Score різними способами
+    numpy_zscore = calculate_zscore_numpy(synthetic_prices)
+    scipy_zscore_value = calculate_zscore_scipy(synthetic_prices)
+    direct_zscore = calculate_zscore_direct(synthetic_prices)
+
+    # Логування результатів
+    logging.info(f"Z-Score для {pair} (NumPy): {numpy_zscore:.4f}")
+    logging.info(f"Z-Score для {pair} (SciPy): {scipy_zscore_value:.4f}")
+    logging.info(f"Z-Score для {pair} (Прямий): {direct_zscore:.4f}")
+
+    return {
+        "numpy": numpy_zscore,
+        "scipy": scipy_zscore_value,
+        "direct": direct_zscore
+    }
+
+def _stamps(pairs):
+    """Позначки для кешу: остання спільна свічка пари ({} без кешування, якщо базу ще не створено)."""
+    try:
+        return pair_stamps(get_connection(DB_PATH), pairs)
+    except Exception as e:
+        logging.warning(f"⚠️ Кеш метрик недоступний: {e}")
+        return {}
+
+def _run_comparisons(pairs):
+    results = {}
+    for pair in pairs:
+        base_asset, quote_asset = pair.split("/")
+        try:
+            # Отримання даних
+            base_data, quote_data = fetch_data(base_asset, quote_asset)
+            results[pair] = compare_zscores(pair, base_data, quote_data)
+        except Exception as e:
+            logging.error(f"❌ Помилка для пари {pair}: {e}")
+            results[pair] = None
+    return results
+
 def run_zscore_comparisons(pair):
     """
-    Виконує розрахунок Z-Score для пари різними способами.
+    Виконує розрахунок Z-Score для пари різними способами (з кешу, якщо нових свічок не було).
     """
-    base_asset, quote_asset = pair.split("/")
+    return cached_pair_metrics("comparisons", DB_PATH, [pair], 672, _run_comparisons, _stamps([pair]))[pair]
 
+def comparisons_from_matrix(matrix, index, pairs, first_ts=0):
+    """
+    Порівняння Z-Score для блоку пар за матрицею цін на сітці (виконується в процесах пулу).
+    Кожна пара вирівнюється так само, як у fetch_data.
+
+    :param first_ts: Час відкриття свічки першого стовпця матриці.
+    """
+    times = first_ts + INTERVAL_SECONDS * np.arange(matrix.shape[1], dtype=np.int64)
+    results = {}
+    for pair in pairs:
+        base_asset, quote_asset = pair.split("/")
+        try:
+            if base_asset not in index or quote_asset not in index:
+                raise ValueError(f"Недостатньо даних для пари {pair}")
+            legs = []
+            for asset in (base_asset, quote_asset):
+                row = matrix[index[asset]]
+                valid = ~np.isnan(row)
+                legs += [times[valid], row[valid]]
+            aligned = align_legs(*legs, 672)
+            base_data, quote_data = ([], []) if aligned is None else (aligned[1].tolist(), aligned[2].tolist())
+            results[pair] = compare_zscores(pair, base_data, quote_data)
+        except Exception as e:
+            logging.error(f"❌ Помилка для пари {pair}: {e}")
+            results[pair] = None
+    return results
+
+def run_zscore_comparisons_parallel(pairs, workers=DEFAULT_WORKERS, chunk_size=CHUNK_PAIRS):
+    """
+    Паралельний режим run_zscore_comparisons для списку пар: ціни читаються одним запитом
+    і розкладаються на сітку, а процеси пулу отримують їх через спільну пам'ять.
+
+    :return: Словник {пара: результат run_zscore_comparisons}.
+    """
     try:
-        # Отримання даних
-        base_data, quote_data = fetch_data(base_asset, quote_asset)
-
-        if len(base_data) < 672 or len(quote_data) < 672:
-            raise ValueError(f"Недостатньо даних для пари {pair}")
-
-        # Перевірка даних
-        if any(p == 0 or np.isnan(p) for p in base_data + quote_data):
-            raise ValueError(f"Некоректні ціни для {pair}")
-
-        # Синтетичний курс
-        synthetic_prices = [b / q for b, q in zip(base_data, quote_data)]
-
-        # Розрахунок Z-Score різними способами
-        numpy_zscore = calculate_zscore_numpy(synthetic_prices)
-        scipy_zscore_value = calculate_zscore_scipy(synthetic_prices)
-        direct_zscore = calculate_zscore_direct(synthetic_prices)
-
-        # Логування результатів
-        logging.info(f"Z-Score для {pair} (NumPy): {numpy_zscore:.4f}")
-        logging.info(f"Z-Score для {pair} (SciPy): {scipy_zscore_value:.4f}")
-        logging.info(f"Z-Score для {pair} (Прямий): {direct_zscore:.4f}")
-
-        return {
-            "numpy": numpy_zscore,
-            "scipy": scipy_zscore_value,
-            "direct": direct_zscore
-        }
+        def compute(missing):
+            assets = {asset for pair in missing for asset in pair.split("/")}
+            index, times, matrix = load_price_matrix(get_connection(DB_PATH), assets)
+            times, matrix = to_grid(times, matrix)
+            first_ts = int(times[0]) if times.size else 0
+            return map_pairs(comparisons_from_matrix, matrix, index, missing, workers, chunk_size, first_ts=first_ts)
+
+        return cached_pair_metrics("comparisons_matrix", DB_PATH, pairs, 672, compute, _stamps(pairs))
     except Exception as e:
-        logging.error(f"❌ Помилка для пари {pair}: {e}")
-        return None
+        logging.error(f"❌ Помилка паралельного порівняння Z-Score: {e}")
+        return dict.fromkeys(pairs)
 
 if __name__ == "__main__":
     test_pairs = [
@@ -122,6 +165,8 @@ if __name__ == "__main__":
         "FLOW/DODO", "MANTA/GMT", "NEAR/PERP"
     ]
 
+    enable_disk_cache()
+
     # Розрахунок Z-Score для кожної пари
     for pair in test_pairs:
         results = run_zscore_comparisons(pair)
@@ -0,0 +1,152 @@
+import logging
+import numpy as np
+from bot.config.config import DATABASE_PATH as DB_PATH
+from bot.data_processing.alignment import FILL_POLICY, align_matrix
+from bot.data_processing.metrics_cache import cached_pair_metrics, pair_stamps
+from bot.database.connection import get_connection
+
+# Налаштування логування
+LOG_FILE = "zscore_calculator.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+WINDOW = 672
+INTERVAL_SECONDS = 15 * 60
+MIN_COVERAGE = 0.9  # Мінімальна частка свічок вікна, на яких є ціни обох активів
+
+def load_price_matrix(connection, assets, since=None):
+    """
+    Завантажує ціни активів одним запитом у вирівняну матрицю (активи × ts).
+
+    Parameters:
+        connection: З'єднання SQLite.
+        assets (Iterable[str]): Назви активів.
+        since (int | None): Мінімальний ts у секундах; за замовчуванням — уся історія.
+
+    Returns:
+        tuple: (словник {актив: рядок}, ts стовпців int64, матриця float64 з NaN для відсутніх свічок).
+    """
+    assets = sorted(set(assets))
+    index = {asset: row for row, asset in enumerate(assets)}
+    placeholders = ",".join("?" * len(assets))
+    rows = connection.execute(f"""
+    SELECT s.name, p.ts, p.price
+    FROM prices p
+    JOIN symbols s ON s.id = p.symbol_id
+    WHERE s.name IN ({placeholders}) AND p.ts >= ?
+    """, (*assets, 0 if since is None else int(since))).fetchall() if assets else []
+
+    if not rows:
+        return index, np.empty(0, dtype=np.int64), np.full((len(assets), 0), np.nan)
+    names, timestamps, prices = zip(*rows)
+    times, columns = np.unique(np.array(timestamps, dtype=np.int64), return_inverse=True)
+    matrix = np.full((len(assets), times.size), np.nan)
+    matrix[[index[name] for name in names], columns] = prices
+    return index, times, matrix
+
+def load_grid_matrix(connection, assets, length):
+    """
+    Завантажує ціни за останні length свічок і розкладає їх на 15-хвилинну сітку.
+
+    :return: (словник {актив: рядок}, час відкриття останньої свічки або None, матриця активи × length).
+    """
+    latest = connection.execute("SELECT MAX(ts) FROM prices").fetchone()[0]
+    if latest is None:
+        return {asset: row for row, asset in enumerate(sorted(set(assets)))}, None, np.full((len(set(assets)), length), np.nan)
+    first = latest - (length - 1) * INTERVAL_SECONDS
+    index, times, matrix = load_price_matrix(connection, assets, first)
+    grid = np.full((matrix.shape[0], length), np.nan)
+    columns = (times - first) // INTERVAL_SECONDS
+    on_grid = (times - first) % INTERVAL_SECONDS == 0
+    grid[:, columns[on_grid]] = matrix[:, on_grid]
+    return index, int(latest), grid
+
+def select_common_windows(matrix, base_rows, quote_rows, window=WINDOW):
+    """
+    Для кожної пари вибирає останні window ts, на яких є ціни обох активів.
+
+    Returns:
+        tuple: (маска пар із повним вікном, індекси стовпців (пари з повним вікном × window)).
+    """
+    valid = ~np.isnan(matrix)
+    common = valid[base_rows] & valid[quote_rows]
+    # Кількість спільних ts від поточного стовпця до кінця: останні window мають ранг 1..window
+    rank = np.cumsum(common[:, ::-1], axis=1)[:, ::-1]
+    selected = common & (rank <= window)
+    full = selected.sum(axis=1) == window
+    columns = np.nonzero(selected[full])[1].reshape(-1, window)
+    return full, columns
+
+def zscores_from_matrix(matrix, index, pairs, window=WINDOW, policy=FILL_POLICY):
+    """
+    Z-Score останнього значення синтетичного курсу для всіх пар однією broadcast-операцією.
+
+    Матриця має бути вирівняна по сітці (align_matrix). Результати збігаються з
+    calculate_zscores_for_pairs: ті самі window спільних точок, популяційне відхилення
+    та округлення до 2 знаків; за політикою "stale" пари з пропусками у вікні дають None.
+
+    Returns:
+        dict: {пара: Z-Score або None}.
+    """
+    results = dict.fromkeys(pairs)
+    known = [pair for pair in pairs if all(asset in index for asset in pair.split("/"))]
+    if not known or matrix.shape[1] < window:
+        return results
+
+    base_rows = np.array([index[pair.split("/")[0]] for pair in known])
+    quote_rows = np.array([index[pair.split("/")[1]] for pair in known])
+    full, columns = select_common_windows(matrix, base_rows, quote_rows, window)
+    if policy == "stale":
+        # Вікно без пропусків — це window сусідніх стовпців сітки
+        full[full] = columns[:, -1] - columns[:, 0] == window - 1
+        columns = columns[columns[:, -1] - columns[:, 0] == window - 1]
+
+    base = matrix[base_rows[full][:, None], columns]
+    quote = matrix[quote_rows[full][:, None], columns]
+    # Пари з нульовими цінами чи нульовим відхиленням відкидаються нижче, тому попередження не потрібні
+    with np.errstate(divide="ignore", invalid="ignore"):
+        synthetic = base / quote
+        mean = synthetic.mean(axis=1)
+        std_dev = synthetic.std(axis=1)
+        zscores = np.round((synthetic[:, -1] - mean) / std_dev, 2)
+    usable = ~((base == 0).any(axis=1) | (quote == 0).any(axis=1)) & (std_dev != 0)
+
+    for pair, ok, zscore in zip(np.array(known)[full], usable, zscores):
+        if ok:
+            results[str(pair)] = zscore
+    return results
+
+def calculate_zscores_vectorized(pairs, db_path=DB_PATH, window=WINDOW):
+    """
+    Розраховує Z-Score для списку пар: одне завантаження матриці цін замість запиту на кожну пару.
+    Пари без нових спільних свічок беруться з кешу метрик.
+
+    Parameters:
+        pairs (list): Список пар криптовалют у форматі 'BASE/QUOTE'.
+        db_path (str): Шлях до бази даних.
+        window (int): Кількість спільних точок у вікні.
+
+    Returns:
+        dict: Словник із результатами Z-Score для кожної пари (None, якщо розрахунок неможливий).
+    """
+    try:
+        def compute(missing):
+            assets = {asset for pair in missing for asset in pair.split("/")}
+            index, times, matrix = load_price_matrix(get_connection(db_path), assets)
+            _, matrix = align_matrix(times, matrix)
+            return zscores_from_matrix(matrix, index, missing, window)
+
+        stamps = pair_stamps(get_connection(db_path), pairs)
+        results = cached_pair_metrics("zscore_matrix", db_path, pairs, window, compute, stamps)
+    except Exception as e:
+        logging.error(f"❌ Помилка векторного розрахунку Z-Score: {e}")
+        return dict.fromkeys(pairs)
+
+    success_count = sum(1 for z in results.values() if z is not None)
+    logging.info(f"✅ Успішно обчислено Z-Score для {success_count} із {len(pairs)} пар (векторно).")
+    return results
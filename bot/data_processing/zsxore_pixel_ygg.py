@@ -1,6 +1,7 @@
 import aiohttp
 import numpy as np
 import asyncio
+from bot.utils.kline_parser import parse_klines
 
 BASE_URL = "https://api.binance.com/api/v3/klines"
 
@@ -12,8 +13,7 @@ async def fetch_prices(session, symbol, interval="15m", limit=672):
     }
     async with session.get(BASE_URL, params=params) as response:
         response.raise_for_status()
-        data = await response.json()
-        return [float(candle[4]) for candle in data]  # Ціни закриття
+        return parse_klines(await response.read()).close  # Ціни закриття
 
 async def calculate_zscore_for_cross_pair(base_asset, quote_asset):
     async with aiohttp.ClientSession() as session:
@@ -26,7 +26,7 @@ async def calculate_zscore_for_cross_pair(base_asset, quote_asset):
                 raise ValueError(f"Недостатньо даних для {base_asset}/{quote_asset}")
 
             # Синтетичний курс
-            synthetic_prices = [b / q for b, q in zip(base_prices, quote_prices)]
+            synthetic_prices = base_prices / quote_prices
 
             # Розрахунок середнього та стандартного відхилення
             mean = np.mean(synthetic_prices)
@@ -1,4 +1,5 @@
 import json
+import os
 from pathlib import Path
 from datetime import datetime
 import shutil
@@ -7,6 +8,7 @@ import shutil
 DATA_DIR = Path("bot/data_storage")
 MONITORED_PAIRS_FILE = DATA_DIR / "monitoredPairs.json"
 FOCUSED_PAIRS_FILE = DATA_DIR / "focusedPairs.json"
+CANDIDATE_PAIRS_FILE = DATA_DIR / "candidatePairs.json"
 BACKUP_DIR = DATA_DIR / "backups"
 
 class JSONManager:
@@ -23,9 +25,17 @@ class JSONManager:
             return json.load(file)
 
     def save_json(self, filepath, data):
-        """Збереження JSON-даних до файлу."""
-        with open(filepath, "w", encoding="utf-8") as file:
+        """
+        Збереження JSON-даних до файлу.
+        Дані пишуться в тимчасовий файл, який атомарно замінює основний: збій під час запису
+        не обрізає наявний файл.
+        """
+        tmp_path = filepath.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
             json.dump(data, file, indent=4, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, filepath)
 
     def backup_file(self, filepath):
         """Створення резервної копії файлу."""
@@ -37,13 +47,28 @@ class JSONManager:
         else:
             print(f"❌ Файл {filepath} не знайдено для резервного копіювання.")
 
+    def rotate_backup(self, filepath):
+        """Оновлення єдиної ротаційної копії {назва}_last.json (для циклічних перезаписів файлу)."""
+        if filepath.exists():
+            backup_path = BACKUP_DIR / f"{filepath.stem}_last.json"
+            tmp_path = backup_path.with_suffix(".tmp")
+            shutil.copy(filepath, tmp_path)
+            os.replace(tmp_path, backup_path)
+
     def get_monitored_pairs(self):
         """Отримання даних про пари з monitoredPairs.json."""
         return self.load_json(MONITORED_PAIRS_FILE)
 
-    def update_monitored_pairs(self, pairs):
-        """Оновлення даних у monitoredPairs.json."""
-        self.backup_file(MONITORED_PAIRS_FILE)
+    def update_monitored_pairs(self, pairs, backup=True):
+        """
+        Оновлення даних у monitoredPairs.json.
+        :param backup: Створювати резервну копію з часовою міткою; циклічне оновлення метрик (False)
+            натомість перезаписує одну ротаційну копію, щоб не засмічувати каталог копій.
+        """
+        if backup:
+            self.backup_file(MONITORED_PAIRS_FILE)
+        else:
+            self.rotate_backup(MONITORED_PAIRS_FILE)
         self.save_json(MONITORED_PAIRS_FILE, pairs)
 
     def get_focused_pairs(self):
@@ -55,6 +80,14 @@ class JSONManager:
         self.backup_file(FOCUSED_PAIRS_FILE)
         self.save_json(FOCUSED_PAIRS_FILE, pairs)
 
+    def get_candidate_pairs(self):
+        """Отримання кандидатів у пари з candidatePairs.json."""
+        return self.load_json(CANDIDATE_PAIRS_FILE)
+
+    def update_candidate_pairs(self, pairs):
+        """Оновлення candidatePairs.json (файл перезаписується кожен цикл, тому без резервної копії)."""
+        self.save_json(CANDIDATE_PAIRS_FILE, pairs)
+
 # Для тестування
 if __name__ == "__main__":
     manager = JSONManager()
@@ -0,0 +1,83 @@
+"""
+Спільний шар з'єднань SQLite.
+
+Усі з'єднання відкриваються в режимі WAL з налаштованими pragma, тому читачі
+(розрахунок Z-Score, ресемплінг) працюють паралельно із записувачем без
+"database is locked". З'єднання працюють в autocommit-режимі драйвера, а
+транзакції відкриваються явно через transaction(): пакет операцій — один коміт.
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256  # Кеш підготовлених запитів драйвера на з'єднання
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # У WAL безпечно для цілісності, fsync лише на checkpoint
+    "cache_size": -64 * 1024,  # 64 МіБ (від'ємне значення — у КіБ)
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": BUSY_TIMEOUT_MS,
+}
+
+_local = threading.local()
+
+def connect(db_path, readonly=False):
+    """
+    Відкриває з'єднання з налаштованими pragma.
+
+    :param db_path: Шлях до файлу бази даних.
+    :param readonly: Заборонити запис через це з'єднання (PRAGMA query_only).
+    """
+    connection = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        cached_statements=CACHED_STATEMENTS,
+    )
+    for name, value in PRAGMAS.items():
+        connection.execute(f"PRAGMA {name} = {value}")
+    if readonly:
+        connection.execute("PRAGMA query_only = ON")
+    return connection
+
+@contextmanager
+def transaction(connection, immediate=True):
+    """
+    Явна транзакція: COMMIT при успіху, ROLLBACK при винятку.
+
+    Вкладений виклик стає частиною зовнішньої транзакції, тому методи, що
+    пишуть по одному рядку, можна згрупувати в один коміт.
+    BEGIN IMMEDIATE одразу бере блокування запису й не отримує SQLITE_BUSY посеред транзакції.
+    """
+    if connection.in_transaction:
+        yield connection
+        return
+    connection.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+def get_connection(db_path):
+    """
+    Повертає довготривале з'єднання поточного потоку для бази db_path.
+
+    Повторні виклики з того самого потоку не відкривають нове з'єднання,
+    тому підготовлені запити перевикористовуються між парами та циклами.
+    """
+    connections = _local.__dict__.setdefault("connections", {})
+    key = str(db_path)
+    if key not in connections:
+        connections[key] = connect(db_path)
+    return connections[key]
+
+def close_connections():
+    """Закриває довготривалі з'єднання поточного потоку."""
+    for connection in _local.__dict__.pop("connections", {}).values():
+        connection.close()
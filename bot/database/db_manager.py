@@ -1,7 +1,12 @@
 import logging
-import sqlite3
-from datetime import datetime, timezone
 from pathlib import Path
+from bot.database.connection import connect, transaction
+import numpy as np
+from bot.database.models import (
+    COINTEGRATION_COLUMNS, PAIR_METRIC_COLUMNS, PAIR_WINDOW_METRIC_COLUMNS, UPSERT_PAIR_METRICS_SQL, UPSERT_PRICE_SQL,
+    create_pair_tables, create_price_tables, get_pair_ids, get_symbol_ids,
+)
+from bot.database.retention import DEFAULT_WINDOW, prune_prices
 
 # Налаштування логування
 LOG_FILE = "zscore_bot.log"
@@ -15,53 +20,44 @@ logging.basicConfig(
 
 DATABASE_PATH = Path("z_score_bot.db")
 
+# Рядки цін повертаються у вигляді (назва активу, ts, ціна)
+PRICE_ROWS_SQL = """
+SELECT s.name, p.ts, p.price
+FROM prices p
+JOIN symbols s ON s.id = p.symbol_id
+"""
+
 class DatabaseManager:
     def __init__(self, db_path=DATABASE_PATH):
-        """Ініціалізація менеджера бази даних."""
-        self.connection = sqlite3.connect(db_path)
+        """Ініціалізація менеджера бази даних (WAL, довготривале з'єднання)."""
+        self.connection = connect(db_path)
         self.cursor = self.connection.cursor()
         self._initialize_tables()
         logging.info("✅ База даних успішно ініціалізована.")
 
     def _initialize_tables(self):
         """Створення необхідних таблиць, якщо вони не існують."""
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS cryptocurrencies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            timestamp TEXT NOT NULL,
-            price REAL NOT NULL,
-            UNIQUE(name, timestamp)
-        )
-        """)
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS pairs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pair TEXT NOT NULL,
-            zscore REAL,
-            cross_rate REAL,
-            max_zscore REAL,
-            max_cross_rate REAL,
-            dynamic_log TEXT,
-            entry_cross_rate REAL,
-            UNIQUE(pair)
-        )
-        """)
-        self.connection.commit()
+        with transaction(self.connection):
+            create_price_tables(self.connection)
+            create_pair_tables(self.connection)
         logging.info("✅ Таблиці створені або вже існують.")
 
+    def transaction(self):
+        """
+        Явна транзакція для групи операцій: окремі методи всередині неї не комітять,
+        зміни фіксуються одним комітом на виході з блоку.
+        """
+        return transaction(self.connection)
+
     def insert_or_update_crypto(self, name, timestamp, price):
         """
         Вставка або оновлення історичних даних про криптовалюту.
+        :param timestamp: Час відкриття свічки в секундах епохи.
         """
         try:
-            self.cursor.execute("""
-            INSERT INTO cryptocurrencies (name, timestamp, price)
-            VALUES (?, ?, ?)
-            ON CONFLICT(name, timestamp) DO UPDATE SET
-                price = excluded.price
-            """, (name, timestamp, price))
-            self.connection.commit()
+            with transaction(self.connection):
+                symbol_id = get_symbol_ids(self.connection, [name])[name]
+                self.cursor.execute(UPSERT_PRICE_SQL, (symbol_id, int(timestamp), price, None))
             logging.info(f"✅ Дані для {name} оновлено: {timestamp}, {price}.")
         except Exception as e:
             logging.error(f"❌ Помилка при оновленні даних для {name}: {e}.")
@@ -69,7 +65,7 @@ class DatabaseManager:
     def fetch_all_cryptos(self):
         """Отримання всіх записів з таблиці криптовалют."""
         try:
-            self.cursor.execute("SELECT * FROM cryptocurrencies")
+            self.cursor.execute(PRICE_ROWS_SQL)
             result = self.cursor.fetchall()
             logging.info(f"✅ Усі записи з таблиці криптовалют успішно отримані. Загальна кількість записів: {len(result)}.")
             return result
@@ -82,10 +78,9 @@ class DatabaseManager:
         Отримання останнього запису про ціну для конкретного активу.
         """
         try:
-            self.cursor.execute("""
-            SELECT * FROM cryptocurrencies
-            WHERE name = ?
-            ORDER BY timestamp DESC
+            self.cursor.execute(PRICE_ROWS_SQL + """
+            WHERE s.name = ?
+            ORDER BY p.ts DESC
             LIMIT 1
             """, (name,))
             result = self.cursor.fetchone()
@@ -95,14 +90,33 @@ class DatabaseManager:
             logging.error(f"❌ Помилка при отриманні останнього запису для {name}: {e}.")
             return None
 
+    def fetch_latest_timestamps(self):
+        """
+        Отримання часу останнього запису для кожного активу одним запитом.
+        :return: Словник {назва активу: ts останнього запису в секундах}.
+        """
+        try:
+            self.cursor.execute("""
+            SELECT s.name, MAX(p.ts) FROM prices p
+            JOIN symbols s ON s.id = p.symbol_id
+            GROUP BY p.symbol_id
+            """)
+            result = dict(self.cursor.fetchall())
+            logging.info(f"✅ Останні записи отримано для {len(result)} активів.")
+            return result
+        except Exception as e:
+            logging.error(f"❌ Помилка при отриманні останніх записів: {e}.")
+            return {}
+
     def is_data_fresh(self, name, latest_timestamp):
         """
         Перевірка, чи є дані актуальними.
         """
         try:
             self.cursor.execute("""
-            SELECT 1 FROM cryptocurrencies
-            WHERE name = ? AND timestamp = ?
+            SELECT 1 FROM prices p
+            JOIN symbols s ON s.id = p.symbol_id
+            WHERE s.name = ? AND p.ts = ?
             """, (name, latest_timestamp))
             result = self.cursor.fetchone() is not None
             logging.info(f"✅ Актуальність даних для {name}: {result}.")
@@ -116,20 +130,144 @@ class DatabaseManager:
         Вставка або оновлення запису для торгової пари.
         """
         try:
-            self.cursor.execute("""
-            INSERT INTO pairs (pair, zscore, cross_rate, max_zscore, max_cross_rate, dynamic_log, entry_cross_rate)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(pair) DO UPDATE SET
-                zscore = excluded.zscore,
-                cross_rate = excluded.cross_rate,
-                max_zscore = MAX(pairs.max_zscore, excluded.zscore),
-                max_cross_rate = MAX(pairs.max_cross_rate, excluded.cross_rate)
-            """, (pair, zscore, cross_rate, zscore, cross_rate, None, cross_rate))
-            self.connection.commit()
+            with transaction(self.connection):
+                self.cursor.execute("""
+                INSERT INTO pairs (pair, zscore, cross_rate, max_zscore, max_cross_rate, dynamic_log, entry_cross_rate)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(pair) DO UPDATE SET
+                    zscore = excluded.zscore,
+                    cross_rate = excluded.cross_rate,
+                    max_zscore = MAX(pairs.max_zscore, excluded.zscore),
+                    max_cross_rate = MAX(pairs.max_cross_rate, excluded.cross_rate)
+                """, (pair, zscore, cross_rate, zscore, cross_rate, None, cross_rate))
             logging.info(f"✅ Дані для пари {pair} оновлено: Z-Score {zscore}, Cross-Rate {cross_rate}.")
         except Exception as e:
             logging.error(f"❌ Помилка при оновленні даних для пари {pair}: {e}.")
 
+    def upsert_pair_metrics(self, ts, metrics):
+        """
+        Пакетний запис метрик пар за один цикл однією транзакцією.
+
+        Оновлює поточні значення й максимуми в pairs (як insert_or_update_pair)
+        та додає точку історії в pair_metrics. Невизначене (None) значення циклу
+        не скидає збережений максимум.
+        :param ts: Час відкриття останньої свічки вікна в секундах.
+        :param metrics: Словник {пара: {"zscore", "cross_rate", "correlation", "beta"}}; відсутні метрики — None.
+        :return: Кількість записаних пар.
+        """
+        try:
+            rows = [(pair, [values.get(column) for column in PAIR_METRIC_COLUMNS]) for pair, values in metrics.items()]
+            with transaction(self.connection):
+                pair_ids = get_pair_ids(self.connection, metrics)
+                self.cursor.executemany("""
+                UPDATE pairs SET
+                    zscore = ?,
+                    cross_rate = ?,
+                    max_zscore = CASE WHEN ? IS NULL THEN max_zscore ELSE MAX(COALESCE(max_zscore, ?), ?) END,
+                    max_cross_rate = CASE WHEN ? IS NULL THEN max_cross_rate ELSE MAX(COALESCE(max_cross_rate, ?), ?) END,
+                    entry_cross_rate = COALESCE(entry_cross_rate, ?)
+                WHERE id = ?
+                """, [
+                    (zscore, cross_rate, zscore, zscore, zscore, cross_rate, cross_rate, cross_rate, cross_rate, pair_ids[pair])
+                    for pair, (zscore, cross_rate, _, _) in rows
+                ])
+                self.cursor.executemany(UPSERT_PAIR_METRICS_SQL, [
+                    (pair_ids[pair], int(ts), *values) for pair, values in rows
+                ])
+            logging.info(f"✅ Метрики записано для {len(rows)} пар (ts {ts}).")
+            return len(rows)
+        except Exception as e:
+            logging.error(f"❌ Помилка при записі метрик пар: {e}.")
+            return 0
+
+    def upsert_pair_window_metrics(self, ts, metrics, windows):
+        """
+        Пакетний запис метрик пар за вікнами (zscore_1m, correlation_2m, ...) однією транзакцією.
+        :param ts: Час відкриття останньої свічки вікна в секундах.
+        :param metrics: Словник {пара: {"zscore_1m": ..., "percentile_10_4m": ...}}.
+        :param windows: Назви вікон ("1m", "2m", "4m").
+        :return: Кількість записаних рядків.
+        """
+        try:
+            with transaction(self.connection):
+                pair_ids = get_pair_ids(self.connection, metrics)
+                rows = [
+                    (pair_ids[pair], window, int(ts), *(values.get(f"{column}_{window}") for column in PAIR_WINDOW_METRIC_COLUMNS))
+                    for pair, values in metrics.items()
+                    for window in windows
+                ]
+                self.cursor.executemany(f"""
+                INSERT OR REPLACE INTO pair_window_metrics (pair_id, window, ts, {", ".join(PAIR_WINDOW_METRIC_COLUMNS)})
+                VALUES (?, ?, ?, {", ".join("?" * len(PAIR_WINDOW_METRIC_COLUMNS))})
+                """, rows)
+            logging.info(f"✅ Метрики за вікнами записано: {len(rows)} рядків (ts {ts}).")
+            return len(rows)
+        except Exception as e:
+            logging.error(f"❌ Помилка при записі метрик за вікнами: {e}.")
+            return 0
+
+    def fetch_cointegration(self, window):
+        """
+        Кешовані результати тестів коінтеграції для вікна.
+        :return: Словник {пара: {"window_end", "beta", "adf_stat", "lag", "significance"}}.
+        """
+        try:
+            self.cursor.execute(f"""
+            SELECT p.pair, c.window_end, {", ".join(f"c.{column}" for column in COINTEGRATION_COLUMNS)}
+            FROM cointegration c
+            JOIN pairs p ON p.id = c.pair_id
+            WHERE c.window = ?
+            """, (int(window),))
+            return {
+                pair: dict(zip(("window_end", *COINTEGRATION_COLUMNS), values))
+                for pair, *values in self.cursor.fetchall()
+            }
+        except Exception as e:
+            logging.error(f"❌ Помилка при отриманні кешу коінтеграції: {e}.")
+            return {}
+
+    def upsert_cointegration(self, window, results):
+        """
+        Записує результати тестів коінтеграції (попередній результат пари для вікна замінюється).
+        :param results: Словник {пара: {"window_end", "beta", "adf_stat", "lag", "significance"}}.
+        :return: Кількість записаних пар.
+        """
+        try:
+            with transaction(self.connection):
+                pair_ids = get_pair_ids(self.connection, results)
+                self.cursor.executemany(f"""
+                INSERT OR REPLACE INTO cointegration (pair_id, window, window_end, {", ".join(COINTEGRATION_COLUMNS)})
+                VALUES (?, ?, ?, {", ".join("?" * len(COINTEGRATION_COLUMNS))})
+                """, [
+                    (pair_ids[pair], int(window), int(values["window_end"]), *(values[column] for column in COINTEGRATION_COLUMNS))
+                    for pair, values in results.items()
+                ])
+            return len(results)
+        except Exception as e:
+            logging.error(f"❌ Помилка при записі кешу коінтеграції: {e}.")
+            return 0
+
+    def fetch_pair_metrics(self, pair, since=None, until=None):
+        """
+        Історія метрик пари за діапазоном ts (пошук по первинному ключу pair_metrics).
+        :return: Словник масивів NumPy: ts (int64) і метрики (float32, NaN для відсутніх).
+        """
+        try:
+            self.cursor.execute("""
+            SELECT m.ts, m.zscore, m.cross_rate, m.correlation, m.beta
+            FROM pair_metrics m
+            WHERE m.pair_id = (SELECT id FROM pairs WHERE pair = ?) AND m.ts BETWEEN ? AND ?
+            ORDER BY m.ts ASC
+            """, (pair, 0 if since is None else int(since), 2 ** 62 if until is None else int(until)))
+            rows = self.cursor.fetchall()
+            values = np.array([row[1:] for row in rows], dtype=np.float32).reshape(-1, len(PAIR_METRIC_COLUMNS))
+            result = {"ts": np.array([row[0] for row in rows], dtype=np.int64)}
+            result.update(zip(PAIR_METRIC_COLUMNS, values.T))
+            return result
+        except Exception as e:
+            logging.error(f"❌ Помилка при отриманні історії метрик для {pair}: {e}.")
+            return {}
+
     def fetch_all_pairs(self):
         """
         Отримання всіх пар із таблиці pairs.
@@ -171,13 +309,12 @@ class DatabaseManager:
             logging.error(f"❌ Помилка при закритті з'єднання з базою даних: {e}.")
     def fetch_all_crypto_prices(self, name):
         """
-        Отримання всіх записів для конкретного активу з таблиці cryptocurrencies.
+        Отримання всіх записів для конкретного активу з таблиці prices.
         """
         try:
-            self.cursor.execute("""
-            SELECT * FROM cryptocurrencies
-            WHERE name = ?
-            ORDER BY timestamp ASC
+            self.cursor.execute(PRICE_ROWS_SQL + """
+            WHERE s.name = ?
+            ORDER BY p.ts ASC
             """, (name,))
             result = self.cursor.fetchall()
             logging.info(f"✅ Усі записи для {name} успішно отримані. Загальна кількість: {len(result)}.")
@@ -192,33 +329,50 @@ class DatabaseManager:
         :param excess_count: Кількість записів, які потрібно видалити.
         """
         try:
-            self.cursor.execute("""
-            DELETE FROM cryptocurrencies
-            WHERE id IN (
-                SELECT id FROM cryptocurrencies
-                WHERE name = ?
-                ORDER BY timestamp ASC
-                LIMIT ?
-            )
-            """, (name, excess_count))
-            self.connection.commit()
+            with transaction(self.connection):
+                self.cursor.execute("""
+                DELETE FROM prices
+                WHERE symbol_id = (SELECT id FROM symbols WHERE name = ?)
+                AND ts IN (
+                    SELECT p.ts FROM prices p
+                    JOIN symbols s ON s.id = p.symbol_id
+                    WHERE s.name = ?
+                    ORDER BY p.ts ASC
+                    LIMIT ?
+                )
+                """, (name, name, excess_count))
             logging.info(f"🗑️ Видалено {excess_count} старих записів для {name}.")
         except Exception as e:
             logging.error(f"❌ Помилка при видаленні старих записів для {name}: {e}.")
+    def prune_crypto_prices(self, window=DEFAULT_WINDOW):
+        """
+        Залишає останні window записів для всіх активів однією транзакцією (retention.prune_prices).
+        :param window: Кількість записів, що залишаються для кожного активу.
+        :return: Кількість видалених записів.
+        """
+        try:
+            with transaction(self.connection):
+                deleted = prune_prices(self.connection, window)
+            logging.info(f"🗑️ Видалено {deleted} старих записів поза вікном {window}.")
+            return deleted
+        except Exception as e:
+            logging.error(f"❌ Помилка при видаленні старих записів: {e}.")
+            return 0
     def insert_bulk_crypto_prices(self, name, prices):
         """
         Пакетна вставка нових записів для активу.
         :param name: Назва активу.
-        :param prices: Список нових записів (timestamp, price).
+        :param prices: Нові свічки KlineArrays (ts — час відкриття).
         """
         try:
-            self.cursor.executemany("""
-            INSERT INTO cryptocurrencies (name, timestamp, price)
-            VALUES (?, ?, ?)
-            ON CONFLICT(name, timestamp) DO UPDATE SET
-                price = excluded.price
-            """, [(name, datetime.fromtimestamp(p["timestamp"], tz=timezone.utc).isoformat(), p["price"]) for p in prices])
-            self.connection.commit()
+            with transaction(self.connection):
+                symbol_id = get_symbol_ids(self.connection, [name])[name]
+                self.cursor.executemany(UPSERT_PRICE_SQL, zip(
+                    [symbol_id] * len(prices),
+                    (prices.open_time // 1000).tolist(),
+                    prices.close.tolist(),
+                    prices.volume.tolist(),
+                ))
             logging.info(f"✅ Пакетна вставка виконана для {name}. Кількість записів: {len(prices)}.")
         except Exception as e:
             logging.error(f"❌ Помилка під час пакетної вставки для {name}: {e}.")
@@ -231,7 +385,7 @@ if __name__ == "__main__":
     logging.info(f"Загальна кількість пар для обробки: {len(pairs)}.")
     unique_assets = db_manager.fetch_unique_assets()
     logging.info(f"Загальна кількість унікальних активів: {len(unique_assets)}.")
-    db_manager.insert_or_update_crypto("BTC", "2025-01-12T12:00:00", 43000.0)
+    db_manager.insert_or_update_crypto("BTC", 1736683200, 43000.0)
     print(db_manager.fetch_all_cryptos())
     print(db_manager.fetch_latest_price("BTC"))
     db_manager.close()
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from bot.database.connection import connect, transaction
+from bot.database.models import UPSERT_PRICE_SQL, create_price_tables, get_symbol_ids
+from bot.database.retention import prune_prices
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+QUEUE_SIZE = 256  # Максимальна кількість активів, що очікують на запис
+BATCH_ASSETS = 64  # Максимальна кількість активів в одній транзакції
+
+_STOP = object()
+
+class AsyncDBWriter:
+    """
+    Єдиний записувач у базу для циклу завантаження.
+
+    Корутини завантаження кладуть свічки в обмежену чергу, а окрема задача
+    вибирає з неї пакети активів і записує їх однією транзакцією через
+    довготривале з'єднання в окремому потоці, не блокуючи event loop.
+    """
+
+    def __init__(self, db_path, queue_size=QUEUE_SIZE, batch_assets=BATCH_ASSETS, retention=None, mirror=None, prune_interval=None, on_commit=None):
+        """
+        :param db_path: Шлях до файлу бази даних.
+        :param queue_size: Розмір черги (тиск на завантажувачі, якщо запис не встигає).
+        :param batch_assets: Кількість активів в одній транзакції.
+        :param retention: Якщо задано — кількість останніх свічок, що залишаються для кожного активу
+            (один прунінг усіх активів під час закриття записувача, тобто раз на цикл).
+        :param mirror: Необов'язкове RingBufferStore, що отримує ті самі свічки після коміту.
+        :param prune_interval: Для довготривалого записувача (WebSocket) — прунінг також після запису
+            пакета, якщо з попереднього минуло щонайменше prune_interval секунд.
+        :param on_commit: Необов'язковий виклик on_commit(assets) у event loop після кожного
+            записаного пакета з множиною активів, свічки яких потрапили в базу.
+        """
+        self.db_path = db_path
+        self.queue_size = queue_size
+        self.batch_assets = batch_assets
+        self.retention = retention
+        self.mirror = mirror
+        self.prune_interval = prune_interval
+        self.on_commit = on_commit
+        self._pruned_at = None
+        self.written_rows = 0
+        self.pruned_rows = 0
+        self.failed_assets = set()  # Активи, пакет яких не вдалося записати (і не записано пізніше)
+        self.connection = None
+        self.symbol_ids = {}
+        self.queue = None
+        self._executor = None
+        self._task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Відкриває з'єднання та запускає задачу запису."""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        await self._run_in_writer(self._open)
+        self._task = asyncio.create_task(self._run())
+
+    async def put(self, asset, prices, extra=None):
+        """
+        Додає свічки активу до черги запису.
+        :param asset: Назва активу.
+        :param prices: Свічки KlineArrays.
+        :param extra: Список (sql, params), що виконуються в тій самій транзакції (наприклад, позначка прогресу).
+        """
+        await self.queue.put((asset, prices, extra))
+
+    async def close(self):
+        """Дописує залишок черги та закриває з'єднання."""
+        await self.queue.put(_STOP)
+        await self._task
+        await self._run_in_writer(self._close_connection)
+        self._executor.shutdown(wait=True)
+        logging.info(f"⏹ Записувач зупинено. Усього записано рядків: {self.written_rows}.")
+
+    async def _run_in_writer(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _run(self):
+        stop = False
+        while not stop:
+            item = await self.queue.get()
+            batch = []
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_assets or self.queue.empty():
+                    break
+                item = self.queue.get_nowait()
+            if batch:
+                committed = await self._run_in_writer(self._write_batch, batch)
+                if committed and self.on_commit is not None:
+                    try:
+                        self.on_commit(committed)
+                    except Exception as e:
+                        logging.error(f"❌ Помилка обробника записаного пакета: {e}")
+
+    def _open(self):
+        self.connection = connect(self.db_path)
+        with transaction(self.connection):
+            create_price_tables(self.connection)
+
+    def _close_connection(self):
+        if self.retention:
+            self._prune()
+        if self.mirror is not None:
+            self.mirror.flush()
+        self.connection.close()
+
+    def _prune(self):
+        self._pruned_at = time.monotonic()
+        try:
+            with transaction(self.connection):
+                self.pruned_rows = prune_prices(self.connection, self.retention)
+            logging.info(f"🗑️ Видалено {self.pruned_rows} записів поза вікном {self.retention} свічок.")
+        except Exception as e:
+            logging.error(f"❌ Помилка видалення старих записів: {e}")
+
+    def _write_batch(self, batch):
+        """
+        Записує пакет активів однією транзакцією (виконується в потоці записувача).
+        :return: Множина записаних активів (порожня, якщо запис не вдався).
+        """
+        try:
+            with transaction(self.connection):
+                symbol_ids = get_symbol_ids(self.connection, [asset for asset, _, _ in batch], self.symbol_ids)
+                rows = []
+                for asset, prices, _ in batch:
+                    rows.extend(zip(
+                        repeat(symbol_ids[asset]),
+                        (prices.open_time // 1000).tolist(),
+                        prices.close.tolist(),
+                        prices.volume.tolist(),
+                    ))
+                self.connection.executemany(UPSERT_PRICE_SQL, rows)
+                for _, _, extra in batch:
+                    for sql, params in extra or ():
+                        self.connection.execute(sql, params)
+            self.written_rows += len(rows)
+            self.failed_assets.difference_update(asset for asset, _, _ in batch)
+            if self.mirror is not None:
+                for asset, prices, _ in batch:
+                    self.mirror.write(asset, prices.open_time // 1000, prices.close)
+            logging.info(f"✅ Записано пакет: {len(batch)} активів, {len(rows)} рядків.")
+            if self.retention and self.prune_interval is not None and (
+                self._pruned_at is None or time.monotonic() - self._pruned_at >= self.prune_interval
+            ):
+                self._prune()
+            return {asset for asset, prices, _ in batch if len(prices)}
+        except Exception as e:
+            # id нових символів могли бути відкочені разом із транзакцією
+            self.symbol_ids.clear()
+            self.failed_assets.update(asset for asset, _, _ in batch)
+            logging.error(f"❌ Помилка запису пакета з {len(batch)} активів: {e}")
+            return set()
@@ -0,0 +1,74 @@
+import logging
+import sqlite3
+import sys
+from pathlib import Path
+from bot.database.models import create_price_tables
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+# Бази, що використовувалися зі старою таблицею cryptocurrencies
+DEFAULT_DATABASES = ["z_score_bot.db", "bot/data_storage/uniq_tokens.db"]
+INTERVAL_SECONDS = 15 * 60
+
+def migrate_database(db_path, keep_legacy=False):
+    """
+    Переносить ціни зі старої таблиці cryptocurrencies (ISO-рядки) до symbols/prices.
+
+    Старі записи містили як час відкриття, так і час закриття свічки (відкриття + 899 с),
+    тому ts округлюється вниз до 15-хвилинної сітки — в обох випадках це час відкриття.
+    Повторний запуск безпечний: якщо старої таблиці немає, нічого не відбувається.
+
+    :param db_path: Шлях до бази даних.
+    :param keep_legacy: Перейменувати стару таблицю на cryptocurrencies_legacy замість видалення.
+    :return: Кількість перенесених записів.
+    """
+    if not Path(db_path).exists():
+        logging.warning(f"⚠️ {db_path}: базу не знайдено, міграцію пропущено.")
+        return 0
+
+    conn = sqlite3.connect(db_path)
+    try:
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cryptocurrencies'"
+        ).fetchone()
+        if legacy is None:
+            logging.info(f"✅ {db_path}: стара таблиця відсутня, міграція не потрібна.")
+            return 0
+
+        with conn:
+            create_price_tables(conn)
+            conn.execute("INSERT OR IGNORE INTO symbols (name) SELECT DISTINCT name FROM cryptocurrencies")
+            migrated = conn.execute(f"""
+            INSERT INTO prices (symbol_id, ts, price)
+            SELECT s.id, (CAST(strftime('%s', c.timestamp) AS INTEGER) / {INTERVAL_SECONDS}) * {INTERVAL_SECONDS}, c.price
+            FROM cryptocurrencies c
+            JOIN symbols s ON s.name = c.name
+            WHERE c.timestamp IS NOT NULL
+            ON CONFLICT(symbol_id, ts) DO UPDATE SET
+                price = excluded.price
+            """).rowcount
+            if keep_legacy:
+                conn.execute("ALTER TABLE cryptocurrencies RENAME TO cryptocurrencies_legacy")
+            else:
+                conn.execute("DROP TABLE cryptocurrencies")
+        conn.execute("VACUUM")
+        logging.info(f"✅ {db_path}: перенесено {migrated} записів до таблиці prices.")
+        return migrated
+    except Exception as e:
+        logging.error(f"❌ Помилка міграції {db_path}: {e}")
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--keep-legacy"]
+    for path in args or DEFAULT_DATABASES:
+        print(f"{path}: {migrate_database(path, keep_legacy='--keep-legacy' in sys.argv)} записів")
@@ -0,0 +1,152 @@
+"""
+Схема сховища цін.
+
+Ціни зберігаються компактно: таблиця-довідник symbols і таблиця prices без rowid
+з первинним ключем (symbol_id, ts), де ts — час відкриття 15-хвилинної свічки
+в секундах епохи (UTC). Кластеризація за ключем дає швидкі діапазонні вибірки
+по активу без окремого індексу.
+"""
+
+SYMBOLS_DDL = """
+CREATE TABLE IF NOT EXISTS symbols (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+)
+"""
+
+PRICES_DDL = """
+CREATE TABLE IF NOT EXISTS prices (
+    symbol_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    price REAL NOT NULL,
+    volume REAL,
+    PRIMARY KEY (symbol_id, ts)
+) WITHOUT ROWID
+"""
+
+UPSERT_PRICE_SQL = """
+INSERT INTO prices (symbol_id, ts, price, volume)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(symbol_id, ts) DO UPDATE SET
+    price = excluded.price,
+    volume = excluded.volume
+"""
+
+PAIRS_DDL = """
+CREATE TABLE IF NOT EXISTS pairs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pair TEXT NOT NULL,
+    zscore REAL,
+    cross_rate REAL,
+    max_zscore REAL,
+    max_cross_rate REAL,
+    dynamic_log TEXT,
+    entry_cross_rate REAL,
+    UNIQUE(pair)
+)
+"""
+
+# Історія метрик пар: pair_id = pairs.id, ts — час відкриття останньої свічки вікна
+PAIR_METRICS_DDL = """
+CREATE TABLE IF NOT EXISTS pair_metrics (
+    pair_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    zscore REAL,
+    cross_rate REAL,
+    correlation REAL,
+    beta REAL,
+    PRIMARY KEY (pair_id, ts)
+) WITHOUT ROWID
+"""
+
+PAIR_METRIC_COLUMNS = ("zscore", "cross_rate", "correlation", "beta")
+
+# Метрики пар за вікнами 1m/2m/4m (ті самі, що в monitoredPairs.json)
+PAIR_WINDOW_METRICS_DDL = """
+CREATE TABLE IF NOT EXISTS pair_window_metrics (
+    pair_id INTEGER NOT NULL,
+    window TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    zscore REAL,
+    correlation REAL,
+    beta_coef REAL,
+    percentile_90 REAL,
+    percentile_10 REAL,
+    PRIMARY KEY (pair_id, window, ts)
+) WITHOUT ROWID
+"""
+
+PAIR_WINDOW_METRIC_COLUMNS = ("zscore", "correlation", "beta_coef", "percentile_90", "percentile_10")
+
+# Кеш тестів коінтеграції: один рядок на пару й вікно (останній кінець вікна)
+COINTEGRATION_DDL = """
+CREATE TABLE IF NOT EXISTS cointegration (
+    pair_id INTEGER NOT NULL,
+    window INTEGER NOT NULL,
+    window_end INTEGER NOT NULL,
+    beta REAL,
+    adf_stat REAL,
+    lag INTEGER,
+    significance INTEGER,
+    PRIMARY KEY (pair_id, window)
+) WITHOUT ROWID
+"""
+
+COINTEGRATION_COLUMNS = ("beta", "adf_stat", "lag", "significance")
+
+UPSERT_PAIR_METRICS_SQL = """
+INSERT INTO pair_metrics (pair_id, ts, zscore, cross_rate, correlation, beta)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(pair_id, ts) DO UPDATE SET
+    zscore = excluded.zscore,
+    cross_rate = excluded.cross_rate,
+    correlation = excluded.correlation,
+    beta = excluded.beta
+"""
+
+def create_price_tables(connection):
+    """Створює таблиці symbols і prices, якщо вони не існують."""
+    connection.execute(SYMBOLS_DDL)
+    connection.execute(PRICES_DDL)
+
+def get_symbol_ids(connection, names, cache=None):
+    """
+    Повертає id для назв активів, створюючи відсутні записи в symbols.
+
+    :param connection: З'єднання SQLite.
+    :param names: Назви активів.
+    :param cache: Необов'язковий словник {назва: id}, що поповнюється між викликами.
+    :return: Словник {назва: id}.
+    """
+    cache = {} if cache is None else cache
+    missing = [name for name in set(names) if name not in cache]
+    if missing:
+        connection.executemany("INSERT OR IGNORE INTO symbols (name) VALUES (?)", [(name,) for name in missing])
+        placeholders = ",".join("?" * len(missing))
+        cache.update(connection.execute(
+            f"SELECT name, id FROM symbols WHERE name IN ({placeholders})", missing
+        ).fetchall())
+    return {name: cache[name] for name in names}
+
+def create_pair_tables(connection):
+    """Створює таблиці pairs, pair_metrics, pair_window_metrics і cointegration, якщо вони не існують."""
+    connection.execute(PAIRS_DDL)
+    connection.execute(PAIR_METRICS_DDL)
+    connection.execute(PAIR_WINDOW_METRICS_DDL)
+    connection.execute(COINTEGRATION_DDL)
+
+def get_pair_ids(connection, pairs):
+    """
+    Повертає id пар із таблиці pairs, створюючи відсутні записи.
+
+    :return: Словник {пара: id}.
+    """
+    pairs = list(pairs)
+    connection.executemany("INSERT OR IGNORE INTO pairs (pair) VALUES (?)", [(pair,) for pair in pairs])
+    ids = {}
+    # Обмеження SQLite на кількість параметрів у запиті
+    for start in range(0, len(pairs), 500):
+        chunk = pairs[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        ids.update(connection.execute(f"SELECT pair, id FROM pairs WHERE pair IN ({placeholders})", chunk).fetchall())
+    return ids
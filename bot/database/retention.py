@@ -0,0 +1,65 @@
+import logging
+import sys
+from bot.database.connection import connect, transaction
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+DEFAULT_WINDOW = 672  # Тиждень 15-хвилинних свічок
+
+# Межа для кожного активу — ts свічки з номером window від кінця, знайдений пошуком
+# по первинному ключу (symbol_id, ts). Активи, що мають не більше window свічок,
+# отримують NULL і не чіпаються.
+CUTOFF_SQL = """
+SELECT cutoff.symbol_id, cutoff.ts FROM (
+    SELECT s.id AS symbol_id, (
+        SELECT p.ts FROM prices p
+        WHERE p.symbol_id = s.id
+        ORDER BY p.ts DESC
+        LIMIT 1 OFFSET ?
+    ) AS ts
+    FROM symbols s
+) AS cutoff
+WHERE cutoff.ts IS NOT NULL
+"""
+
+# Видалення для одного активу — діапазонний пошук по первинному ключу (symbol_id, ts)
+PRUNE_SQL = "DELETE FROM prices WHERE symbol_id = ? AND ts < ?"
+
+def prune_prices(connection, window=DEFAULT_WINDOW):
+    """
+    Залишає для кожного активу лише останні window свічок.
+
+    Межі всіх активів обчислюються одним запитом, а видалення виконується одним
+    підготовленим запитом (executemany) лише для активів із довшою історією: кожен
+    DELETE проходить тільки діапазон старих свічок свого активу, а не всю таблицю.
+    Транзакцію відкриває викликач (або прунінг стає частиною його транзакції).
+
+    :param connection: З'єднання SQLite.
+    :param window: Кількість свічок, що залишаються для кожного активу.
+    :return: Кількість видалених рядків.
+    """
+    if window < 1:
+        raise ValueError(f"Вікно зберігання має бути додатним: {window}")
+    cutoffs = connection.execute(CUTOFF_SQL, (window - 1,)).fetchall()
+    changes_before = connection.total_changes
+    connection.executemany(PRUNE_SQL, cutoffs)
+    return connection.total_changes - changes_before
+
+if __name__ == "__main__":
+    # python -m bot.database.retention <шлях до бази> [вікно у свічках]
+    db_path = sys.argv[1]
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WINDOW
+    conn = connect(db_path)
+    with transaction(conn):
+        deleted = prune_prices(conn, window)
+    conn.close()
+    logging.info(f"🗑️ {db_path}: видалено {deleted} записів поза вікном {window}.")
+    print(f"Видалено {deleted} записів")
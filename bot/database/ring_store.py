@@ -0,0 +1,199 @@
+"""
+Кільцеве сховище останніх цін закриття в memmap-файлах NumPy.
+
+Для кожного активу зберігається рядок фіксованої довжини capacity; свічка з часом
+відкриття ts потрапляє в слот (ts / 900) mod capacity. Бітова маска validity
+позначає слоти, в які реально записано свічку, а head — час останньої свічки активу.
+Оскільки слот визначається лише часом, у вікні з однаковим кінцем усі активи мають
+однаковий порядок слотів: вирівнювання по сітці не потребує жодних JOIN.
+
+Файли можна відкрити з кількох процесів (readonly=True для читачів);
+записувач у кожен момент має бути один.
+
+Сховище — бібліотечний модуль: цикл run.py його не використовує, бо метрики пар читають
+вікна до 4 місяців (load_grid_matrix), а сховище тримає лише capacity останніх свічок.
+Щоб користуватися ним, записувач потрібно створити з mirror=RingBufferStore() (або заповнити
+сховище через fill_from_db) і рахувати Z-Score через calculate_zscores_from_store.
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+import numpy as np
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+STORE_DIR = Path("bot/data_storage/ring_store")
+CAPACITY = 672  # Тиждень 15-хвилинних свічок
+INTERVAL_SECONDS = 15 * 60
+MAX_ASSETS = 2048
+
+class RingBufferStore:
+    """
+    Memmap-сховище: closes (max_assets × capacity, float64), valid (бітова маска
+    max_assets × ceil(capacity / 8)), head (max_assets, int64) та index.json з
+    відповідністю {актив: рядок}.
+    """
+
+    def __init__(self, path=STORE_DIR, capacity=CAPACITY, max_assets=MAX_ASSETS, readonly=False):
+        """
+        :param path: Каталог сховища.
+        :param capacity: Кількість свічок на актив (для наявного сховища береться з index.json).
+        :param max_assets: Максимальна кількість активів (для наявного сховища — з index.json).
+        :param readonly: Відкрити лише для читання (інші процеси).
+        """
+        self.path = Path(path)
+        self.readonly = readonly
+        index_path = self.path / "index.json"
+        exists = index_path.exists()
+        if exists:
+            with open(index_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            capacity, max_assets = meta["capacity"], meta["max_assets"]
+            self.assets = meta["assets"]
+        elif readonly:
+            raise FileNotFoundError(f"Кільцеве сховище не знайдено: {self.path}")
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.assets = {}
+
+        self.capacity = capacity
+        self.max_assets = max_assets
+        mode = "r" if readonly else ("r+" if exists else "w+")
+        self.closes = np.memmap(self.path / "closes.f64", dtype=np.float64, mode=mode, shape=(max_assets, capacity))
+        self.valid = np.memmap(self.path / "valid.bits", dtype=np.uint8, mode=mode, shape=(max_assets, (capacity + 7) // 8))
+        self.head = np.memmap(self.path / "head.i64", dtype=np.int64, mode=mode, shape=(max_assets,))
+        if not exists:
+            self._save_index()
+
+    def _save_index(self):
+        index_path = self.path / "index.json"
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"capacity": self.capacity, "max_assets": self.max_assets, "assets": self.assets}, file)
+        os.replace(tmp_path, index_path)
+
+    def refresh(self):
+        """Перечитує index.json (читач в іншому процесі бачить нові активи)."""
+        with open(self.path / "index.json", "r", encoding="utf-8") as file:
+            self.assets = json.load(file)["assets"]
+
+    def _row(self, asset):
+        row = self.assets.get(asset)
+        if row is None:
+            if len(self.assets) >= self.max_assets:
+                raise ValueError(f"Кільцеве сховище заповнене: {self.max_assets} активів")
+            row = self.assets[asset] = len(self.assets)
+            self._save_index()
+        return row
+
+    def slot(self, ts):
+        """Слот свічки з часом відкриття ts (секунди)."""
+        return (np.asarray(ts, dtype=np.int64) // INTERVAL_SECONDS) % self.capacity
+
+    def write(self, asset, open_times, closes):
+        """
+        Записує свічки активу.
+
+        Коли head зсувається вперед, слоти пропущених свічок очищаються в масці validity;
+        свічки, старші за вікно capacity від нового head, відкидаються.
+
+        :param asset: Назва активу.
+        :param open_times: Час відкриття свічок у секундах.
+        :param closes: Ціни закриття.
+        """
+        candles = np.asarray(open_times, dtype=np.int64) // INTERVAL_SECONDS
+        closes = np.asarray(closes, dtype=np.float64)
+        if candles.size == 0:
+            return
+        row = self._row(asset)
+        head = int(self.head[row]) // INTERVAL_SECONDS
+        new_head = max(head, int(candles.max()))
+
+        bits = np.unpackbits(self.valid[row], count=self.capacity, bitorder="little").astype(bool)
+        if new_head > head:
+            bits[np.arange(max(head + 1, new_head - self.capacity + 1), new_head + 1) % self.capacity] = False
+        keep = candles > new_head - self.capacity
+        slots = candles[keep] % self.capacity
+        self.closes[row, slots] = closes[keep]
+        bits[slots] = True
+        self.valid[row] = np.packbits(bits, bitorder="little")
+        self.head[row] = new_head * INTERVAL_SECONDS
+
+    def ring(self, asset):
+        """
+        Zero-copy представлення рядка активу: (ціни в порядку слотів, head у секундах).
+        Останню ціну дає closes[slot(head)].
+        """
+        row = self.assets[asset]
+        return self.closes[row], int(self.head[row])
+
+    def aligned(self, assets, end=None, window=None):
+        """
+        Вирівняні по сітці ціни кількох активів у хронологічному порядку.
+
+        :param assets: Назви активів.
+        :param end: Час відкриття останньої свічки вікна; за замовчуванням — найновіший head серед активів.
+        :param window: Довжина вікна (не більше capacity).
+        :return: (час відкриття свічок, ціни len(assets) × window, маска дійсних значень).
+        """
+        window = self.capacity if window is None else min(window, self.capacity)
+        rows = np.array([self.assets.get(asset, -1) for asset in assets], dtype=np.int64)
+        known = rows >= 0
+        safe_rows = np.where(known, rows, 0)
+        heads = np.where(known, self.head[safe_rows] // INTERVAL_SECONDS, -1)
+        end_candle = int(heads.max()) if end is None else int(end) // INTERVAL_SECONDS
+        candles = np.arange(end_candle - window + 1, end_candle + 1)
+        order = candles % self.capacity
+
+        prices = self.closes[safe_rows][:, order]
+        bits = np.unpackbits(self.valid[safe_rows], axis=1, count=self.capacity, bitorder="little")[:, order]
+        # Слот дійсний, якщо в нього записано свічку і її не перезаписано новішою
+        valid = (
+            bits.astype(bool)
+            & known[:, None]
+            & (candles[None, :] <= heads[:, None])
+            & (candles[None, :] > heads[:, None] - self.capacity)
+        )
+        return candles * INTERVAL_SECONDS, prices, valid
+
+    def fill_from_db(self, connection):
+        """
+        Заповнює сховище останніми capacity свічками кожного активу з таблиці prices.
+        :return: Кількість активів.
+        """
+        rows = connection.execute("""
+        SELECT s.name, p.ts, p.price
+        FROM prices p
+        JOIN symbols s ON s.id = p.symbol_id
+        WHERE p.ts > (SELECT MAX(ts) FROM prices WHERE symbol_id = p.symbol_id) - ?
+        ORDER BY p.symbol_id, p.ts
+        """, (self.capacity * INTERVAL_SECONDS,)).fetchall()
+        if not rows:
+            return 0
+        names, times, prices = zip(*rows)
+        names = np.array(names)
+        bounds = np.flatnonzero(np.append(names[1:] != names[:-1], True)) + 1
+        start = 0
+        for stop in bounds:
+            self.write(str(names[start]), times[start:stop], prices[start:stop])
+            start = stop
+        self.flush()
+        logging.info(f"✅ Кільцеве сховище заповнено з бази: {len(bounds)} активів.")
+        return len(bounds)
+
+    def flush(self):
+        """Скидає зміни memmap на диск."""
+        if not self.readonly:
+            self.closes.flush()
+            self.valid.flush()
+            self.head.flush()
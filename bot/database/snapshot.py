@@ -0,0 +1,242 @@
+import logging
+import os
+import sys
+from pathlib import Path
+import numpy as np
+from bot.config.config import DATABASE_PATH
+from bot.data_processing.data_672 import DB_PATH
+from bot.database.connection import connect, transaction
+from bot.database.models import create_price_tables, get_symbol_ids
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow необов'язковий: без нього знімок зберігається у форматі .npz
+    pa = pq = None
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+SNAPSHOT_DIR = Path("bot/data_storage/snapshots")
+CHUNK_ROWS = 100_000  # Рядків в одній частині експорту (група рядків Parquet)
+
+TEXT_COLUMNS = {"name", "pair", "window", "dynamic_log"}
+INTEGER_COLUMNS = {"id", "ts"}
+
+PRICES_QUERY = """
+SELECT s.name, p.ts, p.price, p.volume
+FROM prices p
+JOIN symbols s ON s.id = p.symbol_id
+ORDER BY s.name, p.ts
+"""
+
+# Таблиці бази метрик: {таблиця знімка: запит}; історія метрик — з назвою пари замість pair_id
+METRICS_QUERIES = {
+    "pairs": "SELECT * FROM pairs ORDER BY pair",
+    "pair_metrics": """
+    SELECT p.pair, m.ts, m.zscore, m.cross_rate, m.correlation, m.beta
+    FROM pair_metrics m
+    JOIN pairs p ON p.id = m.pair_id
+    ORDER BY p.pair, m.ts
+    """,
+    "pair_window_metrics": """
+    SELECT p.pair, m.window, m.ts, m.zscore, m.correlation, m.beta_coef, m.percentile_90, m.percentile_10
+    FROM pair_window_metrics m
+    JOIN pairs p ON p.id = m.pair_id
+    ORDER BY p.pair, m.window, m.ts
+    """,
+}
+
+def _snapshot_file(snapshot_dir, table):
+    return Path(snapshot_dir) / f"{table}.{'parquet' if pq is not None else 'npz'}"
+
+def _column(name, values):
+    """Масив стовпця: текст (None -> ""), цілі (id, ts) або float64 (None -> NaN)."""
+    if name in TEXT_COLUMNS:
+        return np.array(["" if v is None else v for v in values], dtype=str)
+    if name in INTEGER_COLUMNS:
+        return np.array(values, dtype=np.int64)
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+def _query_chunks(conn, sql, chunk_rows=CHUNK_ROWS):
+    """Читає результат запиту частинами по chunk_rows рядків: {стовпець: масив} на частину."""
+    cursor = conn.execute(sql)
+    names = [column[0] for column in cursor.description]
+    first = True
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if rows or first:
+            yield {name: _column(name, values) for name, values in zip(names, zip(*rows) if rows else [()] * len(names))}
+        first = False
+        if len(rows) < chunk_rows:
+            break
+
+def _arrow_array(name, values):
+    if name == "ts":
+        return pa.array(values, type=pa.int64()).cast(pa.timestamp("s", tz="UTC"))
+    if values.dtype.kind in "OU":
+        return pa.array(values.tolist(), type=pa.string()).dictionary_encode()
+    return pa.array(values)
+
+def _write_columns(path, chunks):
+    """
+    Атомарно записує частини стовпців у Parquet (кожна частина — окрема група рядків)
+    або в .npz без pyarrow (частини об'єднуються як масиви NumPy).
+    :return: Кількість записаних рядків.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    rows = 0
+    if pq is not None:
+        writer = None
+        try:
+            for columns in chunks:
+                table = pa.table({name: _arrow_array(name, values) for name, values in columns.items()})
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema, compression="zstd")
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        parts = list(chunks)
+        rows = sum(len(next(iter(part.values()))) for part in parts)
+        with open(tmp_path, "wb") as file:
+            np.savez(file, **{name: np.concatenate([part[name] for part in parts]) for name in parts[0]})
+    os.replace(tmp_path, path)
+    return rows
+
+def _read_columns(path):
+    """Читає стовпці знімка у масиви NumPy (ts — секунди епохи)."""
+    if path.suffix == ".parquet":
+        table = pq.read_table(path)
+        columns = {}
+        for name in table.column_names:
+            column = table.column(name)
+            if name == "ts":
+                # Parquet не має секундної точності й зберігає timestamp[s] як мілісекунди
+                column = column.cast(pa.timestamp("s", tz="UTC")).cast(pa.int64())
+            elif pa.types.is_dictionary(column.type):
+                column = column.cast(pa.string())
+            columns[name] = column.to_numpy()
+        return columns
+    with np.load(path, allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+def export_snapshot(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, metrics_db=DATABASE_PATH):
+    """
+    Зберігає таблицю prices та таблиці метрик (pairs, історію pair_metrics і pair_window_metrics,
+    якщо вони є) у стовпцеві знімки.
+
+    Рядки читаються й записуються частинами по CHUNK_ROWS, без завантаження таблиці в пам'ять.
+    Ціни впорядковані за (name, ts), тому знімок зручно сканувати по активах.
+
+    :param metrics_db: База з таблицями метрик пар.
+    :return: Список записаних файлів або [] у разі помилки.
+    """
+    try:
+        written, counts = [], {}
+        conn = connect(db_path, readonly=True)
+        try:
+            written.append(_snapshot_file(snapshot_dir, "prices"))
+            counts["prices"] = _write_columns(written[-1], _query_chunks(conn, PRICES_QUERY))
+        finally:
+            conn.close()
+
+        conn = connect(metrics_db, readonly=True) if Path(metrics_db).exists() else None
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")} if conn else set()
+            for table, sql in METRICS_QUERIES.items():
+                if table in tables and "pairs" in tables:
+                    written.append(_snapshot_file(snapshot_dir, table))
+                    counts[table] = _write_columns(written[-1], _query_chunks(conn, sql))
+        finally:
+            if conn is not None:
+                conn.close()
+        logging.info(f"✅ Знімок збережено ({written[0].suffix}): " + ", ".join(f"{t} — {n}" for t, n in counts.items()))
+        return written
+    except Exception as e:
+        logging.error(f"❌ Помилка збереження знімка: {e}")
+        return []
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Завантажує ціни зі знімка.
+
+    :return: Словник стовпців {name, ts, price, volume} (масиви NumPy) або None, якщо знімка немає.
+    """
+    for suffix in ("parquet", "npz"):
+        path = Path(snapshot_dir) / f"prices.{suffix}"
+        if path.exists() and (suffix == "npz" or pq is not None):
+            try:
+                return _read_columns(path)
+            except Exception as e:
+                logging.error(f"❌ Помилка читання знімка {path}: {e}")
+                return None
+    return None
+
+def warm_start(db_path=DB_PATH, snapshot_dir=SNAPSHOT_DIR, store=None):
+    """
+    Заповнює базу (і, за потреби, кільцеве сховище) зі знімка до першого завантаження.
+
+    Для кожного активу додаються лише свічки, новіші за останню збережену в базі (порожня
+    база заповнюється повністю): історія, яку вже видалив прунінг, не повертається, а перший
+    цикл після перезапуску запитує тільки свічки після знімка.
+
+    :param store: Необов'язкове RingBufferStore для прогріву.
+    :return: Кількість доданих до бази записів.
+    """
+    columns = load_snapshot(snapshot_dir)
+    if columns is None or columns["ts"].size == 0:
+        return 0
+    try:
+        names = columns["name"]
+        bounds = np.flatnonzero(np.append(names[1:] != names[:-1], True)) + 1
+        starts = np.concatenate([[0], bounds[:-1]])
+        conn = connect(db_path)
+        with transaction(conn):
+            create_price_tables(conn)
+            ids = get_symbol_ids(conn, [str(names[start]) for start in starts])
+            latest = dict(conn.execute("SELECT id, (SELECT MAX(ts) FROM prices WHERE symbol_id = symbols.id) FROM symbols"))
+            symbol_ids = np.repeat([ids[str(names[start])] for start in starts], bounds - starts)
+            cutoffs = np.repeat([
+                -1 if latest.get(ids[str(names[start])]) is None else latest[ids[str(names[start])]] for start in starts
+            ], bounds - starts)
+            newer = columns["ts"] > cutoffs
+            volumes = np.where(np.isnan(columns["volume"]), None, columns["volume"])
+            changes_before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO prices (symbol_id, ts, price, volume) VALUES (?, ?, ?, ?)",
+                zip(
+                    symbol_ids[newer].tolist(), columns["ts"][newer].tolist(),
+                    columns["price"][newer].tolist(), volumes[newer].tolist(),
+                ),
+            )
+            inserted = conn.total_changes - changes_before
+        conn.close()
+        if store is not None:
+            for start, stop in zip(starts, bounds):
+                store.write(str(names[start]), columns["ts"][start:stop], columns["price"][start:stop])
+            store.flush()
+        logging.info(f"✅ Прогрів зі знімка: {len(starts)} активів, додано {inserted} записів.")
+        return inserted
+    except Exception as e:
+        logging.error(f"❌ Помилка прогріву зі знімка: {e}")
+        return 0
+
+if __name__ == "__main__":
+    # python -m bot.database.snapshot export|load [шлях до бази]
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    path = sys.argv[2] if len(sys.argv) > 2 else DB_PATH
+    if command == "export":
+        print(export_snapshot(path))
+    else:
+        print(f"Додано записів: {warm_start(path)}")
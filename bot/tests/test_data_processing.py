@@ -0,0 +1,289 @@
+import sys
+import os
+
+# Додати кореневу папку проєкту до шляху Python
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from bot.data_processing.data_672 import plan_request, CANDLES_LIMIT, INTERVAL_SECONDS
+from bot.utils.kline_parser import KlineArrays
+
+def test_plan_request_incremental():
+    """
+    Для активу з повним вікном запитуються лише відсутні свічки, починаючи з останньої збереженої.
+    """
+    last_open = 1_700_000_100 - 1_700_000_100 % INTERVAL_SECONDS
+    now = last_open + 3 * INTERVAL_SECONDS + 10
+
+    start_time, limit = plan_request((CANDLES_LIMIT, last_open), now=now)
+
+    assert start_time == last_open * 1000
+    assert limit == 5
+
+def test_plan_request_full_backfill():
+    """
+    Новий актив або неповне вікно призводять до повного завантаження, а розрив, довший за вікно, —
+    до посторінкового дозавантаження від останньої свічки (не старше за RETENTION_CANDLES).
+    """
+    from bot.data_processing.data_672 import RETENTION_CANDLES
+
+    last_open = 1_700_000_100 - 1_700_000_100 % INTERVAL_SECONDS
+    assert plan_request(None) == (None, CANDLES_LIMIT)
+    assert plan_request((10, last_open), now=last_open + 60) == (None, CANDLES_LIMIT)
+
+    far_future = last_open + (CANDLES_LIMIT + 5) * INTERVAL_SECONDS
+    assert plan_request((CANDLES_LIMIT, last_open), now=far_future) == (last_open * 1000, CANDLES_LIMIT)
+
+    beyond_retention = last_open + (RETENTION_CANDLES + 5) * INTERVAL_SECONDS
+    start_time, _ = plan_request((CANDLES_LIMIT, last_open), now=beyond_retention)
+    assert start_time == (beyond_retention - (RETENTION_CANDLES - 1) * INTERVAL_SECONDS) * 1000
+
+def test_fetch_and_queue_pages_over_long_gap(monkeypatch):
+    """
+    Розрив, довший за сторінку, дозавантажується сторінками до поточної свічки без пропусків.
+    """
+    import asyncio
+    import time
+    import numpy as np
+    from bot.data_processing import data_672
+
+    now = int(time.time())
+    current_open = now - now % INTERVAL_SECONDS
+    last_open = current_open - (2 * CANDLES_LIMIT + 10) * INTERVAL_SECONDS
+    starts = []
+
+    async def fake_fetch_prices(session, symbol, start_time, limit):
+        starts.append(start_time)
+        open_times = np.arange(start_time // 1000, current_open + 1, INTERVAL_SECONDS)[:limit] * 1000
+        return KlineArrays(open_times, open_times + 899_999, np.ones(open_times.size), np.ones(open_times.size))
+
+    class Writer:
+        written = []
+
+        async def put(self, asset, prices):
+            self.written.extend(prices.open_time.tolist())
+
+    monkeypatch.setattr(data_672, "fetch_prices", fake_fetch_prices)
+    writer = Writer()
+    start_time, limit = plan_request((CANDLES_LIMIT, last_open))
+    assert asyncio.run(data_672.fetch_and_queue(None, writer, "PIXEL", start_time, limit))
+
+    assert len(starts) == 3 and starts[0] == last_open * 1000
+    assert writer.written == list(range(last_open * 1000, current_open * 1000 + 1, INTERVAL_SECONDS * 1000))
+
+def test_plan_chunks_covers_window():
+    """
+    Частини вирівняні за сіткою CHUNK_MS і покривають усе вікно до поточного моменту.
+    """
+    from bot.data_processing.backfill import plan_chunks, CHUNK_MS, WINDOWS
+
+    now = 1_700_000_123
+    chunks = plan_chunks(WINDOWS["4m"], now=now)
+
+    assert all(start % CHUNK_MS == 0 and end == start + CHUNK_MS - 1 for start, end in chunks)
+    assert chunks[0][0] <= (now - WINDOWS["4m"] * INTERVAL_SECONDS) * 1000
+    assert chunks[-1][1] >= now * 1000
+    assert len(chunks) in (12, 13)
+
+def test_backfill_resumes_after_failure(tmp_path, monkeypatch):
+    """
+    Частина, завантаження якої завершилося помилкою, повторюється при наступному запуску, решта — ні.
+    """
+    import asyncio
+    import sqlite3
+    from bot.data_processing import backfill
+
+    calls = []
+    failed = set()
+
+    async def fake_fetch_prices(session, symbol, start_time, limit, end_time):
+        calls.append((symbol, start_time))
+        if symbol == "YGGUSDT" and not failed:
+            failed.add(start_time)
+            return None
+        return KlineArrays([start_time], [start_time + 899_999], [1.0], [1.0])
+
+    monkeypatch.setattr(backfill, "fetch_prices", fake_fetch_prices)
+    db_path = str(tmp_path / "backfill.db")
+    chunks = len(backfill.plan_chunks(backfill.WINDOWS["1m"]))
+
+    asyncio.run(backfill.run_backfill("1m", ["PIXEL", "YGG"], db_path))
+    assert len(calls) == 2 * chunks
+
+    calls.clear()
+    asyncio.run(backfill.run_backfill("1m", ["PIXEL", "YGG"], db_path))
+    # Повторно завантажуються лише невдала частина та поточна (незавершена) частина кожного активу
+    current_chunk = backfill.plan_chunks(backfill.WINDOWS["1m"])[-1][0]
+    assert set(calls) == {("YGGUSDT", failed.pop()), ("PIXELUSDT", current_chunk), ("YGGUSDT", current_chunk)}
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0] == 2 * chunks
+
+    # Позначки частин, що вийшли за найдовше вікно, видаляються
+    oldest_chunk = backfill.plan_chunks(max(backfill.WINDOWS.values()))[0][0]
+    conn.execute("INSERT INTO backfill_progress VALUES ('PIXEL', ?)", (oldest_chunk - backfill.CHUNK_MS,))
+    conn.commit()
+    backfill.fetch_completed_chunks(db_path)
+    assert conn.execute("SELECT MIN(chunk_start) FROM backfill_progress").fetchone()[0] >= oldest_chunk
+    conn.close()
+
+def test_resampler_matches_pandas_and_updates_incrementally(tmp_path):
+    """
+    Старші таймфрейми збігаються з pandas.resample().last() і коректно дописуються після нових свічок.
+    """
+    import asyncio
+    import numpy as np
+    import pandas as pd
+    from bot.database.db_writer import AsyncDBWriter
+    from bot.data_processing.resample import Resampler
+
+    db_path = str(tmp_path / "resample.db")
+    start = 1_700_006_400  # Північ UTC
+    open_times = start + INTERVAL_SECONDS * np.arange(8 * 96 + 7)
+    open_times = np.delete(open_times, [5, 300])  # Пропущені свічки всередині барів
+    prices = 1.0 + np.sin(np.arange(open_times.size) / 10)
+
+    def write(mask):
+        klines = KlineArrays(open_times[mask] * 1000, open_times[mask] * 1000 + 899_999, prices[mask], prices[mask])
+
+        async def main():
+            async with AsyncDBWriter(db_path) as writer:
+                await writer.put("PIXEL", klines)
+
+        asyncio.run(main())
+
+    first = open_times < start + 5 * 86400 + 3 * 3600 + 1800
+    write(first)
+    resampler = Resampler(db_path)
+    for timeframe in ("30m", "1h", "4h", "1d"):
+        resampler.get("PIXEL", timeframe)
+
+    write(~first)
+    series = pd.Series(prices, index=pd.to_datetime(open_times, unit="s"))
+    for timeframe, rule in (("30m", "30min"), ("1h", "1h"), ("4h", "4h"), ("1d", "1D")):
+        times, closes = resampler.get("PIXEL", timeframe)
+        expected = series.resample(rule).last().dropna()
+        expected_times = (expected.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        # Останній бар незавершений, тому не повертається
+        complete = expected_times + pd.Timedelta(rule).total_seconds() <= open_times[-1] + INTERVAL_SECONDS
+        assert times.tolist() == expected_times[complete].tolist()
+        assert np.allclose(closes, expected.to_numpy()[complete])
+        fresh_times, fresh_closes = Resampler(db_path).get("PIXEL", timeframe)
+        assert np.array_equal(fresh_times, times) and np.array_equal(fresh_closes, closes)
+
+def test_timeframe_zscores_written_to_monitored_pairs(tmp_path, monkeypatch):
+    """
+    Z-Score 1h/4h пар рахуються з ресемпльованих 15-хвилинних свічок і записуються в monitoredPairs.json.
+    """
+    import asyncio
+    import json
+    import numpy as np
+    from bot.database.db_writer import AsyncDBWriter
+    from bot.data_processing.resample import Resampler, update_timeframe_zscores
+    from bot.data_storage import json_manager
+
+    db_path = str(tmp_path / "resample.db")
+    rng = np.random.default_rng(21)
+    open_times = 1_700_006_400 + INTERVAL_SECONDS * np.arange(30 * 96)
+    closes = {name: np.exp(np.cumsum(rng.normal(0, 0.01, open_times.size))) for name in ("NEAR", "FLOW")}
+
+    async def main():
+        async with AsyncDBWriter(db_path) as writer:
+            for name, prices in closes.items():
+                await writer.put(name, KlineArrays(open_times * 1000, open_times * 1000 + 899_999, prices, prices))
+
+    asyncio.run(main())
+    monkeypatch.setattr(json_manager, "MONITORED_PAIRS_FILE", tmp_path / "monitoredPairs.json")
+    monkeypatch.setattr(json_manager, "BACKUP_DIR", tmp_path / "backups")
+    (tmp_path / "monitoredPairs.json").write_text(json.dumps([{"pair": "NEAR/FLOW"}, {"pair": "NEAR/MISSING"}]))
+
+    resampler = Resampler(db_path, max_bars=100)
+    results = update_timeframe_zscores(bars=100, resampler=resampler)
+
+    for timeframe, step in (("1h", 4), ("4h", 16)):
+        synthetic = (closes["NEAR"] / closes["FLOW"])[step - 1::step][-100:]
+        expected = round(float((synthetic[-1] - synthetic.mean()) / synthetic.std()), 2)
+        assert results["NEAR/FLOW"][f"zscore_{timeframe}"] == expected
+    assert results["NEAR/MISSING"] == {"zscore_1h": None, "zscore_4h": None}
+    saved = json.loads((tmp_path / "monitoredPairs.json").read_text())
+    assert saved[0]["zscore_4h"] == results["NEAR/FLOW"]["zscore_4h"]
+
+    # Кеш обрізано до вікна, а активи пар, що більше не відстежуються, видаляються з нього
+    assert all(times.size <= 100 for times, _ in resampler.cache.values())
+    (tmp_path / "monitoredPairs.json").write_text(json.dumps(saved[:1]))
+    assert update_timeframe_zscores(bars=100, resampler=resampler)["NEAR/FLOW"] == results["NEAR/FLOW"]
+    assert {asset for asset, _ in resampler.cache} == {"NEAR", "FLOW"}
+
+def test_alignment_gap_policies():
+    """
+    Пропуски знаходяться векторно; короткі внутрішні пропуски заповнюються, довгі відкидаються,
+    а за політикою "stale" пара з пропуском у вікні позначається як застаріла.
+    """
+    import numpy as np
+    from bot.data_processing.alignment import align_legs, fill_short_gaps, find_gaps
+
+    values = np.array([
+        [np.nan, 1.0, np.nan, 3.0, np.nan, np.nan, np.nan, 7.0, np.nan],
+        [1.0, 2.0, np.nan, np.nan, 5.0, 6.0, 7.0, 8.0, 9.0],
+    ])
+    rows, starts, lengths, interior = find_gaps(~np.isnan(values))
+    assert list(zip(rows, starts, lengths, interior)) == [
+        (0, 0, 1, False), (0, 2, 1, True), (0, 4, 3, True), (0, 8, 1, False), (1, 2, 2, True),
+    ]
+    filled, count = fill_short_gaps(values, max_fill=2)
+    assert count == 3
+    assert np.array_equal(filled[0], [np.nan, 1, 1, 3, np.nan, np.nan, np.nan, 7, np.nan], equal_nan=True)
+    assert np.array_equal(filled[1], [1, 2, 2, 2, 5, 6, 7, 8, 9])
+
+    times = INTERVAL_SECONDS * np.arange(1_900_000, 1_900_010)
+    base = np.arange(1.0, 11.0)
+    quote = np.arange(101.0, 111.0)
+    keep = np.ones(10, dtype=bool)
+    keep[6] = False  # Одна пропущена свічка quote
+    ts, b, q = align_legs(times, base, times[keep], quote[keep], window=4, policy="ffill")
+    assert list(ts) == list(times[-4:]) and list(q) == [106, 106, 108, 109, 110][-4:]
+    ts, b, q = align_legs(times, base, times[keep], quote[keep], window=4, policy="drop")
+    assert list(ts) == [times[5], times[7], times[8], times[9]] and list(b) == [6, 8, 9, 10]
+    assert align_legs(times, base, times[keep], quote[keep], window=4, policy="stale") is None
+    assert align_legs(times, base, times[keep], quote[keep], window=3, policy="stale") is not None
+
+    # Кінець вікна — остання спільна свічка: свіжіші свічки одного активу не зсувають вікно
+    ts, b, q = align_legs(times, base, times[:-2], quote[:-2], window=3, policy="ffill")
+    assert list(ts) == list(times[5:8]) and list(b) == [6, 7, 8]
+
+def test_comparisons_use_aligned_legs(tmp_path, monkeypatch):
+    """
+    fetch_data вирівнює активи по сітці: пропущена свічка одного активу не зсуває пару ціна-до-ціни,
+    а з бази читається лише вікно із запасом, а не вся історія активу.
+    """
+    import numpy as np
+    from bot.data_processing import alignment, zscore_comparisons
+    from bot.database.connection import connect, transaction
+    from bot.database.models import UPSERT_PRICE_SQL, create_price_tables, get_symbol_ids
+
+    db_path = str(tmp_path / "aligned.db")
+    times = INTERVAL_SECONDS * np.arange(1_900_000, 1_900_700)
+    conn = connect(db_path)
+    with transaction(conn):
+        create_price_tables(conn)
+        ids = get_symbol_ids(conn, ["NEAR", "FLOW"])
+        history = INTERVAL_SECONDS * np.arange(1_898_000, 1_900_700)  # Довга історія NEAR
+        conn.executemany(UPSERT_PRICE_SQL, [(ids["NEAR"], int(ts), float(ts), None) for ts in history])
+        conn.executemany(UPSERT_PRICE_SQL, [(ids["FLOW"], int(ts), float(ts), None) for ts in np.delete(times, [100, 650])])
+    conn.close()
+    monkeypatch.setattr(zscore_comparisons, "DB_PATH", db_path)
+    read = []
+    original = alignment.fetch_leg
+
+    def counting_fetch_leg(cursor, asset, since=None):
+        leg = original(cursor, asset, since)
+        read.append(leg[0].size)
+        return leg
+
+    monkeypatch.setattr(alignment, "fetch_leg", counting_fetch_leg)
+
+    base, quote = zscore_comparisons.fetch_data("NEAR", "FLOW")
+    assert max(read) <= 672 + alignment.ALIGN_SLACK_BARS + 1
+    assert len(base) == len(quote) == 672
+    # Ціна = ts, тож після вирівнювання відрізняються лише дві заповнені свічки FLOW
+    assert np.count_nonzero(np.array(base) != np.array(quote)) == 2
+    assert base[-1] == quote[-1] == float(times[-1])
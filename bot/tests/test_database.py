@@ -0,0 +1,298 @@
+import sys
+import os
+import asyncio
+import sqlite3
+
+# Додати кореневу папку проєкту до шляху Python
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from bot.database.db_writer import AsyncDBWriter
+from bot.utils.kline_parser import KlineArrays
+
+def make_klines(open_times, prices):
+    """
+    Свічки KlineArrays з часом відкриття в секундах.
+    """
+    open_time = [t * 1000 for t in open_times]
+    close_time = [t + 899_999 for t in open_time]
+    return KlineArrays(open_time, close_time, prices, [1.0] * len(prices))
+
+def test_async_writer_batches_and_retention(tmp_path):
+    """
+    Записувач зберігає свічки кількох активів через одне з'єднання та залишає лише останні retention записів.
+    """
+    db_path = str(tmp_path / "writer.db")
+
+    async def main():
+        async with AsyncDBWriter(db_path, queue_size=2, batch_assets=3, retention=5) as writer:
+            for asset in ("PIXEL", "YGG", "XAI", "FLOW"):
+                await writer.put(asset, make_klines([900 * i for i in range(8)], [float(i) for i in range(8)]))
+            # Повторний запис оновлює ціну наявної свічки
+            await writer.put("PIXEL", make_klines([900 * 7], [70.0]))
+        return writer.written_rows
+
+    assert asyncio.run(main()) == 4 * 8 + 1
+
+    conn = sqlite3.connect(db_path)
+    counts = dict(conn.execute(
+        "SELECT s.name, COUNT(*) FROM prices p JOIN symbols s ON s.id = p.symbol_id GROUP BY s.name"
+    ).fetchall())
+    prices = [row[0] for row in conn.execute(
+        "SELECT p.price FROM prices p JOIN symbols s ON s.id = p.symbol_id WHERE s.name = 'PIXEL' ORDER BY p.ts"
+    )]
+    conn.close()
+
+    assert counts == {"PIXEL": 5, "YGG": 5, "XAI": 5, "FLOW": 5}
+    assert prices == [3.0, 4.0, 5.0, 6.0, 70.0]
+
+def test_failed_write_marks_assets_failed(tmp_path, monkeypatch):
+    """
+    Активи з пакета, який не вдалося записати, повертаються як невдалі й потрапляють у повторний прохід.
+    """
+    from bot.data_processing import data_672
+    from bot.database import db_writer
+
+    async def fake_fetch_prices(session, symbol, start_time=None, limit=672, end_time=None):
+        return make_klines([900, 1800], [1.0, 2.0])
+
+    monkeypatch.setattr(data_672, "DB_PATH", str(tmp_path / "writer.db"))
+    monkeypatch.setattr(data_672, "fetch_prices", fake_fetch_prices)
+    monkeypatch.setattr(data_672, "fetch_stored_state", lambda: {})
+
+    async def main(assets):
+        return await data_672.fetch_and_save_assets(None, assets, incremental=False)
+
+    assert asyncio.run(main(["PIXEL"])) == {"PIXEL": True}
+    monkeypatch.setattr(db_writer, "UPSERT_PRICE_SQL", "INSERT INTO missing_table VALUES (?, ?, ?, ?)")
+    assert asyncio.run(main(["YGG", "XAI"])) == {"YGG": False, "XAI": False}
+
+def test_migrate_legacy_table(tmp_path):
+    """
+    Записи зі старої таблиці cryptocurrencies переносяться до prices з ts = час відкриття свічки.
+    """
+    from bot.database.migrate import migrate_database
+
+    db_path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE cryptocurrencies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        price REAL NOT NULL,
+        UNIQUE(name, timestamp)
+    )
+    """)
+    conn.executemany("INSERT INTO cryptocurrencies (name, timestamp, price) VALUES (?, ?, ?)", [
+        ("PIXEL", "2025-01-12T12:00:00+00:00", 1.0),  # Час відкриття
+        ("PIXEL", "2025-01-12T12:29:59+00:00", 2.0),  # Час закриття свічки 12:15
+        ("YGG", "2025-01-12T12:14:59+00:00", 3.0),
+    ])
+    conn.commit()
+    conn.close()
+
+    assert migrate_database(db_path) == 3
+    assert migrate_database(db_path) == 0
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT s.name, p.ts, p.price FROM prices p JOIN symbols s ON s.id = p.symbol_id ORDER BY s.name, p.ts"
+    ).fetchall()
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    conn.close()
+
+    assert rows == [("PIXEL", 1736683200, 1.0), ("PIXEL", 1736684100, 2.0), ("YGG", 1736683200, 3.0)]
+    assert "cryptocurrencies" not in tables
+
+def test_connection_wal_and_transactions(tmp_path):
+    """
+    З'єднання працюють у WAL, вкладені транзакції фіксуються одним комітом, а помилка відкочує весь блок.
+    """
+    from bot.database.connection import get_connection, transaction
+    from bot.database.db_manager import DatabaseManager
+
+    db_path = str(tmp_path / "manager.db")
+    manager = DatabaseManager(db_path)
+    assert manager.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    reader = get_connection(db_path)
+    assert get_connection(db_path) is reader
+
+    with manager.transaction():
+        manager.insert_or_update_pair("PIXEL/YGG", 1.5, 0.2)
+        manager.insert_or_update_pair("XAI/YGG", -0.5, 0.1)
+        # Читач не бачить незафіксованих змін і не блокується записувачем
+        assert reader.execute("SELECT COUNT(*) FROM pairs").fetchone()[0] == 0
+    assert reader.execute("SELECT COUNT(*) FROM pairs").fetchone()[0] == 2
+
+    try:
+        with manager.transaction():
+            manager.insert_or_update_pair("FLOW/CHZ", 0.3, 0.4)
+            raise RuntimeError("збій посеред пакета")
+    except RuntimeError:
+        pass
+    assert reader.execute("SELECT COUNT(*) FROM pairs").fetchone()[0] == 2
+    manager.close()
+
+def test_prune_prices_keeps_window_for_all_assets(tmp_path):
+    """
+    Залишаються останні window свічок кожного активу; активи з коротшою історією не чіпаються,
+    а видалення для активу — діапазонний пошук по первинному ключу.
+    """
+    from bot.database.connection import connect, transaction
+    from bot.database.models import UPSERT_PRICE_SQL, create_price_tables, get_symbol_ids
+    from bot.database.retention import PRUNE_SQL, prune_prices
+
+    conn = connect(str(tmp_path / "retention.db"))
+    with transaction(conn):
+        create_price_tables(conn)
+        ids = get_symbol_ids(conn, ["PIXEL", "YGG", "XAI"])
+        lengths = {"PIXEL": 10, "YGG": 4, "XAI": 6}
+        conn.executemany(UPSERT_PRICE_SQL, [
+            (ids[name], 900 * i, float(i), None) for name, length in lengths.items() for i in range(length)
+        ])
+        assert prune_prices(conn, 6) == 4
+
+    rows = conn.execute("""
+    SELECT s.name, COUNT(*), MIN(p.ts) FROM prices p JOIN symbols s ON s.id = p.symbol_id GROUP BY s.name
+    """).fetchall()
+    assert sorted(rows) == [("PIXEL", 6, 900 * 4), ("XAI", 6, 0), ("YGG", 4, 0)]
+    plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {PRUNE_SQL}", (1, 0)))
+    conn.close()
+    assert "USING PRIMARY KEY (symbol_id=? AND ts<?)" in plan
+
+def test_ring_store_alignment_gaps_and_readers(tmp_path):
+    """
+    Кільцеве сховище повертає вирівняні вікна з маскою пропусків, переживає перехід через кінець кільця
+    і відкривається іншим читачем лише для читання.
+    """
+    import numpy as np
+    from bot.database.ring_store import RingBufferStore
+
+    store = RingBufferStore(tmp_path / "ring", capacity=8, max_assets=4)
+    times = 900 * np.arange(100, 112)
+    store.write("PIXEL", times, times / 900.0)
+    store.write("YGG", np.delete(times, [9]), np.delete(times, [9]) / 450.0)
+    store.flush()
+
+    reader = RingBufferStore(tmp_path / "ring", readonly=True)
+    candle_times, prices, valid = reader.aligned(["PIXEL", "YGG", "XAI"])
+    assert candle_times.tolist() == times[-8:].tolist()
+    assert prices[0].tolist() == (times[-8:] / 900.0).tolist()
+    assert valid[0].all() and not valid[2].any()
+    assert valid[1].tolist() == [True] * 5 + [False] + [True] * 2
+
+    # Новіша свічка після розриву інвалідує пропущені слоти, а не залишає старі ціни
+    store.write("PIXEL", [900 * 115], [1.0])
+    _, prices, valid = store.aligned(["PIXEL"])
+    assert valid[0].tolist() == [True] * 4 + [False] * 3 + [True]
+    assert prices[0, -1] == 1.0
+
+    ring, head = store.ring("PIXEL")
+    assert head == 900 * 115 and ring[store.slot(head)] == 1.0
+
+def test_snapshot_export_and_warm_start(tmp_path, monkeypatch):
+    """
+    Знімок (Parquet або .npz без pyarrow) пишеться частинами й містить історію метрик пар;
+    прогрів додає лише свічки, новіші за останню збережену, не повертаючи видалену історію.
+    """
+    from bot.database import snapshot
+    from bot.database.connection import connect, transaction
+    from bot.database.db_manager import DatabaseManager
+    from bot.database.models import UPSERT_PRICE_SQL, create_price_tables, get_symbol_ids
+
+    source = str(tmp_path / "source.db")
+    conn = connect(source)
+    with transaction(conn):
+        create_price_tables(conn)
+        ids = get_symbol_ids(conn, ["PIXEL", "YGG"])
+        conn.executemany(UPSERT_PRICE_SQL, [
+            (ids[name], 900 * i, float(i) + len(name), 2.0) for name in ids for i in range(5)
+        ])
+    conn.close()
+    metrics_db = str(tmp_path / "metrics.db")
+    manager = DatabaseManager(metrics_db)
+    for ts in (900, 1800, 2700):
+        manager.upsert_pair_metrics(ts, {"PIXEL/YGG": {"zscore": ts / 900, "cross_rate": 0.5}})
+    manager.close()
+    monkeypatch.setattr(snapshot, "CHUNK_ROWS", 3)
+
+    for use_arrow in ((True, False) if snapshot.pq is not None else (False,)):
+        if not use_arrow:
+            monkeypatch.setattr(snapshot, "pq", None)
+        snapshot_dir = tmp_path / f"snapshot_{use_arrow}"
+        written = snapshot.export_snapshot(source, snapshot_dir, metrics_db)
+        assert written[0].suffix == (".parquet" if use_arrow else ".npz")
+        assert [path.stem for path in written] == ["prices", "pairs", "pair_metrics", "pair_window_metrics"]
+        history = snapshot._read_columns(written[2])
+        assert history["pair"].tolist() == ["PIXEL/YGG"] * 3 and history["zscore"].tolist() == [1.0, 2.0, 3.0]
+
+        # Історію PIXEL до ts 1800 вже видалено прунінгом
+        target = str(tmp_path / f"target_{use_arrow}.db")
+        conn = connect(target)
+        with transaction(conn):
+            create_price_tables(conn)
+            pixel = get_symbol_ids(conn, ["PIXEL"])["PIXEL"]
+            conn.execute(UPSERT_PRICE_SQL, (pixel, 900 * 2, 99.0, None))
+        conn.close()
+
+        assert snapshot.warm_start(target, snapshot_dir) == 7
+        conn = connect(target)
+        rows = conn.execute(
+            "SELECT s.name, p.ts, p.price FROM prices p JOIN symbols s ON s.id = p.symbol_id ORDER BY s.name, p.ts"
+        ).fetchall()
+        conn.close()
+        assert len(rows) == 8
+        assert rows[:3] == [("PIXEL", 1800, 99.0), ("PIXEL", 2700, 8.0), ("PIXEL", 3600, 9.0)]
+        assert rows[3] == ("YGG", 0, 3.0)
+
+def test_pair_metrics_bulk_upsert_and_history(tmp_path):
+    """
+    Метрики всіх пар записуються одним пакетом: pairs тримає поточні значення й максимуми, pair_metrics — історію.
+    """
+    from bot.database.db_manager import DatabaseManager
+
+    manager = DatabaseManager(str(tmp_path / "metrics.db"))
+    for ts, zscore in ((900, 1.5), (1800, 2.5), (2700, -0.5)):
+        manager.upsert_pair_metrics(ts, {
+            "PIXEL/YGG": {"zscore": zscore, "cross_rate": 0.1 * ts / 900, "correlation": 0.8, "beta": 1.2},
+            "XAI/YGG": {"zscore": -zscore, "cross_rate": 1.0},
+        })
+    # Повторний запис того самого циклу оновлює точку, а не дублює її
+    manager.upsert_pair_metrics(2700, {"PIXEL/YGG": {"zscore": -1.0, "cross_rate": 0.3, "correlation": 0.8, "beta": 1.2}})
+
+    history = manager.fetch_pair_metrics("PIXEL/YGG", since=1800)
+    assert history["ts"].tolist() == [1800, 2700]
+    assert history["zscore"].dtype.name == "float32" and history["zscore"].tolist() == [2.5, -1.0]
+    assert manager.fetch_pair_metrics("XAI/YGG")["beta"].size == 3
+
+    pairs = {row[1]: row for row in manager.fetch_all_pairs()}
+    assert pairs["PIXEL/YGG"][2:5] == (-1.0, 0.3, 2.5)
+
+    # Цикл без визначених значень (пропуски у вікні) не скидає збережені максимуми
+    manager.upsert_pair_metrics(3600, {"PIXEL/YGG": {"zscore": None, "cross_rate": None}})
+    pairs = {row[1]: row for row in manager.fetch_all_pairs()}
+    assert pairs["PIXEL/YGG"][2:6] == (None, None, 2.5, 0.3)
+    manager.close()
+
+def test_writer_reports_committed_assets_to_debounced_recompute(tmp_path):
+    """
+    Записувач повідомляє активи записаних пакетів, а DebouncedRecompute об'єднує кілька
+    повідомлень в один перерахунок; порожні та невдалі пакети не повідомляються.
+    """
+    from bot.data_processing.recompute import DebouncedRecompute
+
+    calls = []
+
+    async def main():
+        recompute = DebouncedRecompute(lambda assets: calls.append(set(assets)), delay=0.05, max_delay=1)
+        await recompute.start()
+        async with AsyncDBWriter(str(tmp_path / "writer.db"), batch_assets=1, on_commit=recompute.notify) as writer:
+            await writer.put("PIXEL", make_klines([0, 900], [1.0, 2.0]))
+            await writer.put("YGG", make_klines([0, 900], [3.0, 4.0]))
+            await writer.put("XAI", make_klines([], []))
+        await recompute.close()
+        return recompute.runs
+
+    assert asyncio.run(main()) == 1
+    assert calls == [{"PIXEL", "YGG"}]
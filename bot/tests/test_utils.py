@@ -0,0 +1,200 @@
+import sys
+import os
+import asyncio
+import time
+
+# Додати кореневу папку проєкту до шляху Python
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from bot.utils.rate_limiter import AdaptiveRateLimiter, klines_weight
+
+def test_rate_limiter_aimd():
+    """
+    429 з Retry-After вдвічі зменшує паралельність і ставить паузу, успішні відповіді її поступово збільшують.
+    """
+    limiter = AdaptiveRateLimiter(initial_concurrency=8, latency_target=1.0)
+
+    limiter.record_response(200, {"X-MBX-USED-WEIGHT-1m": "120"}, 0.1)
+    assert limiter.used_weight == 120
+    assert limiter.concurrency > 8
+
+    limiter.record_response(429, {"Retry-After": "7"}, 0.1)
+    assert limiter.concurrency < 5
+    assert limiter.blocked_until > time.time() + 5
+
+    # Відповіді на запити, що були в дорозі під час зменшення, паралельність повторно не зменшують
+    concurrency = limiter.concurrency
+    limiter.record_response(429, {"Retry-After": "7"}, 0.1)
+    limiter.record_response(200, {}, 3.0)
+    assert limiter.concurrency == concurrency
+
+    limiter.last_decrease -= 10  # Наступне вікно: запит стартував уже після зменшення
+    limiter.record_response(200, {}, 3.0)
+    assert limiter.concurrency == max(1, concurrency / 2)
+
+def test_rate_limiter_bounds_concurrency():
+    """
+    Кількість одночасних запитів не перевищує поточну паралельність.
+    """
+    limiter = AdaptiveRateLimiter(initial_concurrency=3)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limiter.limit(klines_weight(672)):
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(12)))
+
+    asyncio.run(main())
+    assert peak == 3
+    assert limiter.in_flight == 0
+    assert 0 < limiter.used_weight <= 12 * 5
+
+def test_parse_klines_matches_json():
+    """
+    Розбір у масиви дає ті самі значення, що й json.
+    """
+    import json
+    from bot.utils.kline_parser import parse_klines
+
+    raw = json.dumps([
+        [1499040000000 + i * 900_000, "0.0163", "0.8", "0.0157", f"{0.01577 + i:.8f}", f"{148976.11 + i:.8f}",
+         1499040899999 + i * 900_000, "2434.19", 308, "1756.87", "28.46", "0"]
+        for i in range(3)
+    ]).encode()
+    klines = parse_klines(raw)
+    data = json.loads(raw)
+
+    assert len(klines) == 3
+    assert klines.open_time.tolist() == [row[0] for row in data]
+    assert klines.close_time.tolist() == [row[6] for row in data]
+    assert klines.close.tolist() == [float(row[4]) for row in data]
+    assert klines.volume.tolist() == [float(row[5]) for row in data]
+    assert len(parse_klines(b"[]")) == 0
+
+def test_symbol_registry_from_cache(tmp_path):
+    """
+    Реєстр працює офлайн із дискового кешу та відсіює делістингові й неіснуючі символи.
+    """
+    import json
+    from bot.utils.symbol_registry import SymbolRegistry
+
+    cache_path = tmp_path / "exchange_info.json"
+    exchange_info = {"symbols": [
+        {"symbol": "PIXELUSDT", "status": "TRADING", "baseAsset": "PIXEL", "quoteAsset": "USDT",
+         "filters": [{"filterType": "PRICE_FILTER", "tickSize": "0.00010000"}]},
+        {"symbol": "LINAUSDT", "status": "BREAK", "baseAsset": "LINA", "quoteAsset": "USDT", "filters": []},
+    ]}
+    cache_path.write_text(json.dumps({"fetched_at": time.time(), "symbols": SymbolRegistry._compact(exchange_info)}))
+
+    registry = asyncio.run(SymbolRegistry(cache_path).load())
+    valid, invalid = registry.validate_assets({"PIXEL", "LINA", "BAKE"})
+
+    assert valid == {"PIXEL"}
+    assert invalid == {"LINA": "BREAK", "BAKE": None}
+    assert registry.filters("PIXELUSDT")["PRICE_FILTER"]["tickSize"] == "0.00010000"
+
+    # Без кешу і без мережі жоден актив не відкидається
+    empty = asyncio.run(SymbolRegistry(tmp_path / "missing.json").load())
+    assert empty.validate_assets({"PIXEL"}) == ({"PIXEL"}, {})
+
+def test_circuit_breaker_states(monkeypatch):
+    """
+    Запобіжник відкривається після серії невдач, переходить у half-open після паузи і закривається після успіху.
+    """
+    from bot.utils import api_client
+
+    clock = [100.0]
+    monkeypatch.setattr(api_client.time, "monotonic", lambda: clock[0])
+    breaker = api_client.CircuitBreaker(failure_threshold=3, cooldown=10)
+
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 11
+    assert breaker.state == "half-open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 11
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_circuit_breaker_single_probe(monkeypatch):
+    """
+    У стані half-open проходить лише один пробний запит; решта чекає і проходить після його успіху.
+    """
+    from bot.utils import api_client
+
+    monkeypatch.setattr(api_client, "PROBE_POLL_INTERVAL", 0.01)
+    breaker = api_client.CircuitBreaker(failure_threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    passed = []
+
+    async def request(name):
+        await breaker.wait_ready()
+        passed.append(name)
+
+    async def main():
+        await asyncio.sleep(0.06)
+        waiters = [asyncio.create_task(request(i)) for i in range(5)]
+        await asyncio.sleep(0.03)
+        assert len(passed) == 1  # Лише проба
+        breaker.record_success()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(main())
+    assert sorted(passed) == list(range(5))
+
+def test_fetch_with_retry_retries_transient_errors(monkeypatch):
+    """
+    5xx повторюється до успіху, а 400 (неіснуючий символ) піднімається одразу без повторів.
+    """
+    import aiohttp
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+    from bot.utils import api_client
+
+    monkeypatch.setattr(api_client, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(api_client, "circuit_breaker", api_client.CircuitBreaker())
+    hits = {"flaky": 0, "invalid": 0}
+
+    async def flaky(request):
+        hits["flaky"] += 1
+        if hits["flaky"] < 3:
+            return web.Response(status=503)
+        return web.Response(body=b"[]")
+
+    async def invalid(request):
+        hits["invalid"] += 1
+        return web.json_response({"code": -1121, "msg": "Invalid symbol."}, status=400)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/flaky", flaky)
+        app.router.add_get("/invalid", invalid)
+        server = TestServer(app)
+        await server.start_server()
+        base = f"http://{server.host}:{server.port}"
+        try:
+            async with aiohttp.ClientSession() as session:
+                body = await api_client.fetch_with_retry(session, f"{base}/flaky")
+                try:
+                    await api_client.fetch_with_retry(session, f"{base}/invalid")
+                    raised = False
+                except aiohttp.ClientResponseError:
+                    raised = True
+        finally:
+            await server.close()
+        return body, raised
+
+    body, raised = asyncio.run(main())
+    assert body == b"[]"
+    assert hits == {"flaky": 3, "invalid": 1}
+    assert raised
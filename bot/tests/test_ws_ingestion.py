@@ -0,0 +1,216 @@
+import sys
+import os
+import asyncio
+import sqlite3
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Додати кореневу папку проєкту до шляху Python
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from bot.data_processing import ws_ingestion
+from bot.database.db_writer import AsyncDBWriter
+
+OPEN_TIME = 1_700_000_100_000 - 1_700_000_100_000 % 900_000
+
+def kline_message(symbol, closed, price):
+    """
+    Повідомлення комбінованого потоку у форматі Binance.
+    """
+    return {
+        "stream": f"{symbol.lower()}@kline_15m",
+        "data": {
+            "e": "kline",
+            "s": symbol,
+            "k": {"t": OPEN_TIME, "T": OPEN_TIME + 899_999, "s": symbol, "c": str(price), "v": "10.0", "x": closed},
+        },
+    }
+
+async def stub_stream(request):
+    """
+    Stub-сервер: для кожного потоку надсилає незакриту та закриту свічку, після чого закриває з'єднання.
+    """
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    for stream in request.query["streams"].split("/"):
+        symbol = stream.split("@")[0].upper()
+        await ws.send_json(kline_message(symbol, False, 1.0))
+        await ws.send_json(kline_message(symbol, True, 2.5))
+    await ws.close()
+    return ws
+
+def test_ws_shard_saves_closed_candles_and_reconnects(tmp_path, monkeypatch):
+    """
+    Закриті свічки записуються в базу, після розриву з'єднання виконується перепідключення з дозавантаженням.
+    """
+    db_path = str(tmp_path / "ws.db")
+    monkeypatch.setattr(ws_ingestion, "RECONNECT_DELAY", 0.01)
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/stream", stub_stream)
+        server = TestServer(app)
+        await server.start_server()
+
+        connects = []
+        stop_event = asyncio.Event()
+
+        async def on_connect(session, writer, assets):
+            connects.append(list(assets))
+            if len(connects) == 2:
+                stop_event.set()
+
+        try:
+            async with aiohttp.ClientSession() as session, AsyncDBWriter(db_path) as writer:
+                await asyncio.wait_for(
+                    ws_ingestion.run_shard(
+                        session, writer, ["PIXEL", "YGG"], f"ws://{server.host}:{server.port}",
+                        on_connect=on_connect, stop_event=stop_event,
+                    ),
+                    timeout=5,
+                )
+        finally:
+            await server.close()
+        return connects
+
+    connects = asyncio.run(main())
+    assert connects == [["PIXEL", "YGG"], ["PIXEL", "YGG"]]
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT s.name, p.price FROM prices p JOIN symbols s ON s.id = p.symbol_id ORDER BY s.name").fetchall()
+    conn.close()
+    assert rows == [("PIXEL", 2.5), ("YGG", 2.5)]
+
+def test_shard_assets_and_stream_url():
+    """
+    Активи розбиваються на групи, а URL містить комбіновані потоки kline_15m.
+    """
+    shards = ws_ingestion.shard_assets({"C", "A", "B"}, shard_size=2)
+    assert shards == [["A", "B"], ["C"]]
+    assert ws_ingestion.build_stream_url(["PIXEL"], "ws://x") == "ws://x/stream?streams=pixelusdt@kline_15m"
+
+def test_gap_fill_skips_open_candle_and_writer_prunes(tmp_path, monkeypatch):
+    """
+    REST-дозавантаження не записує незакриту свічку, а довготривалий записувач обрізає історію без закриття.
+    """
+    import time
+    from bot.data_processing import data_672
+    from bot.utils.kline_parser import KlineArrays
+
+    db_path = str(tmp_path / "ws.db")
+    now = int(time.time() * 1000)
+    open_times = [now - now % 900_000 - 900_000 * i for i in range(8, -1, -1)]  # Остання ще не закрита
+
+    async def fake_fetch_prices(session, symbol, start_time=None, limit=672, end_time=None):
+        return KlineArrays(open_times, [t + 899_999 for t in open_times], [1.0] * len(open_times), [0.0] * len(open_times))
+
+    monkeypatch.setattr(data_672, "fetch_prices", fake_fetch_prices)
+    monkeypatch.setattr(data_672, "fetch_stored_state", lambda: {})
+
+    async def main():
+        writer = AsyncDBWriter(db_path, retention=5, prune_interval=0)
+        await writer.start()
+        await ws_ingestion.rest_gap_fill(None, writer, ["PIXEL"])
+        await writer.put("PIXEL", KlineArrays([open_times[-1]], [open_times[-1] + 899_999], [2.0], [0.0]))
+        while writer.written_rows < 9:
+            await asyncio.sleep(0.01)
+        counts = await writer._run_in_writer(
+            lambda: writer.connection.execute("SELECT COUNT(*), MAX(ts) FROM prices").fetchone()
+        )
+        await writer.close()
+        return counts, writer.written_rows
+
+    (count, latest), written = asyncio.run(main())
+    assert written == 9  # 8 закритих свічок із REST і закрита свічка з потоку
+    assert (count, latest) == (5, open_times[-1] // 1000)
+
+def test_closed_kline_triggers_pair_metrics_recompute(tmp_path, monkeypatch):
+    """
+    Закрита свічка з потоку після запису пакета запускає перерахунок метрик пар, що містять її актив.
+    """
+    import json
+    import numpy as np
+    from bot.data_processing import data_672, metrics_cache
+    from bot.data_processing.metrics_cache import MetricsCache
+    from bot.data_processing.pair_metrics import update_pair_metrics
+    from bot.data_processing.recompute import DebouncedRecompute
+    from bot.data_storage import json_manager
+    from bot.database.connection import connect, transaction
+    from bot.database.models import UPSERT_PRICE_SQL, create_price_tables, get_symbol_ids
+    from bot.utils.kline_parser import KlineArrays
+
+    db_path = str(tmp_path / "ws.db")
+    metrics_db = str(tmp_path / "metrics.db")
+    pairs_file = tmp_path / "monitoredPairs.json"
+    pairs_file.write_text(json.dumps([{"pair": "NEAR/FLOW"}]))
+
+    # Історія до свічки, яку надішле потік
+    rng = np.random.default_rng(5)
+    times = OPEN_TIME // 1000 - 900 * np.arange(100, 0, -1)
+    conn = connect(db_path)
+    with transaction(conn):
+        create_price_tables(conn)
+        ids = get_symbol_ids(conn, ["NEAR", "FLOW"])
+        for asset in ("NEAR", "FLOW"):
+            prices = np.exp(np.cumsum(rng.normal(0, 0.01, times.size)))
+            conn.executemany(UPSERT_PRICE_SQL, [(ids[asset], int(ts), float(p), None) for ts, p in zip(times, prices)])
+    conn.close()
+
+    class FakeRegistry:
+        async def load(self, session=None):
+            return self
+
+        def validate_assets(self, assets):
+            return assets, {}
+
+    async def fake_fetch_prices(session, symbol, start_time=None, limit=672, end_time=None):
+        return KlineArrays([], [], [], [])
+
+    monkeypatch.setattr(ws_ingestion, "DB_PATH", db_path)
+    monkeypatch.setattr(ws_ingestion, "RECONNECT_DELAY", 0.01)
+    monkeypatch.setattr(ws_ingestion, "load_unique_assets", lambda: {"NEAR", "FLOW"})
+    monkeypatch.setattr(ws_ingestion, "SymbolRegistry", FakeRegistry)
+    monkeypatch.setattr(data_672, "fetch_prices", fake_fetch_prices)
+    monkeypatch.setattr(data_672, "fetch_stored_state", lambda: {})
+    monkeypatch.setattr(json_manager, "MONITORED_PAIRS_FILE", pairs_file)
+    monkeypatch.setattr(json_manager, "CANDIDATE_PAIRS_FILE", tmp_path / "candidatePairs.json")
+    monkeypatch.setattr(json_manager, "BACKUP_DIR", tmp_path / "backups")
+    monkeypatch.setattr(metrics_cache, "_default_cache", MetricsCache())
+
+    calls = []
+
+    async def main():
+        app = web.Application()
+        app.router.add_get("/stream", stub_stream)
+        server = TestServer(app)
+        await server.start_server()
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def recompute(assets):
+            calls.append(set(assets))
+            update_pair_metrics(db_path, metrics_db, {"1m": 60}, workers=1, changed_assets=assets)
+            loop.call_soon_threadsafe(stop_event.set)
+
+        try:
+            await asyncio.wait_for(
+                ws_ingestion.run_ws_ingestion(
+                    f"ws://{server.host}:{server.port}", stop_event=stop_event,
+                    recompute=DebouncedRecompute(recompute, delay=0.05, max_delay=1),
+                ),
+                timeout=10,
+            )
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+    assert calls and calls[0] == {"NEAR", "FLOW"}
+
+    conn = sqlite3.connect(metrics_db)
+    latest = conn.execute("SELECT MAX(ts) FROM pair_metrics").fetchone()[0]
+    conn.close()
+    assert latest == OPEN_TIME // 1000
+    saved = json.loads(pairs_file.read_text())
+    assert saved[0]["zscore_1m"] is not None
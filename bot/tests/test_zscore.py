@@ -1,10 +1,57 @@
 import sys
 import os
+import json
+
+import numpy as np
+import pytest
 
 # Додати кореневу папку проєкту до шляху Python
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+from bot.data_processing import metrics_cache
+from bot.data_processing.metrics_cache import MetricsCache
 from bot.data_processing.z_score_calculator import calculate_zscores_for_pairs
+from bot.data_storage import json_manager
+from bot.database.connection import connect, transaction
+from bot.database.models import UPSERT_PRICE_SQL, create_price_tables, get_symbol_ids
+
+def random_walks(rng, names, steps):
+    """Ціни активів як експоненти випадкових блукань: {актив: масив steps цін}."""
+    return {name: np.exp(np.cumsum(rng.normal(0, 0.01, steps))) for name in names}
+
+@pytest.fixture
+def price_db(tmp_path):
+    """
+    Фабрика тестової бази цін: create(closes, times, name) записує ряди {актив: ціни}
+    (NaN — свічки немає) і повертає (шлях до бази, {актив: symbol_id}).
+    """
+    def create(closes, times, name="prices.db"):
+        db_path = str(tmp_path / name)
+        conn = connect(db_path)
+        with transaction(conn):
+            create_price_tables(conn)
+            ids = get_symbol_ids(conn, list(closes))
+            for asset, prices in closes.items():
+                keep = ~np.isnan(prices)
+                conn.executemany(UPSERT_PRICE_SQL, [
+                    (ids[asset], int(ts), float(price), None) for ts, price in zip(times[keep], prices[keep])
+                ])
+        conn.close()
+        return db_path, ids
+    return create
+
+@pytest.fixture
+def monitored_pairs(tmp_path, monkeypatch):
+    """Файли JSONManager у tmp_path; повертає шлях до monitoredPairs.json."""
+    monkeypatch.setattr(json_manager, "MONITORED_PAIRS_FILE", tmp_path / "monitoredPairs.json")
+    monkeypatch.setattr(json_manager, "CANDIDATE_PAIRS_FILE", tmp_path / "candidatePairs.json")
+    monkeypatch.setattr(json_manager, "BACKUP_DIR", tmp_path / "backups")
+    return tmp_path / "monitoredPairs.json"
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    """Порожній спільний кеш метрик для тесту."""
+    monkeypatch.setattr(metrics_cache, "_default_cache", MetricsCache())
 
 def test_calculate_zscores():
     """
@@ -26,5 +73,413 @@ def test_calculate_zscores():
         else:
             print(f"Не вдалося розрахувати Z-Score для {pair}")
 
+def test_vectorized_engine_matches_per_pair(price_db, monkeypatch):
+    """
+    Векторний рушій дає ті самі Z-Score, що й розрахунок по парах, зокрема для пар із пропусками та нульовими цінами.
+    """
+    from bot.data_processing import z_score_calculator
+    from bot.data_processing.zscore_engine import calculate_zscores_vectorized
+
+    rng = np.random.default_rng(7)
+    times = 900 * np.arange(1_900_000, 1_900_800)
+    closes = {}
+    for name in ["PIXEL", "YGG", "XAI", "FLOW", "ZERO"]:
+        closes[name] = np.exp(np.cumsum(rng.normal(0, 0.01, times.size)))
+        closes[name][rng.random(times.size) <= (0.1 if name == "XAI" else 0)] = np.nan
+    closes["ZERO"][-3] = 0.0
+    db_path, _ = price_db(closes, times, "engine.db")
+
+    pairs = ["PIXEL/YGG", "XAI/YGG", "FLOW/XAI", "PIXEL/ZERO", "PIXEL/MISSING", "YGG/FLOW"]
+    monkeypatch.setattr(z_score_calculator, "DB_PATH", db_path)
+    expected = calculate_zscores_for_pairs(pairs)
+    actual = calculate_zscores_vectorized(pairs, db_path)
+
+    assert actual == expected
+    assert actual["PIXEL/ZERO"] is None and actual["PIXEL/MISSING"] is None
+    assert sum(z is not None for z in actual.values()) == 4
+
+def test_rolling_stats_match_full_recompute(tmp_path):
+    """
+    Інкрементальні статистики збігаються з прямим розрахунком по вікну, переживають пропуски та перезапуск.
+    """
+    from bot.data_processing.rolling_stats import RollingPairStats, INTERVAL_SECONDS
+
+    rng = np.random.default_rng(3)
+    window, steps = 48, 300
+    prices = np.exp(np.cumsum(rng.normal(0, 0.01, (3, steps)), axis=1)) * np.array([[2e4], [3.0], [0.5]])
+    prices[1, rng.random(steps) < 0.1] = np.nan
+    times = INTERVAL_SECONDS * (2_000_000 + np.arange(steps))
+    times[200:] += 5 * INTERVAL_SECONDS  # Розрив у кілька свічок
+    pairs = ["BTC/YGG", "YGG/XAI", "BTC/XAI"]
+
+    stats = RollingPairStats(pairs, window)
+    for column in range(150):
+        stats.update(times[column], prices[[0, 2, 1], column])  # Активи впорядковані: BTC, XAI, YGG
+    state_path = tmp_path / "rolling.npz"
+    stats.save(state_path)
+    stats = RollingPairStats.load(pairs, window, state_path)
+    for column in range(150, steps):
+        stats.update(times[column], prices[[0, 2, 1], column])
+
+    result = stats.stats()
+    in_window = times > times[-1] - window * INTERVAL_SECONDS
+    rows = {"BTC": 0, "YGG": 1, "XAI": 2}
+    for i, pair in enumerate(pairs):
+        base, quote = (prices[rows[asset], in_window] for asset in pair.split("/"))
+        ok = ~np.isnan(base) & ~np.isnan(quote)
+        synthetic = base[ok] / quote[ok]
+        x, y = np.log(quote[ok]), np.log(base[ok])
+        assert result["count"][i] == ok.sum()
+        assert np.isclose(result["mean"][i], synthetic.mean(), rtol=1e-10)
+        assert np.isclose(result["std"][i], synthetic.std(), rtol=1e-8)
+        assert np.isclose(result["beta"][i], np.cov(x, y, ddof=0)[0, 1] / x.var(), rtol=1e-8)
+        assert np.isclose(result["correlation"][i], np.corrcoef(x, y)[0, 1], rtol=1e-8)
+        if ok[-1]:
+            assert np.isclose(result["zscore"][i], (synthetic[-1] - synthetic.mean()) / synthetic.std(), rtol=1e-8)
+    assert stats.check_drift() < 1e-9
+
+def test_rolling_stats_reapply_corrected_head(tmp_path, price_db, monitored_pairs):
+    """
+    Виправлена на місці ціна останньої (незакритої) свічки застосовується під час наступного оновлення.
+    """
+    from bot.data_processing.rolling_stats import RollingPairStats, update_rolling_stats
+
+    rng = np.random.default_rng(17)
+    times = 900 * np.arange(1_900_000, 1_900_100)
+    db_path, ids = price_db(random_walks(rng, ["NEAR", "FLOW"], times.size), times)
+    monitored_pairs.write_text(json.dumps([{"pair": "NEAR/FLOW"}]))
+    state_path = tmp_path / "rolling.npz"
+    update_rolling_stats(db_path, 48, state_path)
+
+    conn = connect(db_path)
+    conn.execute(UPSERT_PRICE_SQL, (ids["NEAR"], int(times[-1]), 3.0, None))  # Закриття останньої свічки
+    conn.close()
+    result = update_rolling_stats(db_path, 48, state_path)
+
+    fresh = RollingPairStats(["NEAR/FLOW"], 48)
+    fresh.catch_up(connect(db_path))
+    assert result["NEAR/FLOW"]["zscore"] == round(float(fresh.stats()["zscore"][0]), 2)
+    assert np.allclose(RollingPairStats.load(["NEAR/FLOW"], 48, state_path).sums, fresh.sums)
+    assert json.loads(monitored_pairs.read_text())[0]["zscore"] == result["NEAR/FLOW"]["zscore"]
+
+def test_rolling_stats_apply_leg_arriving_late(tmp_path, price_db, monitored_pairs):
+    """
+    Свічки активу, що надійшли на цикл пізніше (нижче head), застосовуються на своїх місцях.
+    """
+    from bot.data_processing.rolling_stats import RollingPairStats, update_rolling_stats
+
+    rng = np.random.default_rng(19)
+    times = 900 * np.arange(1_900_000, 1_900_100)
+    closes = random_walks(rng, ["NEAR", "FLOW", "XAI"], times.size)
+    late = closes["FLOW"][-4:].copy()
+    closes["FLOW"][-4:] = np.nan  # Завантаження FLOW у цьому циклі не вдалося
+    db_path, ids = price_db(closes, times)
+    monitored_pairs.write_text(json.dumps([{"pair": "NEAR/FLOW"}, {"pair": "NEAR/XAI"}]))
+    state_path = tmp_path / "rolling.npz"
+    update_rolling_stats(db_path, 48, state_path)
+
+    # Наступний цикл: FLOW дозавантажено, нових свічок інших активів немає
+    conn = connect(db_path)
+    conn.executemany(UPSERT_PRICE_SQL, [(ids["FLOW"], int(ts), float(price), None) for ts, price in zip(times[-4:], late)])
+    conn.close()
+    result = update_rolling_stats(db_path, 48, state_path)
+
+    fresh = RollingPairStats(["NEAR/FLOW", "NEAR/XAI"], 48)
+    fresh.catch_up(connect(db_path))
+    saved = RollingPairStats.load(["NEAR/FLOW", "NEAR/XAI"], 48, state_path)
+    assert np.allclose(saved.sums, fresh.sums) and saved.check_drift() < 1e-9
+    assert result["NEAR/FLOW"]["zscore"] == round(float(fresh.stats()["zscore"][0]), 2)
+    assert saved.stats()["count"][0] == 48
+
+def test_pair_metrics_all_windows(tmp_path, price_db, monitored_pairs):
+    """
+    Метрики за всіма вікнами збігаються з прямим розрахунком і записуються в monitoredPairs.json та базу.
+    """
+    from bot.data_processing.pair_metrics import update_pair_metrics
+
+    windows = {"1m": 60, "2m": 120, "4m": 240}
+    rng = np.random.default_rng(11)
+    times = 900 * np.arange(1_900_000, 1_900_300)
+    closes = random_walks(rng, ["NEAR", "FLOW", "XAI"], times.size)
+    closes["XAI"][-240:-60:3] = np.nan  # Покриття 2m/4m нижче порогу, 1m повне
+    prices_db, _ = price_db(closes, times)
+    metrics_db = str(tmp_path / "metrics.db")
+    monitored_pairs.write_text(json.dumps([{"pair": "NEAR/FLOW"}, {"pair": "XAI/FLOW"}]))
+
+    results = update_pair_metrics(prices_db, metrics_db, windows)
+
+    base, quote = closes["NEAR"], closes["FLOW"]
+    for name, length in windows.items():
+        synthetic = base[-length:] / quote[-length:]
+        x, y = np.log(quote[-length:]), np.log(base[-length:])
+        metrics = results["NEAR/FLOW"]
+        assert metrics[f"zscore_{name}"] == round(float((synthetic[-1] - synthetic.mean()) / synthetic.std()), 2)
+        assert metrics[f"correlation_{name}"] == round(float(np.corrcoef(x, y)[0, 1]), 4)
+        assert metrics[f"beta_coef_{name}"] == round(float(np.polyfit(x, y, 1)[0]), 4)
+        assert metrics[f"percentile_90_{name}"] == float(np.percentile(synthetic, 90))
+        assert metrics[f"percentile_10_{name}"] == float(np.percentile(synthetic, 10))
+    assert results["XAI/FLOW"]["zscore_1m"] is not None
+    assert results["XAI/FLOW"]["zscore_2m"] is None and results["XAI/FLOW"]["percentile_90_4m"] is None
+
+    saved = json.loads(monitored_pairs.read_text())
+    assert saved[0]["percentile_10_4m"] == results["NEAR/FLOW"]["percentile_10_4m"]
+    # Циклічне оновлення лише перезаписує одну ротаційну копію попереднього вмісту
+    assert [path.name for path in (tmp_path / "backups").iterdir()] == ["monitoredPairs_last.json"]
+    assert json.loads((tmp_path / "backups" / "monitoredPairs_last.json").read_text()) == [{"pair": "NEAR/FLOW"}, {"pair": "XAI/FLOW"}]
+    conn = connect(metrics_db)
+    assert conn.execute("SELECT COUNT(*) FROM pair_window_metrics").fetchone()[0] == 6
+    assert conn.execute("SELECT zscore FROM pairs WHERE pair = 'NEAR/FLOW'").fetchone()[0] == results["NEAR/FLOW"]["zscore_1m"]
+    conn.close()
+
+def test_pair_scanner_matches_brute_force(tmp_path, price_db, monitored_pairs):
+    """
+    Блоковий сканер знаходить ті самі найкращі пари, що й повний перебір, і пропускає вже відстежувані.
+    """
+    from bot.data_processing.pair_scanner import scan_universe, update_candidate_pairs
+
+    rng = np.random.default_rng(5)
+    window, count = 200, 12
+    names = [f"T{i:02d}" for i in range(count)]
+    factor = np.cumsum(rng.normal(0, 0.01, window))
+    closes = np.exp(rng.uniform(0.5, 2, (count, 1)) * factor + np.cumsum(rng.normal(0, 0.005, (count, window)), axis=1))
+    times = 900 * np.arange(1_900_000, 1_900_000 + window)
+    stored = {}
+    for row, name in enumerate(names):
+        keep = rng.random(window) > (0.5 if name == "T11" else 0)  # T11 не проходить поріг покриття
+        stored[name] = np.where(keep, closes[row], np.nan)
+    db_path, _ = price_db(stored, times, "universe.db")
+
+    candidates = scan_universe(db_path, window, top_k=5, min_correlation=0.0, sort_by="abs_zscore", block_size=4)
+
+    log_prices = np.log(closes[:11])
+    brute = []
+    for i in range(11):
+        for j in range(i + 1, 11):
+            correlation = np.corrcoef(log_prices[i], log_prices[j])[0, 1]
+            synthetic = closes[i] / closes[j]
+            if correlation >= 0:
+                brute.append((abs((synthetic[-1] - synthetic.mean()) / synthetic.std()), f"{names[i]}/{names[j]}", correlation))
+    brute.sort(reverse=True)
+    assert [c["pair"] for c in candidates] == [pair for _, pair, _ in brute[:5]]
+    assert [c["correlation"] for c in candidates] == [round(float(corr), 4) for _, _, corr in brute[:5]]
+
+    top_pair = candidates[0]["pair"]
+    monitored_pairs.write_text(json.dumps([{"pair": "/".join(reversed(top_pair.split("/")))}]))
+    written = update_candidate_pairs(db_path, window, top_k=5, min_correlation=0.0, block_size=4)
+    assert top_pair not in [c["pair"] for c in written]
+    assert json.loads((tmp_path / "candidatePairs.json").read_text()) == written
+
+def test_parallel_mode_matches_serial(price_db, monkeypatch):
+    """
+    Паралельний режим (спільна пам'ять, пул процесів) дає ті самі результати й порядок, що й послідовний.
+    """
+    from bot.data_processing import z_score_calculator, zscore_comparisons
+    from bot.data_processing.pair_metrics import compute_pair_metrics
+    from bot.data_processing.parallel import map_pairs
+
+    rng = np.random.default_rng(9)
+    names = ["PIXEL", "YGG", "XAI", "FLOW", "NEAR", "CYBER"]
+    times = 900 * np.arange(1_900_000, 1_900_700)
+    closes = {}
+    for name in names:
+        keep = rng.random(times.size) > (0.05 if name == "XAI" else 0)
+        closes[name] = np.where(keep, np.exp(np.cumsum(rng.normal(0, 0.01, times.size))), np.nan)
+    db_path, _ = price_db(closes, times, "parallel.db")
+    monkeypatch.setattr(z_score_calculator, "DB_PATH", db_path)
+    monkeypatch.setattr(zscore_comparisons, "DB_PATH", db_path)
+
+    pairs = [f"{base}/{quote}" for base in names for quote in names if base != quote] + ["PIXEL/MISSING"]
+    serial = z_score_calculator.calculate_zscores_for_pairs(pairs)
+    parallel = z_score_calculator.calculate_zscores_parallel(pairs, workers=2, chunk_size=7)
+    assert list(parallel) == pairs and parallel == serial
+
+    comparisons = zscore_comparisons.run_zscore_comparisons_parallel(pairs, workers=2, chunk_size=7)
+    assert comparisons == {pair: zscore_comparisons.run_zscore_comparisons(pair) for pair in pairs}
+
+    index = {name: row for row, name in enumerate(names)}
+    matrix = np.exp(np.cumsum(rng.normal(0, 0.01, (len(names), 300)), axis=1))
+    windows = {"1m": 50, "2m": 100, "4m": 200}
+    assert map_pairs(compute_pair_metrics, matrix, index, pairs, 2, 7, windows=windows) == compute_pair_metrics(matrix, index, pairs, windows)
+
+def test_rolling_spread_matches_polyfit():
+    """
+    Ковзна бета й Z-Score спреду з кумулятивних сум збігаються з np.polyfit по кожному вікну,
+    а beta_coef у pair_metrics — з останнім значенням ковзної бети.
+    """
+    from bot.data_processing.pair_metrics import compute_pair_metrics
+    from bot.data_processing.spread_engine import latest_spread_metrics, spread_series
+
+    rng = np.random.default_rng(4)
+    steps, beta_window, zscore_window = 400, 80, 40
+    quote = np.exp(np.cumsum(rng.normal(0, 0.01, (2, steps)), axis=1))
+    base = quote ** np.array([[1.5], [0.7]]) * np.exp(rng.normal(0, 0.005, (2, steps)))
+    base[1, rng.random(steps) < 0.05] = np.nan
+
+    series = spread_series(base, quote, beta_window, zscore_window)
+    x, y = np.log(quote), np.log(base)
+    for row in range(2):
+        for end in range(beta_window - 1, steps, 37):
+            window = slice(end - beta_window + 1, end + 1)
+            ok = ~np.isnan(y[row, window])
+            if ok.sum() >= 72:
+                beta, alpha = np.polyfit(x[row, window][ok], y[row, window][ok], 1)
+                assert np.isclose(series["beta"][row, end], beta, rtol=1e-9)
+                if ok[-1]:
+                    assert np.isclose(series["spread"][row, end], y[row, end] - alpha - beta * x[row, end], atol=1e-9)
+        spread = series["spread"][row, -zscore_window:]
+        ok = ~np.isnan(spread)
+        if ok[-1]:
+            expected = (spread[-1] - spread[ok].mean()) / spread[ok].std()
+            assert np.isclose(series["spread_zscore"][row, -1], expected, rtol=1e-9)
+
+    matrix = np.vstack([base[0], quote[0]])
+    index = {"NEAR": 0, "FLOW": 1}
+    latest = latest_spread_metrics(matrix, index, ["NEAR/FLOW"], beta_window, zscore_window)["NEAR/FLOW"]
+    metrics = compute_pair_metrics(matrix, index, ["NEAR/FLOW"], {"1m": beta_window, "2m": 2 * beta_window, "4m": 4 * beta_window})
+    assert latest["beta"] == metrics["NEAR/FLOW"]["beta_coef_1m"] == round(float(series["beta"][0, -1]), 4)
+
+def test_cointegration_screening_and_cache(tmp_path, price_db, monkeypatch):
+    """
+    Пакетний тест Енгла–Грейнджера відрізняє коінтегровану пару від незалежних блукань,
+    а кеш пропускає пари, для яких не з'явилося нових свічок.
+    """
+    from bot.data_processing import cointegration
+
+    rng = np.random.default_rng(8)
+    window, steps = 300, 320
+    times = 900 * np.arange(1_900_000, 1_900_000 + steps)
+    flow = np.cumsum(rng.normal(0, 0.01, steps))
+    spread = np.zeros(steps)
+    for t in range(1, steps):
+        spread[t] = 0.5 * spread[t - 1] + rng.normal(0, 0.005)
+    log_prices = {"FLOW": flow, "NEAR": 1.3 * flow + spread, "XAI": np.cumsum(rng.normal(0, 0.01, steps))}
+    closes = {name: np.exp(values) for name, values in log_prices.items()}
+    closes["XAI"][-1] = np.nan  # Остання свічка XAI ще не надійшла
+    prices_db, ids = price_db(closes, times)
+    metrics_db = str(tmp_path / "metrics.db")
+
+    calls = []
+    original = cointegration.engle_granger
+    monkeypatch.setattr(cointegration, "engle_granger", lambda x, y, max_lag: calls.append(len(x)) or original(x, y, max_lag))
+    pairs = ["NEAR/FLOW", "XAI/FLOW", "NEAR/MISSING"]
+    first = cointegration.screen_pairs(pairs, prices_db, metrics_db, window)
+
+    assert first["NEAR/FLOW"]["significance"] == 1 and abs(first["NEAR/FLOW"]["beta"] - 1.3) < 0.05
+    assert first["XAI/FLOW"]["significance"] is None and first["NEAR/MISSING"] is None
+    assert first["XAI/FLOW"]["window_end"] == int(times[-2]) and first["NEAR/FLOW"]["window_end"] == int(times[-1])
+
+    # Перевірка з наївною регресією для коінтегрованої пари
+    x, y = log_prices["FLOW"][-window:], log_prices["NEAR"][-window:]
+    beta, alpha = np.polyfit(x, y, 1)
+    residuals = y - alpha - beta * x
+    diffs = np.diff(residuals)
+    lag, max_lag = first["NEAR/FLOW"]["lag"], cointegration.MAX_LAG
+    regressors = np.column_stack([residuals[max_lag:-1]] + [diffs[max_lag - i:window - 1 - i] for i in range(1, lag + 1)])
+    coef = np.linalg.lstsq(regressors, diffs[max_lag:], rcond=None)[0]
+    rss = ((diffs[max_lag:] - regressors @ coef) ** 2).sum()
+    stat = coef[0] / np.sqrt(rss / (len(diffs) - max_lag - lag - 1) * np.linalg.inv(regressors.T @ regressors)[0, 0])
+    assert first["NEAR/FLOW"]["adf_stat"] == round(float(stat), 4)
+
+    # Різні кінці вікон — два пакети; без нових свічок обидві пари беруться з кешу
+    assert calls == [1, 1]
+    assert cointegration.screen_pairs(pairs, prices_db, metrics_db, window) == first and calls == [1, 1]
+
+    # Нова свічка XAI: повторно тестується лише XAI/FLOW
+    conn = connect(prices_db)
+    conn.execute(UPSERT_PRICE_SQL, (ids["XAI"], int(times[-1]), float(np.exp(log_prices["XAI"][-1])), None))
+    conn.close()
+    third = cointegration.screen_pairs(pairs, prices_db, metrics_db, window)
+    assert calls == [1, 1, 1] and third["XAI/FLOW"]["window_end"] == int(times[-1])
+    assert third["NEAR/FLOW"] == first["NEAR/FLOW"]
+
+def test_metrics_cache_skips_unchanged_pairs(tmp_path, price_db, fresh_cache, monkeypatch):
+    """
+    Кеш метрик: LRU-витіснення, дисковий рівень між екземплярами та перерахунок лише пар із новими свічками.
+    """
+    from bot.data_processing import z_score_calculator
+
+    cache = MetricsCache(capacity=2, path=tmp_path / "cache.db")
+    cache.put_many({"a": (1, 1.5), "b": (1, {"x": 2.0}), "c": (1, None)})
+    assert list(cache.entries) == ["b", "c"]
+    assert MetricsCache(path=tmp_path / "cache.db").get_many({"a": 1, "b": 1, "c": 2}) == {"a": 1.5, "b": {"x": 2.0}}
+
+    rng = np.random.default_rng(12)
+    times = 900 * np.arange(1_900_000, 1_900_700)
+    db_path, ids = price_db(random_walks(rng, ["NEAR", "FLOW", "XAI"], times.size), times)
+    monkeypatch.setattr(z_score_calculator, "DB_PATH", db_path)
+    computed = []
+    original = z_score_calculator.calculate_zscore_for_pair
+    monkeypatch.setattr(z_score_calculator, "calculate_zscore_for_pair", lambda pair: computed.append(pair) or original(pair))
+
+    pairs = ["NEAR/FLOW", "XAI/FLOW", "NEAR/XAI"]
+    first = z_score_calculator.calculate_zscores_for_pairs(pairs)
+    assert z_score_calculator.calculate_zscores_for_pairs(pairs) == first and computed == pairs
+
+    # Нова спільна свічка з'явилася лише в XAI/FLOW: для пар із NEAR остання спільна свічка та сама
+    conn = connect(db_path)
+    conn.execute(UPSERT_PRICE_SQL, (ids["XAI"], int(times[-1]) + 900, 1.0, None))
+    conn.execute(UPSERT_PRICE_SQL, (ids["FLOW"], int(times[-1]) + 900, 1.0, None))
+    conn.close()
+    z_score_calculator.calculate_zscores_for_pairs(pairs)
+    assert computed[len(pairs):] == ["XAI/FLOW"]
+
+    # Виправлення ціни останньої свічки NEAR на місці (ts той самий) перераховує пари з NEAR
+    conn = connect(db_path)
+    conn.execute(UPSERT_PRICE_SQL, (ids["NEAR"], int(times[-1]), 5.0, None))
+    conn.close()
+    del computed[:]
+    z_score_calculator.calculate_zscores_for_pairs(pairs)
+    assert computed == ["NEAR/FLOW", "NEAR/XAI"]
+
+def test_recompute_only_pairs_with_changed_legs(tmp_path, price_db, monitored_pairs, fresh_cache, monkeypatch):
+    """
+    Після завантаження перераховуються лише пари з активами, що отримали нові свічки, та пари без розрахунку.
+    """
+    from bot.data_processing import pair_metrics
+    from bot.data_processing.dependency_index import PairDependencyIndex, batched, changed_assets
+    from bot.data_processing.metrics_cache import latest_candles
+
+    index = PairDependencyIndex(["NEAR/FLOW", "XAI/FLOW", "CYBER/XAI", "NEAR/CYBER"])
+    assert index.affected({"XAI"}) == ["XAI/FLOW", "CYBER/XAI"]
+    assert index.affected({"NEAR", "CYBER"}) == ["NEAR/FLOW", "CYBER/XAI", "NEAR/CYBER"]
+    assert batched(index.affected({"FLOW", "XAI"}), 1) == [["NEAR/FLOW"], ["XAI/FLOW"], ["CYBER/XAI"]]
+
+    windows = {"1m": 60}
+    rng = np.random.default_rng(13)
+    times = 900 * np.arange(1_900_000, 1_900_100)
+    prices_db, ids = price_db(random_walks(rng, ["NEAR", "FLOW", "XAI", "CYBER"], times.size), times)
+    metrics_db = str(tmp_path / "metrics.db")
+    computed = []
+    original = pair_metrics.map_pairs
+    monkeypatch.setattr(pair_metrics, "map_pairs", lambda func, matrix, index, pairs, *args, **kw: computed.extend(pairs) or original(func, matrix, index, pairs, 1, *args[1:], **kw))
+    monitored_pairs.write_text(json.dumps([{"pair": "NEAR/FLOW"}, {"pair": "XAI/FLOW"}, {"pair": "CYBER/XAI"}]))
+    first = pair_metrics.update_pair_metrics(prices_db, metrics_db, windows)
+    assert computed == ["NEAR/FLOW", "XAI/FLOW", "CYBER/XAI"]
+
+    # Нову свічку отримав лише NEAR; пара NEAR/CYBER додана без жодного розрахунку
+    conn = connect(prices_db)
+    before = latest_candles(conn, ids)
+    conn.execute(UPSERT_PRICE_SQL, (ids["NEAR"], int(times[-1]) + 900, 2.0, None))
+    changed = changed_assets(before, latest_candles(conn, ids))
+    assert changed == {"NEAR"}
+    # Виправлена на місці ціна останньої свічки теж вважається оновленням
+    before = latest_candles(conn, ids)
+    conn.execute(UPSERT_PRICE_SQL, (ids["XAI"], int(times[-1]), 2.5, None))
+    assert changed_assets(before, latest_candles(conn, ids)) == {"XAI"}
+    conn.execute(UPSERT_PRICE_SQL, (ids["XAI"], int(times[-1]), before["XAI"][1], None))
+    conn.close()
+    saved = json.loads(monitored_pairs.read_text())
+    monitored_pairs.write_text(json.dumps(saved + [{"pair": "NEAR/CYBER"}]))
+
+    computed.clear()
+    second = pair_metrics.update_pair_metrics(prices_db, metrics_db, windows, changed_assets=changed)
+    assert computed == ["NEAR/FLOW", "NEAR/CYBER"] and list(second) == computed
+    saved = {item["pair"]: item for item in json.loads(monitored_pairs.read_text())}
+    assert saved["XAI/FLOW"]["zscore_1m"] == first["XAI/FLOW"]["zscore_1m"]
+    assert saved["NEAR/CYBER"]["zscore_1m"] == second["NEAR/CYBER"]["zscore_1m"]
+
+    computed.clear()
+    assert pair_metrics.update_pair_metrics(prices_db, metrics_db, windows, changed_assets=set()) == {} and computed == []
+
 if __name__ == "__main__":
     test_calculate_zscores()
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import random
+import time
+import aiohttp
+from bot.utils.rate_limiter import rate_limiter
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # Секунди, база експоненційної затримки
+BACKOFF_MAX = 10
+RETRYABLE_STATUSES = {418, 429, 500, 502, 503, 504}
+PROBE_POLL_INTERVAL = 0.1  # Секунди між перевірками результату пробного запиту
+
+class CircuitBreaker:
+    """
+    Глобальний запобіжник для запитів до Binance.
+
+    Після failure_threshold послідовних невдач переходить у стан "open" і
+    призупиняє всі запити на cooldown секунд. Потім у стані "half-open" пропускає
+    один пробний запит, а решта чекає його результату: успіх закриває запобіжник,
+    невдача знову відкриває. Якщо проба не повернула результату за cooldown секунд,
+    пропускається наступна.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=30):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    async def wait_ready(self):
+        """Чекає, поки запобіжник дозволить запити; у стані half-open пропускає лише один пробний."""
+        while True:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "open":
+                await asyncio.sleep(self.cooldown - (time.monotonic() - self.opened_at))
+                continue
+            now = time.monotonic()
+            if self.probe_started is None or now - self.probe_started >= self.cooldown:
+                self.probe_started = now
+                return
+            await asyncio.sleep(PROBE_POLL_INTERVAL)
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logging.info("✅ API знову доступне, запобіжник закрито.")
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started = None
+        if self.state == "half-open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logging.warning(f"⚠️ API деградувало: запити призупинено на {self.cooldown} с.")
+            self.opened_at = time.monotonic()
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Експоненційна затримка з повним jitter: випадкове значення від 0 до min(cap, base * 2^attempt)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+# Спільний екземпляр для всіх модулів завантаження даних
+circuit_breaker = CircuitBreaker()
+
+async def fetch_with_retry(session, url, params=None, headers=None, weight=1, retries=MAX_RETRIES):
+    """
+    GET-запит до Binance з обмежувачем ваги, повторами та запобіжником.
+
+    Повторюються мережеві помилки, тайм-аути та статуси з RETRYABLE_STATUSES;
+    інші 4xx (наприклад, неіснуючий символ) одразу піднімаються без повторів.
+
+    :return: Тіло відповіді (bytes).
+    """
+    for attempt in range(retries + 1):
+        await circuit_breaker.wait_ready()
+        try:
+            async with rate_limiter.limit(weight):
+                request_started = time.monotonic()
+                async with session.get(url, headers=headers, params=params) as response:
+                    rate_limiter.record_response(response.status, response.headers, time.monotonic() - request_started)
+                    response.raise_for_status()
+                    body = await response.read()
+            circuit_breaker.record_success()
+            return body
+        except aiohttp.ClientResponseError as e:
+            if e.status not in RETRYABLE_STATUSES:
+                circuit_breaker.record_success()  # API відповіло, помилка в самому запиті
+                raise
+            error = e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = e
+
+        circuit_breaker.record_failure()
+        if attempt == retries:
+            raise error
+        delay = backoff_delay(attempt)
+        logging.warning(f"⚠️ Повтор {attempt + 1}/{retries} через {delay:.2f} с: {error}")
+        await asyncio.sleep(delay)
@@ -0,0 +1,65 @@
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson необов'язковий, стандартний json теж працює
+    orjson = None
+
+KLINE_FIELDS = 12  # Кількість полів у свічці /api/v3/klines
+OPEN_TIME, CLOSE, VOLUME, CLOSE_TIME = 0, 4, 5, 6
+
+class KlineArrays:
+    """
+    Свічки у вигляді типізованих масивів NumPy замість словника на кожну свічку.
+
+    open_time, close_time — int64 (мілісекунди), close, volume — float64.
+    """
+
+    __slots__ = ("open_time", "close_time", "close", "volume")
+
+    def __init__(self, open_time, close_time, close, volume):
+        self.open_time = np.asarray(open_time, dtype=np.int64)
+        self.close_time = np.asarray(close_time, dtype=np.int64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.open_time)
+
+    def select(self, mask):
+        """Повертає підмножину свічок за булевою маскою або зрізом."""
+        return KlineArrays(self.open_time[mask], self.close_time[mask], self.close[mask], self.volume[mask])
+
+def _from_matrix(matrix):
+    return KlineArrays(
+        matrix[:, OPEN_TIME].astype(np.int64),
+        matrix[:, CLOSE_TIME].astype(np.int64),
+        matrix[:, CLOSE],
+        matrix[:, VOLUME],
+    )
+
+def parse_klines(raw):
+    """
+    Розбирає відповідь /api/v3/klines одразу в масиви.
+
+    Основний шлях не створює Python-об'єктів на свічку: після видалення дужок і лапок
+    відповідь — це рядок чисел через кому, який NumPy розбирає напряму. Час у мілісекундах
+    точно представлений у float64 (менше 2^53). Якщо формат неочікуваний — розбір через
+    orjson (або json) з подальшим перетворенням у масиви.
+
+    :param raw: Тіло відповіді (bytes або str).
+    :return: KlineArrays.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode()
+    rows = raw.count(b"[") - 1
+    values = np.fromstring(raw.translate(None, b'[]"'), dtype=np.float64, sep=",")
+    if rows >= 0 and values.size == rows * KLINE_FIELDS:
+        return _from_matrix(values.reshape(-1, KLINE_FIELDS))
+
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    if not data:
+        return _from_matrix(np.empty((0, KLINE_FIELDS)))
+    matrix = np.array([row[:KLINE_FIELDS] for row in data], dtype=np.float64)
+    return _from_matrix(matrix)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+WEIGHT_LIMIT_1M = 6000  # Ліміт ваги запитів Binance за хвилину на IP
+SAFETY_RATIO = 0.8  # Частка ліміту, яку дозволено використовувати
+USED_WEIGHT_HEADER = "X-MBX-USED-WEIGHT-1m"
+RETRY_AFTER_HEADER = "Retry-After"
+
+
+def klines_weight(limit):
+    """
+    Вага запиту /api/v3/klines залежно від limit (згідно з документацією Binance).
+    """
+    if limit <= 100:
+        return 1
+    if limit <= 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+class AdaptiveRateLimiter:
+    """
+    Спільний обмежувач запитів до Binance.
+
+    Тримає бюджет ваги на поточну хвилину (за заголовком X-MBX-USED-WEIGHT-1m)
+    і змінює кількість паралельних запитів за схемою AIMD: повільно збільшує при
+    швидких успішних відповідях і вдвічі зменшує при 429/418 або високій затримці.
+    Зменшення відбувається не частіше одного разу на "вікно": відповіді на запити, що
+    стартували до останнього зменшення, паралельність уже не зменшують.
+    """
+
+    def __init__(
+        self,
+        weight_limit=WEIGHT_LIMIT_1M,
+        safety_ratio=SAFETY_RATIO,
+        initial_concurrency=10,
+        min_concurrency=1,
+        max_concurrency=40,
+        latency_target=1.5,
+    ):
+        self.weight_budget = int(weight_limit * safety_ratio)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.concurrency = float(initial_concurrency)
+
+        self.used_weight = 0
+        self.window_start = self._current_minute()
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.last_decrease = float("-inf")  # Момент (time.monotonic) останнього зменшення
+
+        self._loop = None
+        self._condition = None
+
+    @staticmethod
+    def _current_minute():
+        return int(time.time() // 60) * 60
+
+    def _get_condition(self):
+        """
+        Умова прив'язується до активного event loop (core.py запускає asyncio.run на кожен цикл).
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condition = asyncio.Condition()
+            self.in_flight = 0
+        return self._condition
+
+    def _roll_window(self):
+        minute = self._current_minute()
+        if minute != self.window_start:
+            self.window_start = minute
+            self.used_weight = 0
+
+    def _wait_time(self, weight):
+        """
+        Скільки секунд потрібно почекати, перш ніж витратити weight.
+        """
+        now = time.time()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._roll_window()
+        if self.used_weight + weight > self.weight_budget:
+            return self.window_start + 60 - now
+        return 0.0
+
+    @asynccontextmanager
+    async def limit(self, weight=1):
+        """
+        Резервує слот паралельності та вагу запиту на час виконання блоку.
+        """
+        condition = self._get_condition()
+        async with condition:
+            while True:
+                await condition.wait_for(lambda: self.in_flight < int(self.concurrency))
+                delay = self._wait_time(weight)
+                if delay <= 0:
+                    break
+                logging.warning(f"⏳ Бюджет ваги вичерпано, очікування {delay:.1f} с.")
+                condition.release()
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    await condition.acquire()
+            self.in_flight += 1
+            self.used_weight += weight
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+    def record_response(self, status, headers, latency):
+        """
+        Оновлює стан обмежувача за відповіддю Binance.
+
+        :param status: HTTP статус відповіді.
+        :param headers: Заголовки відповіді.
+        :param latency: Тривалість запиту в секундах.
+        """
+        started = time.monotonic() - latency
+        used_weight = headers.get(USED_WEIGHT_HEADER)
+        if used_weight is not None:
+            self._roll_window()
+            # Сервер рахує вагу всіх клієнтів з нашого IP, тому довіряємо більшому значенню
+            self.used_weight = max(self.used_weight, int(used_weight))
+
+        if status in (429, 418):
+            retry_after = headers.get(RETRY_AFTER_HEADER)
+            delay = int(retry_after) if retry_after is not None else 60
+            self.blocked_until = max(self.blocked_until, time.time() + delay)
+            self._decrease(started)
+            logging.warning(
+                f"⚠️ Binance повернув {status}. Пауза {delay} с, паралельність: {int(self.concurrency)}."
+            )
+        elif latency > self.latency_target:
+            self._decrease(started)
+        elif status < 400:
+            # Адитивне збільшення: приблизно +1 слот за "раунд" запитів
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def _decrease(self, started):
+        """
+        Вдвічі зменшує паралельність, якщо запит стартував після останнього зменшення.
+
+        Запити, що вже були в дорозі, відповідають на стару паралельність, тож їхні
+        повільні відповіді чи 429 не повинні зменшувати її повторно.
+        """
+        if started <= self.last_decrease:
+            return
+        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+        self.last_decrease = time.monotonic()
+
+
+# Спільний екземпляр для всіх модулів завантаження даних
+rate_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,128 @@
+import json
+import logging
+import time
+from pathlib import Path
+from bot.utils.api_client import fetch_with_retry
+
+# Налаштування логування
+LOG_FILE = "zscore_bot.log"
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+    encoding="utf-8",
+)
+
+BASE_URL = "https://api.binance.com"
+EXCHANGE_INFO_WEIGHT = 20
+CACHE_PATH = Path("bot/data_storage/exchange_info.json")
+CACHE_TTL = 24 * 60 * 60  # Оновлювати exchangeInfo не частіше ніж раз на добу
+QUOTE_ASSET = "USDT"
+
+class SymbolRegistry:
+    """
+    Реєстр торгових символів Binance на основі /api/v3/exchangeInfo.
+
+    Відповідь кешується на диску в компактному вигляді (статус, активи, фільтри),
+    тому запуск без мережі або повторний запуск не потребують запиту до API.
+    """
+
+    def __init__(self, cache_path=CACHE_PATH, ttl=CACHE_TTL):
+        self.cache_path = Path(cache_path)
+        self.ttl = ttl
+        self.symbols = {}
+        self.fetched_at = 0
+
+    @property
+    def is_loaded(self):
+        return bool(self.symbols)
+
+    def _load_cache(self):
+        if not self.cache_path.exists():
+            return False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                cache = json.load(file)
+            self.symbols = cache["symbols"]
+            self.fetched_at = cache["fetched_at"]
+            return True
+        except Exception as e:
+            logging.error(f"❌ Помилка читання кешу exchangeInfo: {e}")
+            return False
+
+    def _save_cache(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, "w", encoding="utf-8") as file:
+            json.dump({"fetched_at": self.fetched_at, "symbols": self.symbols}, file)
+
+    @staticmethod
+    def _compact(exchange_info):
+        """Залишає з exchangeInfo лише статус, активи та фільтри кожного символу."""
+        return {
+            item["symbol"]: {
+                "status": item["status"],
+                "baseAsset": item["baseAsset"],
+                "quoteAsset": item["quoteAsset"],
+                "filters": {f["filterType"]: f for f in item.get("filters", [])},
+            }
+            for item in exchange_info.get("symbols", [])
+        }
+
+    async def load(self, session=None, force=False):
+        """
+        Завантажує реєстр: зі свіжого кешу, інакше з API; у разі помилки API — із застарілого кешу.
+
+        :param session: Сесія aiohttp (може бути None для роботи лише з кешем).
+        :param force: Ігнорувати TTL кешу.
+        """
+        cached = self._load_cache()
+        if cached and not force and time.time() - self.fetched_at < self.ttl:
+            logging.info(f"✅ exchangeInfo завантажено з кешу: {len(self.symbols)} символів.")
+            return self
+        if session is None:
+            return self
+
+        try:
+            body = await fetch_with_retry(session, f"{BASE_URL}/api/v3/exchangeInfo", weight=EXCHANGE_INFO_WEIGHT)
+            exchange_info = json.loads(body)
+            self.symbols = self._compact(exchange_info)
+            self.fetched_at = int(time.time())
+            self._save_cache()
+            logging.info(f"✅ exchangeInfo оновлено: {len(self.symbols)} символів.")
+        except Exception as e:
+            logging.error(f"❌ Помилка завантаження exchangeInfo, використовується кеш: {e}")
+        return self
+
+    def status(self, symbol):
+        """Статус торгівлі символу (TRADING, BREAK, ...) або None, якщо символу немає."""
+        info = self.symbols.get(symbol)
+        return info["status"] if info else None
+
+    def filters(self, symbol):
+        """Фільтри символу за типом (PRICE_FILTER, LOT_SIZE, ...)."""
+        info = self.symbols.get(symbol)
+        return info["filters"] if info else {}
+
+    def is_trading(self, symbol):
+        return self.status(symbol) == "TRADING"
+
+    def validate_assets(self, assets, quote=QUOTE_ASSET):
+        """
+        Розділяє активи на ті, що мають активний символ {asset}{quote}, і недійсні/делістингові.
+
+        Якщо реєстр не завантажено (немає ні кешу, ні мережі), усі активи вважаються дійсними.
+
+        :return: (множина дійсних активів, словник {актив: статус або None}).
+        """
+        assets = set(assets)
+        if not self.is_loaded:
+            return assets, {}
+        invalid = {
+            asset: self.status(f"{asset}{quote}")
+            for asset in assets
+            if not self.is_trading(f"{asset}{quote}")
+        }
+        if invalid:
+            logging.warning(f"⚠️ Пропущено недійсні або неактивні символи: {invalid}")
+        return assets - invalid.keys(), invalid
@@ -1,6 +1,12 @@
 import asyncio
+import sys
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from bot.data_processing.data_672 import process_assets
+from bot.data_processing.data_672 import last_cycle, process_assets
+from bot.data_processing.metrics_cache import enable_disk_cache
+from bot.data_processing.pair_scanner import update_candidate_pairs
+from bot.data_processing.recompute import DebouncedRecompute, recompute_changed
+from bot.data_processing.ws_ingestion import run_ws_ingestion
+from bot.database.snapshot import export_snapshot, warm_start
 import logging
 
 # Налаштування логування
@@ -13,14 +19,51 @@ logging.basicConfig(
     encoding="utf-8",
 )
 
+async def run_cycle():
+    """
+    Цикл завантаження, перерахунку метрик пар і пошуку нових кандидатів;
+    з прапорцем --snapshot після нього зберігається стовпцевий знімок бази.
+    Метрики перераховуються лише для пар, активи яких отримали нові свічки в цьому циклі;
+    тижневі ковзні статистики пар оновлюються інкрементально й зберігаються між перезапусками,
+    а Z-Score 1h/4h будуються з уже збережених 15-хвилинних свічок.
+    """
+    await process_assets()
+    await asyncio.to_thread(recompute_changed, last_cycle["updated"])
+    await asyncio.to_thread(update_candidate_pairs)
+    if "--snapshot" in sys.argv:
+        await asyncio.to_thread(export_snapshot)
+
+def recompute_ws(changed_assets):
+    """
+    Перерахунок у WebSocket-режимі: метрики пар з активами записаних пакетів і пошук кандидатів.
+    """
+    recompute_changed(changed_assets)
+    update_candidate_pairs()
+
 async def main():
     """
     Головна функція для запуску задач: разовий запуск і розклад.
     """
+    # Кеш метрик на диску: перезапуск без нових свічок не перераховує пари
+    enable_disk_cache()
+
+    # Прогрів бази з останнього знімка: перший цикл дозавантажить лише свічки після нього
+    inserted = await asyncio.to_thread(warm_start)
+    if inserted:
+        logging.info(f"✅ Базу прогріто зі знімка: {inserted} записів.")
+
+    if "--ws" in sys.argv:
+        # Push-режим: закриті свічки надходять через WebSocket, розриви заповнюються через REST;
+        # після записаних пакетів перераховуються метрики зачеплених пар
+        logging.info("📡 Запуск у режимі WebSocket.")
+        print("📡 Запуск у режимі WebSocket...")
+        await run_ws_ingestion(recompute=DebouncedRecompute(recompute_ws))
+        return
+
     scheduler = AsyncIOScheduler()
 
     # Запуск розкладу
-    scheduler.add_job(process_assets, "cron", minute="0,15,30,45")
+    scheduler.add_job(run_cycle, "cron", minute="0,15,30,45")
     scheduler.start()
 
     # Лог початку роботи
@@ -30,7 +73,7 @@ async def main():
     print("🔄 Виконання першого завдання...")
     logging.info("🔄 Виконання першого завдання...")
     try:
-        await process_assets()
+        await run_cycle()
         logging.info("✅ Перше завдання виконано успішно.")
         print("✅ Перше завдання завершено.")
     except Exception as e: